@@ -13,12 +13,18 @@ class ActivityTracker:
         
         # Create activities file if it doesn't exist
         if not os.path.exists(self.activities_file):
-            with open(self.activities_file, 'w') as f:
-                json.dump([], f)
+            self.write_activities([])
         
         # Clean old activities on startup
         self.clean_old_activities()
 
+    def write_activities(self, activities):
+        """Replace the activities file in one step, so the dashboard never reads it half written"""
+        tmp_file = f"{self.activities_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(activities, f, indent=2)
+        os.replace(tmp_file, self.activities_file)
+
     def clean_old_activities(self):
         """Remove activities older than 30 days"""
         try:
@@ -36,8 +42,7 @@ class ActivityTracker:
                 except:
                     continue
             
-            with open(self.activities_file, 'w') as f:
-                json.dump(filtered_activities, f, indent=2)
+            self.write_activities(filtered_activities)
                 
         except Exception as e:
             print(f"Error cleaning old activities: {str(e)}")
@@ -67,8 +72,7 @@ class ActivityTracker:
             activities.append(new_activity)
             
             # Write back to file
-            with open(self.activities_file, 'w') as f:
-                json.dump(activities, f, indent=2)
+            self.write_activities(activities)
             
             return True
         except Exception as e:
@@ -99,8 +103,7 @@ class ActivityTracker:
     def clear_activities(self):
         """Clear all activities"""
         try:
-            with open(self.activities_file, 'w') as f:
-                json.dump([], f)
+            self.write_activities([])
             return True
         except Exception as e:
             print(f"Error clearing activities: {str(e)}")
@@ -12,7 +12,9 @@ import sys
 import json
 import os
 import shutil  # For copying files
-from github_sync import github_sync
+import snapshot_cache
+from case_store import case_store
+from case_record import CASE_SCHEMA_VERSION
 from pathlib import Path
 
 class NoScrollComboBox(QComboBox):
@@ -90,18 +92,6 @@ class AddEntryModule(QWidget):
         # Create user data folder if it doesn't exist
         os.makedirs(self.user_data_folder, exist_ok=True)
         
-        # If running from PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # Download files from Drive if they don't exist
-            if not os.path.exists(self.data_file):
-                github_sync.download_file('data.json', self.data_file)
-            if not os.path.exists(self.work_types_file):
-                github_sync.download_file('work_types.json', self.work_types_file)
-            if not os.path.exists(self.work_done_file):
-                github_sync.download_file('work_done.json', self.work_done_file)
-            if not os.path.exists(self.locations_file):
-                github_sync.download_file('locations.json', self.locations_file)
-        
         # Load location data
         self.load_locations()
 
@@ -480,8 +470,7 @@ class AddEntryModule(QWidget):
     def load_locations(self):
         if os.path.exists(self.locations_file):
             try:
-                with open(self.locations_file, 'r', encoding='utf-8') as f:
-                    self.locations_data = json.load(f)
+                self.locations_data = snapshot_cache.load_json(self.locations_file)
                 if not isinstance(self.locations_data, dict):
                     raise ValueError("locations.json must contain a dictionary.")
             except (json.JSONDecodeError, ValueError) as e:
@@ -561,8 +550,7 @@ class AddEntryModule(QWidget):
         work_types = []
         if os.path.exists(self.work_types_file):
             try:
-                with open(self.work_types_file, 'r', encoding='utf-8') as f:
-                    types = json.load(f)
+                types = snapshot_cache.load_json(self.work_types_file)
                 if not isinstance(types, list):
                     raise ValueError("work_types.json must contain a list.")
                 for wt in types:
@@ -579,8 +567,7 @@ class AddEntryModule(QWidget):
         work_done = []
         if os.path.exists(self.work_done_file):
             try:
-                with open(self.work_done_file, 'r', encoding='utf-8') as f:
-                    done = json.load(f)
+                done = snapshot_cache.load_json(self.work_done_file)
                 if not isinstance(done, list):
                     raise ValueError("work_done.json must contain a list.")
                 for wd in done:
@@ -706,10 +693,21 @@ class AddEntryModule(QWidget):
             return
 
         try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            suggestions = []
+            # Customers of past years not loaded yet come from the shard
+            # manifest; a year is only loaded once one of them is picked
+            past = case_store.past_year_summaries()
+            if any("customers" not in summary for summary in past.values()):
+                # Summaries written before customers were recorded in them
+                case_store.ensure_year(None)
+                past = {}
+            past_customers = {}
+            for year, summary in past.items():
+                for customer_name in summary["customers"]:
+                    past_customers.setdefault(customer_name, []).append(year)
+            data = case_store.ensure_loaded()
+
+            suggestions = [customer_name for customer_name in past_customers
+                           if text.lower() in customer_name.lower()]
             customer_data = {}  # Store full customer data
             for entry in data:
                 customer_name = entry.get("Customer Name", "")
@@ -717,6 +715,12 @@ class AddEntryModule(QWidget):
                     suggestions.append(customer_name)
                     # Store the most recent entry for each customer
                     customer_data[customer_name] = entry
+            if text not in customer_data and text in past_customers:
+                # Only a customer of past years: load the latest for the auto-fill
+                case_store.ensure_year(max(past_customers[text]))
+                for entry in case_store.ensure_loaded():
+                    if entry.get("Customer Name", "") == text:
+                        customer_data[text] = entry
 
             # Remove duplicates and sort
             unique_suggestions = sorted(list(set(suggestions)))
@@ -810,30 +814,14 @@ class AddEntryModule(QWidget):
             print(f"Setting Mobile Number: {mobile}")
             self.mobile_number.setText(mobile)
 
-            # Get Party Address
-            party_address = entry.get("Party Address", {})
+            # Get Party Address (the case store upgrades every record to the
+            # structured form on load)
+            party_address = entry.get("Party Address") or {}
             print(f"\nParty Address Raw Data: {party_address}")
-            
-            # Handle party address whether it's a dict or string
-            if isinstance(party_address, dict):
-                state = party_address.get("State", "")
-                district = party_address.get("District", "")
-                taluka = party_address.get("Taluka", "")
-                village = party_address.get("Village", "")
-            elif isinstance(party_address, str):
-                # Try to parse the string as a dictionary-like structure
-                try:
-                    # Convert string representation to dictionary
-                    address_parts = dict(item.strip().split(": ") for item in 
-                                       party_address.strip("{}").replace("'", "").split(", "))
-                    state = address_parts.get("State", "")
-                    district = address_parts.get("District", "")
-                    taluka = address_parts.get("Taluka", "")
-                    village = address_parts.get("Village", "")
-                except:
-                    state = district = taluka = village = ""
-            else:
-                state = district = taluka = village = ""
+            state = party_address.get("State", "")
+            district = party_address.get("District", "")
+            taluka = party_address.get("Taluka", "")
+            village = party_address.get("Village", "")
                 
             print(f"\nExtracting Party Address Components:")
             print(f"State: {state}")
@@ -1241,28 +1229,22 @@ class AddEntryModule(QWidget):
             return
 
         try:
-            if os.path.exists(self.data_file) and os.path.getsize(self.data_file) > 0:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                duplicate = any(entry.get("File No.", "").lower() == file_no.lower() for entry in data)
-                if duplicate:
-                    self.file_no.setStyleSheet("""
-                        QLineEdit {
-                            padding: 8px;
-                            border: 2px solid red;
-                            border-radius: 5px;
-                            background-color: #fff0f0;
-                            font-size: 14px;
-                        }
-                    """)
-                    QMessageBox.warning(
-                        self,
-                        "Duplicate File No.",
-                        f"The File No. '{file_no}' already exists. Please enter a unique File No."
-                    )
-                    return
-            else:
-                data = []
+            if case_store.exists(file_no):
+                self.file_no.setStyleSheet("""
+                    QLineEdit {
+                        padding: 8px;
+                        border: 2px solid red;
+                        border-radius: 5px;
+                        background-color: #fff0f0;
+                        font-size: 14px;
+                    }
+                """)
+                QMessageBox.warning(
+                    self,
+                    "Duplicate File No.",
+                    f"The File No. '{file_no}' already exists. Please enter a unique File No."
+                )
+                return
         except json.JSONDecodeError:
             QMessageBox.critical(self, "Error", "Failed to decode JSON from data.json. Please check the file format.")
             return
@@ -1287,16 +1269,18 @@ class AddEntryModule(QWidget):
             "Remark": remark,
             "Work Types": work_types,
             "Work Done": work_done,
-            "Party Address": f"State: {party_state}\nDistrict: {party_district}\nTaluka: {party_taluka}\nVillage: {party_village}"
+            "Party Address": {
+                "State": party_state,
+                "District": party_district,
+                "Taluka": party_taluka,
+                "Village": party_village
+            },
+            "Schema Version": CASE_SCHEMA_VERSION
         }
 
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                data.append(entry)
-                json.dump(data, f, indent=4, ensure_ascii=False)
-            
-            # Sync with Google Drive
-            github_sync.sync_file(self.data_file)
+            # Save through the shared store (which syncs with GitHub)
+            case_store.add(entry)
             
             QMessageBox.information(self, "Form Submitted", "Data has been successfully saved and synced.")
             self.clear_form()
@@ -13,7 +13,13 @@ import shutil
 from pathlib import Path
 from functools import partial
 from datetime import datetime
-from github_sync import github_sync
+from case_store import case_store, CASE_SERVER
+
+
+def shown_work_status(sale):
+    """The Work Status this page shows: anything but "Approved" counts as "Pending"."""
+    return "Approved" if sale.get("Work Status") == "Approved" else "Pending"
+
 
 class ApprovalModule(QWidget):
     def __init__(self):
@@ -27,19 +33,10 @@ class ApprovalModule(QWidget):
         # Create user data folder if it doesn't exist
         os.makedirs(self.user_data_folder, exist_ok=True)
 
-        # If running from PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # Download files from Drive if they don't exist
-            if not os.path.exists(self.data_file):
-                github_sync.download_file('data.json', self.data_file)
-        else:
+        if not getattr(sys, 'frozen', False):
             # Ensure folder exists in normal environment
             os.makedirs(self.data_folder, exist_ok=True)
 
-        # Ensure data is synced from Google Drive
-        if not os.path.exists(self.data_file):
-            github_sync.download_file('data.json', self.data_file)
-
         # Define the icons path
         self.icons_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Icons')
 
@@ -118,6 +115,8 @@ class ApprovalModule(QWidget):
         self.year_filter_combo = QComboBox()
         self.year_filter_combo.addItem(QIcon("icons/filter.svg"), "All")
         self.year_filter_combo.addItems([str(year) for year in range(2020, 2041)])
+        # Past years load on demand, so the current year is shown at first
+        self.year_filter_combo.setCurrentText(str(datetime.now().year))
         self.year_filter_combo.setFixedWidth(100)
         self.year_filter_combo.setStyleSheet("""
             QComboBox {
@@ -245,20 +244,31 @@ class ApprovalModule(QWidget):
 
         self.setLayout(main_layout)
 
-        # Load data initially
-        self.load_approvals()
+        # Hidden until picked in the sidebar: load on first show so startup
+        # does not wait for data.json (the dashboard streams it meanwhile)
+        self.approvals = []
+        self._stale = True
+        self._loading_years = False
+        case_store.cases_changed.connect(self.on_cases_changed)
 
     def load_approvals(self):
-        """Load approval data from data.json and populate the table."""
-        if not os.path.exists(self.data_file):
+        """Load approval data from the shared case store and populate the table."""
+        self._stale = False
+        if not CASE_SERVER and not os.path.exists(self.data_file) and not case_store.loaded:
             QMessageBox.warning(self, "No Data", "No approval data found.")
             self.approvals = []
             self.display_approvals(self.approvals)
             return
 
         try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                self.approvals = json.load(f)
+            # Only the current year is loaded up front; "All" lists every year
+            selected_year = self.year_filter_combo.currentText()
+            self._loading_years = True
+            try:
+                case_store.ensure_year(None if selected_year == "All" else int(selected_year))
+            finally:
+                self._loading_years = False
+            self.approvals = case_store.ensure_loaded()
         except json.JSONDecodeError:
             QMessageBox.critical(self, "Error", "Failed to decode JSON. Please check the data.json file.")
             self.approvals = []
@@ -266,14 +276,23 @@ class ApprovalModule(QWidget):
             QMessageBox.critical(self, "Error", f"An error occurred while loading approvals:\n{str(e)}")
             self.approvals = []
 
-        for sale in self.approvals:
-            if "Work Status" not in sale:
-                sale["Work Status"] = "Pending"
-            elif sale["Work Status"] not in ["Pending", "Approved"]:
-                sale["Work Status"] = "Pending"
-
         self.display_approvals(self.approvals)
 
+    def on_cases_changed(self, file_nos):
+        """Reload when a save happens; defer while this page is hidden."""
+        if self._loading_years:
+            # load_approvals is loading past years and shows them itself
+            return
+        if self.isVisible():
+            self.load_approvals()
+        else:
+            self._stale = True
+
+    def showEvent(self, event):
+        if self._stale:
+            self.load_approvals()
+        super().showEvent(event)
+
     def display_approvals(self, approvals):
         """Display approval data in the table."""
         self.table.setRowCount(0)
@@ -317,7 +336,8 @@ class ApprovalModule(QWidget):
             work_types_item.setTextAlignment(Qt.AlignCenter)
             self.table.setItem(row_position, 8, work_types_item)
 
-            work_status = sale.get("Work Status", "Pending")
+            # The cases are shared with every module, so only the shown value is normalised
+            work_status = shown_work_status(sale)
             
             if work_status == "Approved":
                 approved_label = QLabel("Approved")
@@ -348,7 +368,7 @@ class ApprovalModule(QWidget):
 
     def approve_work(self, sale):
         """Approve the work for a given sale."""
-        work_status = sale.get("Work Status", "Pending")
+        work_status = shown_work_status(sale)
         if work_status != "Pending":
             QMessageBox.information(
                 self,
@@ -364,20 +384,15 @@ class ApprovalModule(QWidget):
         )
         if reply == QMessageBox.Yes:
             sale["Work Status"] = "Approved"
-            self.save_approvals()
-            self.load_approvals()
+            self.save_approvals([sale.get("File No.", "")])
             QMessageBox.information(self, "Success", f"Work for File No. {sale.get('File No.', '')} has been approved.")
 
 
-    def save_approvals(self):
-        """Save the current approval data back to data.json."""
+    def save_approvals(self, file_nos=None):
+        """Save the current approval data through the shared case store."""
         try:
-            # Save the updated data
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.approvals, f, indent=4, ensure_ascii=False)
-            
-            # Upload to Google Drive
-            github_sync.sync_file(self.data_file)
+            # Save the updated data (the store uploads to GitHub)
+            case_store.save(file_nos)
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred while saving approvals:\n{str(e)}")
@@ -389,31 +404,16 @@ class ApprovalModule(QWidget):
         selected_status = self.filter_combo.currentText()
         search_query = self.search_box.text().strip().lower()
 
+        # Work Status is matched as shown (see shown_work_status), not as stored
+        matched = case_store.query(
+            year=None if selected_year == "All" else int(selected_year),
+            month=None if selected_month == "All" else datetime.strptime(selected_month, "%B").month
+        )
+
         for row in range(self.table.rowCount()):
             sale = self.approvals[row]
-
-            status = sale.get("Work Status", "Pending")
-            status_match = (selected_status == "All") or (status == selected_status)
-
-            month_match = True
-            if selected_month != "All":
-                sale_date_str = sale.get("Date", "")
-                try:
-                    sale_date_obj = datetime.strptime(sale_date_str, "%d/%m/%Y")
-                    sale_month = sale_date_obj.strftime("%B")
-                    month_match = (sale_month.lower() == selected_month.lower())
-                except:
-                    month_match = False
-
-            year_match = True
-            if selected_year != "All":
-                sale_date_str = sale.get("Date", "")
-                try:
-                    sale_date_obj = datetime.strptime(sale_date_str, "%d/%m/%Y")
-                    sale_year = str(sale_date_obj.year)
-                    year_match = (sale_year == selected_year)
-                except:
-                    year_match = False
+            filter_match = sale.get("File No.", "") in matched and (
+                selected_status == "All" or shown_work_status(sale) == selected_status)
 
             if search_query:
                 file_no = sale.get("File No.", "").lower()
@@ -435,7 +435,7 @@ class ApprovalModule(QWidget):
             else:
                 search_match = True
 
-            match = status_match and month_match and year_match and search_match
+            match = filter_match and search_match
             self.table.setRowHidden(row, not match)
 
 # -------------------- Main Execution Block --------------------
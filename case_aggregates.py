@@ -0,0 +1,192 @@
+# case_aggregates.py
+
+import bisect
+import threading
+from PyQt5.QtCore import QObject, Qt
+from case_store import case_store
+from case_record import (case_sort_key, contribution, contribution_totals,
+                         TOTAL, COMPLETED, COUNT, COMPLETED_COUNT, APPROVED_COUNT)
+
+
+class CaseAggregates(QObject):
+    """Dashboard totals and a date index kept up to date as cases are saved.
+
+    Every case adds its amount and counts to the bucket of its day (cases
+    without a valid date go to an undated bucket). A save takes the case's
+    old contribution out of its bucket and puts the new one in, so the
+    totals of all cases are always at hand and a date range only has to
+    combine the buckets of the days in it.
+
+    The cases are also kept sorted by date (case_sort_key, so undated
+    ones first), which makes the cases of a date range a bisect and a
+    slice away.
+
+    Saves are noted as they are announced and folded in when the totals
+    are next read. "Everything may have changed" rebuilds the buckets, as
+    does a File No. held by more than one case.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # {day ordinal or None: bucket}, and the dated days in order
+        self._buckets = {}
+        self._days = []
+        self._totals = [0] * 5
+        # Sort keys in order, and the cases in the same order
+        self._keys = []
+        self._ordered = []
+        # {File No.: [(contribution, case), ...]}
+        self._contributions = {}
+        self._counted = 0
+        self._pending = set()
+        self._stale = True
+        # Direct: noted in whatever thread saves, before any module repaints
+        case_store.cases_changed.connect(self._on_cases_changed, Qt.DirectConnection)
+
+    def _on_cases_changed(self, file_nos):
+        with self._lock:
+            if file_nos:
+                self._pending.update(file_nos)
+            else:
+                self._stale = True
+
+    # --------------------------------------------------
+    #   BUCKETS
+    # --------------------------------------------------
+    def _add(self, item, sign):
+        day = item[0]
+        bucket = self._buckets.get(day)
+        if bucket is None:
+            bucket = self._buckets[day] = [0] * 5
+            if day is not None:
+                bisect.insort(self._days, day)
+        for i, value in enumerate(contribution_totals(item)):
+            bucket[i] += sign * value
+            self._totals[i] += sign * value
+        if bucket[COUNT] == 0:
+            del self._buckets[day]
+            if day is not None:
+                del self._days[bisect.bisect_left(self._days, day)]
+
+    def _index(self, case):
+        key = case_sort_key(case)
+        i = bisect.bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self._ordered.insert(i, case)
+
+    def _unindex(self, case, key):
+        for i in range(bisect.bisect_left(self._keys, key), bisect.bisect_right(self._keys, key)):
+            if self._ordered[i] is case:
+                del self._keys[i]
+                del self._ordered[i]
+                return
+
+    def _rebuild(self):
+        self._buckets, self._days, self._totals = {}, [], [0] * 5
+        self._contributions = {}
+        for case in case_store.cases:
+            item = contribution(case)
+            self._contributions.setdefault(case.get("File No.", ""), []).append((item, case))
+            self._add(item, 1)
+        self._ordered = sorted(case_store.cases, key=case_sort_key)
+        self._keys = [case_sort_key(case) for case in self._ordered]
+        self._counted = len(case_store.cases)
+        self._pending.clear()
+        self._stale = False
+
+    def _catch_up(self):
+        # Runs with both locks held
+        if not self._stale:
+            for file_no in self._pending:
+                old = self._contributions.pop(file_no, [])
+                if len(old) > 1 or not file_no:
+                    # Shared File No.: the store only finds one of its cases
+                    self._stale = True
+                    break
+                for item, case in old:
+                    self._add(item, -1)
+                    # The day it was counted under; the case may have been edited since
+                    self._unindex(case, item[0] or 0)
+                self._counted -= len(old)
+                # Not get(): that may load past years, which announces a change itself
+                case = case_store.find(file_no)
+                if case is not None:
+                    item = contribution(case)
+                    self._contributions[file_no] = [(item, case)]
+                    self._add(item, 1)
+                    self._index(case)
+                    self._counted += 1
+            self._pending.clear()
+        # Cases that arrived without a save (e.g. past years loading) or a new duplicate
+        if self._stale or self._counted != len(case_store.cases):
+            self._rebuild()
+
+    # --------------------------------------------------
+    #   QUERIES
+    # --------------------------------------------------
+    def summary(self, start=None, end=None):
+        """Totals of the cases dated between day ordinals start and end (inclusive), or of all cases.
+
+        Amounts are in rupees: total, completed, pending (= remaining);
+        counts: cases, completed_cases, pending_cases, approved_cases.
+        """
+        return self.overview(start, end)[0]
+
+    def cases_by_date(self, start=None, end=None):
+        """The cases dated between day ordinals start and end (inclusive), oldest first.
+
+        Without a range every loaded case is returned, undated ones first;
+        with one, undated cases never fall inside it.
+        """
+        return self.overview(start, end)[1]
+
+    def overview(self, start=None, end=None):
+        """(summary(), cases_by_date(), past) of one range, all as of the same moment.
+
+        A range loads the past years it reaches. Without one, past years
+        not loaded yet are counted from their summaries in the shard
+        manifest instead, and ``past`` is case_store.past_year_summaries().
+        The cases are the store's own: read them under case_store.locked().
+        """
+        if start is not None or end is not None:
+            case_store.ensure_dates(start, end)
+        with case_store.locked():
+            past = case_store.past_year_summaries() if start is None and end is None else {}
+            with self._lock:
+                self._catch_up()
+                sums = self._sums(start, end)
+                if start is None and end is None:
+                    cases = list(self._ordered)
+                else:
+                    lo = bisect.bisect_left(self._keys, 1 if start is None else max(start, 1))
+                    hi = len(self._keys) if end is None else bisect.bisect_right(self._keys, end)
+                    cases = self._ordered[lo:hi]
+        for year_summary in past.values():
+            for i in range(5):
+                sums[i] += year_summary["totals"][i]
+        summary = {
+            "total": sums[TOTAL] / 100,
+            "completed": sums[COMPLETED] / 100,
+            "pending": (sums[TOTAL] - sums[COMPLETED]) / 100,
+            "cases": sums[COUNT],
+            "completed_cases": sums[COMPLETED_COUNT],
+            "pending_cases": sums[COUNT] - sums[COMPLETED_COUNT],
+            "approved_cases": sums[APPROVED_COUNT],
+        }
+        return summary, cases, past
+
+    def _sums(self, start, end):
+        if start is None and end is None:
+            return list(self._totals)
+        sums = [0] * 5
+        lo = 0 if start is None else bisect.bisect_left(self._days, start)
+        hi = len(self._days) if end is None else bisect.bisect_right(self._days, end)
+        for day in self._days[lo:hi]:
+            bucket = self._buckets[day]
+            for i in range(5):
+                sums[i] += bucket[i]
+        return sums
+
+
+case_aggregates = CaseAggregates()
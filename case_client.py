@@ -0,0 +1,348 @@
+# case_client.py
+
+import os
+import json
+import gzip
+import time
+import socket
+import threading
+import urllib.parse
+import urllib.error
+import urllib.request
+from PyQt5.QtCore import Qt, pyqtSignal
+from case_record import Case, to_cases, upgrade_record
+from case_store import CaseStore, CaseConflict
+from sync_metrics import sync_metrics
+
+# Seconds the server may hold a GET /events open when nothing changes
+EVENTS_WAIT = 25
+# Seconds between attempts while the case server is unreachable
+RETRY_INTERVAL = 3
+
+
+class CaseClient(CaseStore):
+    """The case store of a desktop in LAN mode (CASE_SERVER is set).
+
+    The cases live in the office's case server (case_server.py); this
+    keeps a full copy in memory with the same API as CaseStore, so the
+    modules do not know the difference. Saves are applied here at once and
+    sent to the server in the background; a listener thread long-polls the
+    server and folds in what the other desktops saved, usually within a
+    fraction of a second. What the threads receive is applied on the GUI
+    thread, so the modules never see the cases change under them.
+
+    Saves the server has not acknowledged yet are kept in
+    ~/.my_app_data/case_outbox.json and resent once it is reachable again.
+    The last copy received from the server (lan_cases.json) lets the app
+    start while the server is down.
+    """
+
+    # (saves not sent to the server yet, server unreachable)
+    status_changed = pyqtSignal(int, bool)
+    # From the background threads: ("all", [case, ...]) or ("cases", {File No.: case or None})
+    _received = pyqtSignal(str, object)
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url.rstrip('/')
+        self.client = f"{socket.gethostname()}:{os.getpid()}"
+        self.mirror_file = os.path.join(self.user_data_folder, 'lan_cases.json')
+        self.outbox_file = os.path.join(self.user_data_folder, 'case_outbox.json')
+        # The server owns SQLite, shards and the journal
+        self.db = None
+
+        # Server change counter this copy is current with; None = needs a full read
+        self.seq = None
+        self.offline = False
+        self.outbox = self._load_outbox()
+        # File Nos. whose server changes were passed over while a save from here was pending
+        self._skipped = set()
+        self._outbox_cond = threading.Condition(self._lock)
+        self._threads = []
+        # Queued: the slot runs on the thread that made the store (the GUI's)
+        self._received.connect(self._on_received, Qt.QueuedConnection)
+
+    # --------------------------------------------------
+    #   SERVER CALLS
+    # --------------------------------------------------
+    def _call(self, path, data=None, timeout=10):
+        body = None if data is None else json.dumps(data, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url + path, data=body, headers={
+            'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            content = response.read()
+            compressed = response.headers.get('Content-Encoding') == 'gzip'
+        sync_metrics.count(requests=1, bytes_up=len(body or b''), bytes_down=len(content))
+        return json.loads(gzip.decompress(content) if compressed else content)
+
+    def _set_offline(self, offline):
+        if offline != self.offline:
+            self.offline = offline
+            print("Case server unreachable; saving locally until it is back" if offline
+                  else "Connected to the case server")
+        self.status_changed.emit(len(self.outbox), self.offline)
+
+    # --------------------------------------------------
+    #   READ
+    # --------------------------------------------------
+    def _read_file(self, on_batch=None):
+        try:
+            with sync_metrics.operation('lan_load'):
+                result = self._call('/cases', timeout=30)
+            records, self.seq = result["cases"], result["seq"]
+            self._write_mirror(records)
+        except Exception as e:
+            print(f"Error loading cases from the case server, using the last copy: {str(e)}")
+            records, self.seq = self._read_mirror(), None
+        self._set_cases(records)
+        if on_batch is not None:
+            on_batch(len(self.cases))
+        self._start_threads()
+
+    def _set_cases(self, records):
+        """Replace the cases with records, unsent saves from here applied on top."""
+        cases = {}
+        for record in records:
+            upgrade_record(record)
+            cases[record.get("File No.", "")] = record
+        with self._lock:
+            for file_no, record in self.outbox.items():
+                if record is None:
+                    cases.pop(file_no, None)
+                else:
+                    cases[file_no] = record
+            self.cases[:] = to_cases(cases.values())
+            self._rebuild_index()
+            self.loaded = True
+
+    def _read_mirror(self):
+        try:
+            with open(self.mirror_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _write_mirror(self, records):
+        temp_file = self.mirror_file + '.tmp'
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False)
+            os.replace(temp_file, self.mirror_file)
+        except OSError as e:
+            print(f"Error saving the local copy of the cases: {str(e)}")
+
+    def changed_on_disk(self):
+        return False
+
+    def data_version(self):
+        # The cases on the server may have changed while this desktop was closed
+        return None
+
+    def refresh(self):
+        # Changes arrive from the server as they happen
+        return []
+
+    # --------------------------------------------------
+    #   WRITE
+    # --------------------------------------------------
+    def _save(self, file_nos=None):
+        # Queue the named cases (all when file_nos is empty) for the server
+        with self._lock:
+            if file_nos:
+                for file_no in file_nos:
+                    case = self._find(file_no)
+                    if case is not None:
+                        case.invalidate()
+                    self.outbox[file_no] = None if case is None else dict(case)
+            else:
+                for case in self.cases:
+                    case.invalidate()
+                    self.outbox[case.get("File No.", "")] = dict(case)
+            self._save_outbox()
+            self._outbox_cond.notify_all()
+        self.status_changed.emit(len(self.outbox), self.offline)
+        self.cases_changed.emit(list(file_nos or []))
+
+    def commit(self, base, record):
+        """CaseStore.commit, checked by the server so edits from every desktop count.
+
+        While the server is unreachable (or an earlier save of the case is
+        still on its way) the check is made against the copy here instead.
+        """
+        file_no = base.get("File No.", "")
+        if self.offline or file_no in self.outbox:
+            return super().commit(base, record)
+        try:
+            with sync_metrics.operation('lan_commit'):
+                result = self._call('/commit', {"client": self.client, "base": base, "record": record})
+        except urllib.error.HTTPError as e:
+            if e.code != 409:
+                raise
+            conflict = json.loads(e.read())
+            raise CaseConflict(file_no, [tuple(c) for c in conflict["conflicts"]], conflict["current"])
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Case server unreachable, checking the edit against the local copy: {str(e)}")
+            self._set_offline(True)
+            return super().commit(base, record)
+
+        saved = result["case"]
+        changed = self._apply({file_no: None, saved["File No."]: saved} if saved["File No."] != file_no
+                              else {file_no: saved})
+        if changed:
+            self.cases_changed.emit(changed)
+        return self.get(saved["File No."])
+
+    def merge_remote(self, file_nos, merge):
+        # Only the case server syncs data.json with GitHub
+        return []
+
+    def flush(self):
+        """Send unsent saves now (on quit); those that fail stay in the outbox."""
+        if self.outbox:
+            try:
+                self._send_outbox()
+            except Exception as e:
+                print(f"Error sending saves to the case server: {str(e)}")
+
+    def compact(self):
+        pass
+
+    def _load_outbox(self):
+        try:
+            with open(self.outbox_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_outbox(self):
+        temp_file = self.outbox_file + '.tmp'
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.outbox, f, ensure_ascii=False)
+            os.replace(temp_file, self.outbox_file)
+        except OSError as e:
+            print(f"Error saving the case outbox: {str(e)}")
+
+    def _send_outbox(self):
+        with self._lock:
+            sending = dict(self.outbox)
+        if not sending:
+            return
+        try:
+            with sync_metrics.operation('lan_save'):
+                self._call('/save', {"client": self.client, "cases": sending})
+        except urllib.error.HTTPError as e:
+            if e.code != 409:
+                raise
+            self._drop_behind(sending, json.loads(e.read())["conflicts"])
+            return
+        with self._lock:
+            # Saved again meanwhile: that newer copy still has to go
+            for file_no, record in sending.items():
+                if file_no in self.outbox and self.outbox[file_no] == record:
+                    del self.outbox[file_no]
+            self._save_outbox()
+            stale = sorted(f for f in self._skipped if f not in self.outbox)
+            self._skipped.difference_update(stale)
+        self._set_offline(False)
+        if stale:
+            # Another desktop saved these while ours was on its way; the server has the last word
+            query = urllib.parse.urlencode([("file_no", file_no) for file_no in stale])
+            self._received.emit("cases", self._call(f'/lookup?{query}')["cases"])
+
+    def _drop_behind(self, sending, current):
+        """Give up saves the server refused as edited from an older copy of the case.
+
+        They were plain saves, made without a base to merge against, so the
+        server's copy is taken; the rest of the outbox is sent again.
+        """
+        with self._lock:
+            for file_no in current:
+                if file_no in self.outbox and self.outbox[file_no] == sending.get(file_no):
+                    del self.outbox[file_no]
+            self._save_outbox()
+        print(f"Case(s) {', '.join(sorted(current))} were saved on another desktop since they were "
+              f"edited here; the edits made here were not saved")
+        self._received.emit("cases", current)
+
+    # --------------------------------------------------
+    #   BACKGROUND THREADS
+    # --------------------------------------------------
+    def _start_threads(self):
+        if self._threads:
+            return
+        for target, name in ((self._sender, 'case-client-send'), (self._listener, 'case-client-listen')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _sender(self):
+        while True:
+            with self._lock:
+                while not self.outbox:
+                    self._outbox_cond.wait()
+            try:
+                self._send_outbox()
+            except Exception as e:
+                print(f"Error sending saves to the case server: {str(e)}")
+                self._set_offline(True)
+                time.sleep(RETRY_INTERVAL)
+
+    def _listener(self):
+        while True:
+            try:
+                if self.seq is None:
+                    result = self._call('/cases', timeout=30)
+                    self._write_mirror(result["cases"])
+                    self._received.emit("all", result["cases"])
+                    self.seq = result["seq"]
+                    self._set_offline(False)
+                    continue
+                query = urllib.parse.urlencode({"since": self.seq, "wait": EVENTS_WAIT})
+                result = self._call(f'/events?{query}', timeout=EVENTS_WAIT + 10)
+                self._set_offline(False)
+                if result.get("reload"):
+                    self.seq = None
+                    continue
+                self._received.emit("cases", result["cases"])
+                self.seq = result["seq"]
+            except Exception as e:
+                print(f"Error listening to the case server: {str(e)}")
+                self._set_offline(True)
+                time.sleep(RETRY_INTERVAL)
+
+    def _on_received(self, kind, records):
+        if kind == "all":
+            self._set_cases(records)
+            self.cases_changed.emit([])
+            return
+        changed = self._apply(records)
+        if changed:
+            self.cases_changed.emit(changed)
+
+    def _apply(self, records):
+        """Fold {File No.: case or None} from the server into the cases; returns the File Nos. that changed."""
+        changed = []
+        with self._lock:
+            for file_no, record in records.items():
+                # A save from here is on its way; it is the newer copy
+                if file_no in self.outbox:
+                    self._skipped.add(file_no)
+                    continue
+                local = self._find(file_no)
+                if record is None:
+                    if local is not None:
+                        self.cases.remove(local)
+                        changed.append(file_no)
+                    continue
+                upgrade_record(record)
+                if local is None:
+                    self.cases.append(Case(record))
+                    changed.append(file_no)
+                elif record != local:
+                    local.clear()
+                    local.update(record)
+                    changed.append(file_no)
+            if changed:
+                self._rebuild_index()
+        return changed
@@ -0,0 +1,103 @@
+# case_conflict.py
+
+import json
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+)
+from case_store import case_store, CaseConflict
+from case_record import merge_case
+
+
+def format_value(value):
+    if value is None:
+        return "(empty)"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, indent=1)
+    return str(value)
+
+
+class CaseConflictDialog(QDialog):
+    """Shows, field by field, where another user's save and this edit disagree."""
+
+    def __init__(self, conflict, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Case {conflict.file_no} Was Changed")
+        self.setGeometry(300, 250, 900, 400)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #fff6ee;
+            }
+            QLabel {
+                font-size: 14px;
+                color: #564234;
+            }
+            QPushButton {
+                font-size: 14px;
+                padding: 6px 14px;
+                border: none;
+                border-radius: 8px;
+                color: white;
+                background-color: #ffa33e;
+            }
+            QPushButton:hover {
+                background-color: #ff8c00;
+            }
+            QHeaderView::section {
+                background-color: #ffa33e;
+                color: white;
+                font-size: 13px;
+                padding: 4px;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        message = QLabel(f"Another user saved case {conflict.file_no} while you were editing it. "
+                         "Your other changes were kept; these fields were changed by both of you:")
+        message.setWordWrap(True)
+        layout.addWidget(message)
+
+        table = QTableWidget(len(conflict.conflicts), 4)
+        table.setHorizontalHeaderLabels(["Field", "Before", "Yours", "Theirs"])
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        for row, values in enumerate(conflict.conflicts):
+            for column, value in enumerate(values):
+                table.setItem(row, column, QTableWidgetItem(value if column == 0 else format_value(value)))
+        table.resizeRowsToContents()
+        layout.addWidget(table)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        mine_button = QPushButton("Keep Mine")
+        mine_button.clicked.connect(self.accept)
+        buttons.addWidget(mine_button)
+        theirs_button = QPushButton("Keep Theirs")
+        theirs_button.clicked.connect(self.reject)
+        buttons.addWidget(theirs_button)
+        layout.addLayout(buttons)
+
+
+def commit_case(parent, base, record):
+    """Save an edited copy of a case through case_store.commit, asking the user about conflicts.
+
+    Returns the saved case, or None when the case was deleted meanwhile.
+    """
+    while True:
+        try:
+            return case_store.commit(base, record)
+        except CaseConflict as conflict:
+            if conflict.current is None:
+                QMessageBox.warning(parent, "Case Deleted", str(conflict) + "; your changes were not saved.")
+                return None
+            keep_mine = CaseConflictDialog(conflict, parent).exec_() == QDialog.Accepted
+            # Both sides' other changes stay; the fields both changed come from the side picked
+            merged = merge_case(base, record, conflict.current)
+            winner = record if keep_mine else conflict.current
+            for field, before, mine, theirs in conflict.conflicts:
+                if field in winner:
+                    merged[field] = winner[field]
+                else:
+                    merged.pop(field, None)
+            base, record = conflict.current, merged
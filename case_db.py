@@ -0,0 +1,271 @@
+# case_db.py
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+from datetime import date
+from case_record import Case, parse_date_ordinal, upgrade_record
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS cases (
+    position       INTEGER PRIMARY KEY,
+    file_no        TEXT NOT NULL,
+    iso_date       TEXT,
+    customer_name  TEXT,
+    mobile_number  TEXT,
+    village        TEXT,
+    payment_status TEXT,
+    work_status    TEXT,
+    party_district TEXT,
+    party_village  TEXT,
+    record         TEXT NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_cases_file_no ON cases(file_no);
+CREATE INDEX IF NOT EXISTS idx_cases_iso_date ON cases(iso_date);
+CREATE INDEX IF NOT EXISTS idx_cases_month ON cases(substr(iso_date, 6, 2));
+CREATE INDEX IF NOT EXISTS idx_cases_customer_name ON cases(customer_name);
+CREATE INDEX IF NOT EXISTS idx_cases_mobile_number ON cases(mobile_number);
+CREATE INDEX IF NOT EXISTS idx_cases_village ON cases(village);
+CREATE INDEX IF NOT EXISTS idx_cases_payment_status ON cases(payment_status);
+CREATE INDEX IF NOT EXISTS idx_cases_work_status ON cases(work_status);
+CREATE INDEX IF NOT EXISTS idx_cases_party_district ON cases(party_district);
+CREATE INDEX IF NOT EXISTS idx_cases_party_village ON cases(party_village);
+"""
+
+# What the indexed columns hold; a database filled by another version is
+# filled again (2: payment_status is derived from the payments)
+COLUMNS_VERSION = "2"
+
+
+def iso_date(date_str):
+    """Convert a case "Date" ("dd/mm/yyyy" or "dd-mm-yyyy") to "yyyy-mm-dd".
+
+    Returns None for anything that is not a valid date.
+    """
+    ordinal = parse_date_ordinal(date_str)
+    return date.fromordinal(ordinal).isoformat() if ordinal else None
+
+
+def _row(case):
+    address = case.get("Party Address")
+    if not isinstance(address, dict):
+        address = {}
+    return (
+        case.get("File No.", ""),
+        iso_date(case.get("Date", "")),
+        case.get("Customer Name", ""),
+        case.get("Mobile Number", ""),
+        case.get("Village", ""),
+        # As the payments page shows it, not the stored field it may not have saved
+        (case if isinstance(case, Case) else Case(case)).derived_payment_status,
+        case.get("Work Status", "Pending"),
+        address.get("District", ""),
+        address.get("Village", ""),
+        json.dumps(case, ensure_ascii=False),
+    )
+
+
+class CaseDatabase:
+    """SQLite storage for cases.
+
+    Every case is kept as its full JSON record, so modules still get the
+    same dicts they would from data.json. The columns next to it exist only
+    to be indexed for filtering.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._conn = None
+        self._lock = threading.RLock()
+
+    def connect(self):
+        with self._lock:
+            if self._conn is None:
+                # Loading runs on the DataLoader thread; access is serialised by _lock
+                self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.executescript(SCHEMA)
+                self._add_missing_columns()
+                self._conn.executescript(INDEXES)
+            return self._conn
+
+    def _add_missing_columns(self):
+        # Databases made before the party address columns existed, or
+        # whose columns an older version filled differently
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cases)")}
+        added = False
+        for column in ("party_district", "party_village"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE cases ADD COLUMN {column} TEXT")
+                added = True
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'columns'").fetchone()
+        if added or row is None or row[0] != COLUMNS_VERSION:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('columns', ?)",
+                                   (COLUMNS_VERSION,))
+                # Forget the source so the next load re-imports and fills them
+                self._conn.execute("DELETE FROM meta WHERE key = 'source'")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --------------------------------------------------
+    #   SNAPSHOT BOOKKEEPING
+    # --------------------------------------------------
+    def _source_stamp(self, json_file):
+        st = os.stat(json_file)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def mark_source(self, json_file):
+        """Record that the database already contains everything in json_file."""
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)",
+                    (self._source_stamp(json_file),)
+                )
+
+    def is_current(self, json_file):
+        """False when json_file changed outside the app (e.g. a download)."""
+        if not os.path.exists(json_file):
+            return True
+        with self._lock:
+            row = self.connect().execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        return row is not None and row[0] == self._source_stamp(json_file)
+
+    # --------------------------------------------------
+    #   READ / WRITE
+    # --------------------------------------------------
+    def load_all(self):
+        """All cases in data.json order."""
+        with self._lock:
+            records = [r[0] for r in self.connect().execute("SELECT record FROM cases ORDER BY position")]
+        # One parse for the whole list instead of one per row
+        return json.loads("[" + ",".join(records) + "]")
+
+    def import_cases(self, cases, json_file=None):
+        """Replace the stored cases with ``cases`` in a single transaction."""
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("DELETE FROM cases")
+                conn.executemany(
+                    "INSERT INTO cases (position, file_no, iso_date, customer_name, mobile_number, village, "
+                    "payment_status, work_status, party_district, party_village, record) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((i,) + _row(case) for i, case in enumerate(cases))
+                )
+            if json_file and os.path.exists(json_file):
+                self.mark_source(json_file)
+
+    def apply(self, changes):
+        """Apply journal-style changes: (file_no, case) pairs, case None = delete."""
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                for file_no, case in changes:
+                    if case is None:
+                        conn.execute("DELETE FROM cases WHERE file_no = ?", (file_no,))
+                        continue
+                    row = conn.execute(
+                        "SELECT MIN(position) FROM cases WHERE file_no = ?", (file_no,)
+                    ).fetchone()
+                    if row[0] is not None:
+                        conn.execute(
+                            "UPDATE cases SET file_no = ?, iso_date = ?, customer_name = ?, mobile_number = ?, "
+                            "village = ?, payment_status = ?, work_status = ?, party_district = ?, "
+                            "party_village = ?, record = ? WHERE position = ?",
+                            _row(case) + (row[0],)
+                        )
+                    else:
+                        conn.execute(
+                            "INSERT INTO cases (position, file_no, iso_date, customer_name, mobile_number, village, "
+                            "payment_status, work_status, party_district, party_village, record) "
+                            "VALUES ((SELECT COALESCE(MAX(position), -1) + 1 FROM cases), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            _row(case)
+                        )
+
+    def query(self, year=None, month=None, day=None, payment_status=None, work_status=None,
+              party_district=None, party_village=None):
+        """File Nos. matching the given date parts, statuses and party address (None = any)."""
+        clauses, params = [], []
+        if year is not None:
+            # Year (and month/day when known) is a prefix range on iso_date
+            prefix = f"{int(year):04d}"
+            if month is not None:
+                prefix += f"-{int(month):02d}"
+                if day is not None:
+                    prefix += f"-{int(day):02d}"
+            clauses.append("iso_date >= ? AND iso_date < ?")
+            params += [prefix, prefix + "~"]
+        if month is not None and year is None:
+            clauses.append("substr(iso_date, 6, 2) = ?")
+            params.append(f"{int(month):02d}")
+        if day is not None and (year is None or month is None):
+            clauses.append("substr(iso_date, 9, 2) = ?")
+            params.append(f"{int(day):02d}")
+        if payment_status is not None:
+            clauses.append("payment_status = ?")
+            params.append(payment_status)
+        if work_status is not None:
+            clauses.append("work_status = ?")
+            params.append(work_status)
+        if party_district is not None:
+            clauses.append("party_district = ?")
+            params.append(party_district)
+        if party_village is not None:
+            clauses.append("party_village = ?")
+            params.append(party_village)
+
+        sql = "SELECT file_no FROM cases"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            return {r[0] for r in self.connect().execute(sql, params)}
+
+
+def migrate_from_json(json_file, db_file):
+    """One-shot import of data.json into a new SQLite database.
+
+    Once the database file exists the app uses it as its storage engine.
+    Returns the number of cases imported.
+    """
+    if os.path.exists(json_file) and os.path.getsize(json_file) > 0:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            cases = json.load(f)
+    else:
+        cases = []
+    for case in cases:
+        upgrade_record(case)
+
+    db = CaseDatabase(db_file)
+    try:
+        db.import_cases(cases, json_file)
+    finally:
+        db.close()
+    return len(cases)
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+
+    user_data_folder = os.path.join(str(Path.home()), '.my_app_data')
+    json_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(user_data_folder, 'data.json')
+    db_file = sys.argv[2] if len(sys.argv) > 2 else os.path.join(user_data_folder, 'cases.db')
+    count = migrate_from_json(json_file, db_file)
+    print(f"Migrated {count} cases from {json_file} to {db_file}")
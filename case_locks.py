@@ -0,0 +1,338 @@
+# case_locks.py
+
+import os
+import json
+import time
+import socket
+import getpass
+import threading
+import urllib.request
+from datetime import datetime
+from PyQt5.QtCore import QObject
+import github
+from github_sync import github_sync
+from sync_metrics import sync_metrics
+
+# Seconds a lease lasts unless renewed; holders renew every LEASE_TTL / 3
+LEASE_TTL = 120
+# Seconds between refreshes of the lease table that is_locked() answers from
+POLL_INTERVAL = 30
+# Lease table in the data repository (GitHub backend)
+LOCKS_FILE = 'case_locks.json'
+
+
+def current_user():
+    try:
+        return os.getlogin()
+    except OSError:
+        return getpass.getuser()
+
+
+class GitHubLockBackend:
+    """Leases kept in one file (case_locks.json) in the data repository.
+
+    Every change is a compare-and-swap on the file's sha, so a batch is
+    granted or refused as a whole even when offices race for it.
+    """
+
+    def __init__(self):
+        self._sha = None
+        self._leases = {}
+
+    def _read(self, refresh=False):
+        sha = github_sync.remote_versions(refresh=refresh).get(LOCKS_FILE)
+        if sha is None:
+            return None, {}
+        if sha != self._sha:
+            self._leases = json.loads(github_sync.read_blob(sha)).get("leases", {})
+            self._sha = sha
+        return sha, dict(self._leases)
+
+    def _update(self, change):
+        """Run change(leases) on the current table and write it back if it returns True."""
+        for attempt in range(3):
+            sha, leases = self._read(refresh=True)
+            now = time.time()
+            leases = {file_no: lease for file_no, lease in leases.items() if lease.get("expires", 0) > now}
+            if not change(leases):
+                return leases
+            content = json.dumps({"leases": leases}, indent=4).encode('utf-8')
+            message = f"Update case locks - {datetime.now()}"
+            try:
+                if sha is None:
+                    new_sha = github_sync.create_remote_file(LOCKS_FILE, content, message)
+                else:
+                    new_sha = github_sync.update_remote_file(LOCKS_FILE, content, sha, message)
+            except github.GithubException as e:
+                if e.status in (409, 422):
+                    sync_metrics.count(retries=1, conflicts=1)
+                    continue  # Another office changed the table first
+                raise
+            self._sha, self._leases = new_sha, leases
+            return leases
+        raise Exception("The case lock table kept changing; please try again")
+
+    def leases(self):
+        now = time.time()
+        return {file_no: lease for file_no, lease in self._read()[1].items() if lease.get("expires", 0) > now}
+
+    def acquire(self, file_nos, lease):
+        conflict = []
+
+        def change(leases):
+            for file_no in file_nos:
+                held = leases.get(file_no)
+                if held is not None and held["client"] != lease["client"]:
+                    conflict.append(dict(held, file_no=file_no))
+                    return False
+            for file_no in file_nos:
+                leases[file_no] = dict(lease)
+            return True
+
+        self._update(change)
+        return (False, conflict[0]) if conflict else (True, None)
+
+    def renew(self, file_nos, lease):
+        lost = []
+
+        def change(leases):
+            for file_no in file_nos:
+                held = leases.get(file_no)
+                if held is not None and held["client"] != lease["client"]:
+                    lost.append(file_no)
+                else:
+                    leases[file_no] = dict(lease)
+            return True
+
+        self._update(change)
+        return lost
+
+    def release(self, file_nos, client):
+        def change(leases):
+            mine = [f for f in file_nos if leases.get(f, {}).get("client") == client]
+            for file_no in mine:
+                del leases[file_no]
+            return bool(mine)
+
+        self._update(change)
+
+
+class ServerLockBackend:
+    """Leases kept by a lock server on the LAN (see lock_server.py)."""
+
+    TIMEOUT = 5
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def _call(self, path, data=None):
+        body = None if data is None else json.dumps(data).encode('utf-8')
+        request = urllib.request.Request(self.url + path, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.TIMEOUT) as response:
+            content = response.read()
+        sync_metrics.count(requests=1, bytes_up=len(body or b''), bytes_down=len(content))
+        return json.loads(content)
+
+    def _local(self, leases):
+        # The server reports time left, so clocks need not agree
+        now = time.time()
+        return {file_no: dict(lease, expires=now + lease.pop("ttl")) for file_no, lease in leases.items()}
+
+    def leases(self):
+        return self._local(self._call('/leases')["leases"])
+
+    def acquire(self, file_nos, lease):
+        result = self._call('/acquire', {"file_nos": file_nos, "owner": lease["owner"],
+                                         "client": lease["client"], "ttl": LEASE_TTL})
+        if result["granted"]:
+            return True, None
+        held = self._local({result["file_no"]: result["held_by"]})[result["file_no"]]
+        return False, dict(held, file_no=result["file_no"])
+
+    def renew(self, file_nos, lease):
+        return self._call('/renew', {"file_nos": file_nos, "owner": lease["owner"],
+                                     "client": lease["client"], "ttl": LEASE_TTL})["lost"]
+
+    def release(self, file_nos, client):
+        self._call('/release', {"file_nos": file_nos, "client": client})
+
+
+class CaseLockManager(QObject):
+    """One lock per case, shared by every office, held as a renewable lease.
+
+    acquire() takes several cases at once, all or none. A lease expires
+    LEASE_TTL seconds after its last renewal, so a crashed app never
+    leaves a case locked for long; while it runs, a background thread
+    renews its leases. That thread also keeps a copy of everyone's leases,
+    so is_locked() and a refused acquire() need no round trip.
+
+    Leases live in the data repository, or on a lock server when
+    CASE_LOCK_SERVER is set (e.g. http://192.168.1.10:8766). In LAN mode
+    the case server (CASE_SERVER) keeps them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        server = os.environ.get('CASE_LOCK_SERVER') or os.environ.get('CASE_SERVER')
+        self.backend = ServerLockBackend(server) if server else GitHubLockBackend()
+        self.owner = current_user()
+        self.client = f"{socket.gethostname()}:{os.getpid()}"
+        # Last known lease table, and how many times this client holds each case
+        self.leases = {}
+        self.held = {}
+        self._releasing = set()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopping = False
+
+    def _lease(self):
+        return {"owner": self.owner, "client": self.client, "expires": time.time() + LEASE_TTL,
+                "acquired": datetime.now().isoformat(timespec='seconds')}
+
+    # --------------------------------------------------
+    #   CHECKS (in memory)
+    # --------------------------------------------------
+    def holder(self, file_no):
+        """The live lease another client holds on file_no, or None."""
+        lease = self.leases.get(file_no)
+        if lease is None or lease["client"] == self.client or lease["expires"] <= time.time():
+            return None
+        return lease
+
+    def is_locked(self, file_no):
+        return self.holder(file_no) is not None
+
+    def holds_any(self):
+        """True while this client holds a case lock, i.e. an edit is in progress."""
+        return bool(self.held)
+
+    # --------------------------------------------------
+    #   ACQUIRE / RELEASE
+    # --------------------------------------------------
+    def acquire(self, file_nos):
+        """Lock all of file_nos for this client, or none of them.
+
+        Returns (True, None), or (False, lease) naming the case
+        ("file_no") and the holder ("owner") that stood in the way.
+        Locks are re-entrant; each acquire needs its own release().
+        """
+        file_nos = [file_no for file_no in dict.fromkeys(file_nos) if file_no]
+        for file_no in file_nos:
+            lease = self.holder(file_no)
+            if lease is not None:
+                return False, dict(lease, file_no=file_no)
+
+        new = [file_no for file_no in file_nos if file_no not in self.held]
+        if new:
+            lease = self._lease()
+            try:
+                with sync_metrics.operation('lock_acquire') as operation:
+                    granted, conflict = self.backend.acquire(new, lease)
+                    if not granted:
+                        operation.fail(f"{conflict['file_no']} is held by {conflict['owner']}")
+            except Exception as e:
+                # Offline: carry on; the heartbeat claims the leases once it gets through
+                print(f"Lock service unreachable, editing {', '.join(new)} without a shared lock: {str(e)}")
+                granted, conflict = True, None
+            if not granted:
+                self.leases[conflict["file_no"]] = conflict
+                return False, conflict
+            for file_no in new:
+                self.leases[file_no] = lease
+
+        with self._cond:
+            for file_no in file_nos:
+                self.held[file_no] = self.held.get(file_no, 0) + 1
+                self._releasing.discard(file_no)
+        self.start()
+        return True, None
+
+    def release(self, file_nos):
+        """Undo one acquire() of file_nos; the leases are dropped in the background."""
+        with self._cond:
+            for file_no in dict.fromkeys(file_nos):
+                count = self.held.get(file_no, 0) - 1
+                if count > 0:
+                    self.held[file_no] = count
+                elif file_no in self.held:
+                    del self.held[file_no]
+                    self.leases.pop(file_no, None)
+                    self._releasing.add(file_no)
+            self._cond.notify_all()
+
+    def release_all(self):
+        """Drop every lease now (on quit)."""
+        with self._cond:
+            file_nos = sorted(set(self.held) | self._releasing)
+            self.held.clear()
+            self._releasing.clear()
+            self._stopping = True
+            self._cond.notify_all()
+        if file_nos:
+            try:
+                self.backend.release(file_nos, self.client)
+            except Exception as e:
+                print(f"Error releasing case locks: {str(e)}")
+
+    # --------------------------------------------------
+    #   HEARTBEAT
+    # --------------------------------------------------
+    def start(self):
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping = False
+                self._worker = threading.Thread(target=self._run, name='case-locks', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        next_renew = time.monotonic() + LEASE_TTL / 3
+        next_poll = 0
+        # Releases wait for this after a failure instead of retrying at once
+        retry_at = 0
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    now = time.monotonic()
+                    due = min(next_poll, next_renew) if self.held else next_poll
+                    if self._releasing:
+                        due = min(due, retry_at)
+                    if due <= now:
+                        break
+                    self._cond.wait(due - now)
+                if self._stopping:
+                    return
+                releasing = sorted(self._releasing)
+                self._releasing.clear()
+                held = sorted(self.held)
+
+            try:
+                if releasing:
+                    with sync_metrics.operation('lock_release'):
+                        self.backend.release(releasing, self.client)
+                if held and time.monotonic() >= next_renew:
+                    next_renew = time.monotonic() + LEASE_TTL / 3
+                    lease = self._lease()
+                    with sync_metrics.operation('lock_renew'):
+                        lost = self.backend.renew(held, lease)
+                    for file_no in held:
+                        if file_no not in lost:
+                            self.leases[file_no] = lease
+                    if lost:
+                        print(f"Case locks taken over by another office: {', '.join(lost)}")
+                if time.monotonic() >= next_poll:
+                    next_poll = time.monotonic() + POLL_INTERVAL
+                    leases = self.backend.leases()
+                    # Our own leases are tracked here; the table may lag behind them
+                    for file_no in self.held:
+                        if file_no in self.leases:
+                            leases[file_no] = self.leases[file_no]
+                    self.leases = leases
+            except Exception as e:
+                print(f"Error syncing case locks: {str(e)}")
+                next_poll = retry_at = time.monotonic() + POLL_INTERVAL
+                with self._cond:
+                    # Retry the releases with the next round
+                    self._releasing.update(f for f in releasing if f not in self.held)
+
+
+case_locks = CaseLockManager()
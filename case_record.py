@@ -0,0 +1,412 @@
+# case_record.py
+
+import sys
+import ast
+import json
+from collections import Counter
+from datetime import date
+
+# Fields whose values repeat across many cases; interning lets every case
+# share one string object per distinct value.
+INTERNED_FIELDS = ("State", "District", "Taluka", "Village", "R.S.No./ Block No.",
+                   "Payment Status", "Work Status")
+INTERNED_LIST_FIELDS = ("Work Types", "Work Done")
+INTERNED_PAYMENT_FIELDS = ("Payment Method", "Status")
+
+# Changing any of these drops the cached derived values
+DERIVED_FROM = ("Date", "Final Amount", "Payments")
+
+# Layout of the records this app writes, stored as "Schema Version".
+# Older records are upgraded once on load (see upgrade_record).
+#   1: "Party Address" is free text, "State: ...\nDistrict: ..." or
+#      "'State': '...', 'District': '...'" (records had no version then)
+#   2: "Party Address" is {"State", "District", "Taluka", "Village"}
+CASE_SCHEMA_VERSION = 2
+PARTY_ADDRESS_FIELDS = ("State", "District", "Taluka", "Village")
+
+# Version stamp of a case, raised by one with every save (see
+# CaseStore.commit); records saved before it existed count as 0
+REVISION_FIELD = "Revision"
+
+# Totals of a group of cases (see contribution_totals): [total paise,
+# completed paise, cases, completed cases, approved cases]
+TOTAL, COMPLETED, COUNT, COMPLETED_COUNT, APPROVED_COUNT = range(5)
+
+_UNSET = object()
+_MISSING = object()
+
+
+def parse_date_ordinal(date_str):
+    """Ordinal of a "dd/mm/yyyy" or "dd-mm-yyyy" date, or None if invalid."""
+    parts = (date_str or "").replace("-", "/").split("/")
+    if len(parts) != 3:
+        return None
+    try:
+        return date(int(parts[2]), int(parts[1]), int(parts[0])).toordinal()
+    except ValueError:
+        return None
+
+
+def to_paise(amount):
+    """Convert an amount string such as "1000.00" (or blank) to integer paise."""
+    if isinstance(amount, str):
+        amount = amount.replace(",", "").strip()
+    try:
+        return round(float(amount or 0) * 100)
+    except (TypeError, ValueError):
+        return 0
+
+
+def intern_record(record):
+    """Intern the repeated string values of a case record, in place."""
+    for key in INTERNED_FIELDS:
+        value = dict.get(record, key)
+        if type(value) is str:
+            dict.__setitem__(record, key, sys.intern(value))
+    for key in INTERNED_LIST_FIELDS:
+        values = dict.get(record, key)
+        if type(values) is list:
+            values[:] = [sys.intern(v) if type(v) is str else v for v in values]
+    address = dict.get(record, "Party Address")
+    if type(address) is dict:
+        for key, value in address.items():
+            if type(value) is str:
+                address[key] = sys.intern(value)
+    for payment in dict.get(record, "Payments") or ():
+        for key in INTERNED_PAYMENT_FIELDS:
+            value = payment.get(key)
+            if type(value) is str:
+                payment[key] = sys.intern(value)
+
+
+def intern_records(records):
+    for record in records:
+        intern_record(record)
+    return records
+
+
+def parse_party_address(value):
+    """Structured form of a "Party Address" in any layout the app has written.
+
+    Combo box placeholders such as "Select District" become "".
+    """
+    if isinstance(value, dict):
+        parts = value
+    elif isinstance(value, str) and value.strip():
+        text = value.strip()
+        try:
+            parts = ast.literal_eval(text if text.startswith("{") else "{" + text + "}")
+        except (ValueError, SyntaxError):
+            parts = None
+        if not isinstance(parts, dict):
+            parts = {}
+            for line in text.split("\n"):
+                key, sep, item = line.partition(":")
+                if sep:
+                    parts[key.strip()] = item.strip()
+        if not parts:
+            # Typed by hand in no known layout; keep it rather than lose it
+            parts = {"Address": text}
+    else:
+        parts = {}
+
+    address = {}
+    for key in PARTY_ADDRESS_FIELDS + tuple(k for k in parts if k not in PARTY_ADDRESS_FIELDS):
+        item = str(parts.get(key) or "").strip()
+        address[str(key)] = "" if item.startswith("Select ") else item
+    return address
+
+
+def format_party_address(address):
+    """"State: ...\nDistrict: ..." text of a structured address, for display."""
+    return "\n".join(f"{key}: {value}" for key, value in (address or {}).items() if value)
+
+
+def upgrade_record(record):
+    """Bring a record up to CASE_SCHEMA_VERSION in place; True if it changed."""
+    if record.get("Schema Version", 1) >= CASE_SCHEMA_VERSION:
+        return False
+    record["Party Address"] = parse_party_address(record.get("Party Address"))
+    record["Schema Version"] = CASE_SCHEMA_VERSION
+    return True
+
+
+def to_cases(records, interned=False):
+    """Wrap a parsed data.json list into Case records.
+
+    ``interned`` skips interning for records that already went through
+    intern_records (e.g. straight from the snapshot cache).
+    """
+    if interned:
+        return [Case.from_interned(record) for record in records]
+    return [Case(record) for record in records]
+
+
+def case_revision(record):
+    try:
+        return int(record.get(REVISION_FIELD) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _item_key(item):
+    # List items are dicts (payments), so they are counted by their JSON
+    return json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _item_counts(items):
+    return Counter(map(_item_key, items))
+
+
+def merge_list(base, local, remote):
+    """Keep items added on either side and drop items removed on either side.
+
+    Lists are merged as multisets: two identical instalments are two
+    payments, so an item is kept as many times as base had it plus what
+    each side added (fewer if either side removed some).
+    """
+    l, r = _item_counts(local), _item_counts(remote)
+    # Without a base, what both sides hold is taken to be the same items
+    b = _item_counts(base) if isinstance(base, list) else l & r
+    wanted = {key: max(0, l[key] + r[key] - b[key]) for key in set(l) | set(r)}
+    merged, taken = [], Counter()
+    # Local order first, then what only remote added
+    for item in list(local) + list(remote):
+        key = _item_key(item)
+        if taken[key] < wanted.get(key, 0):
+            merged.append(item)
+            taken[key] += 1
+    return merged
+
+
+def _merge_json(base, local, remote):
+    if local == remote or remote == base:
+        return local
+    if local == base:
+        return remote
+    if isinstance(local, list) and isinstance(remote, list) and (base is _MISSING or isinstance(base, list)):
+        return merge_list(None if base is _MISSING else base, local, remote)
+    if isinstance(local, dict) and isinstance(remote, dict) and (base is _MISSING or isinstance(base, dict)):
+        base = {} if base is _MISSING else base
+        merged = {}
+        for key in list(local) + [key for key in remote if key not in local]:
+            value = _merge_json(base.get(key, _MISSING), local.get(key, _MISSING), remote.get(key, _MISSING))
+            if value is not _MISSING:
+                merged[key] = value
+        return merged
+    if local is _MISSING or remote is _MISSING:
+        # Edited on one side, deleted on the other: the edit survives
+        return remote if local is _MISSING else local
+    raise ValueError(f"both sides changed {json.dumps(local, ensure_ascii=False, default=str)[:60]}")
+
+
+def merge_json(base, local, remote):
+    """Three-way merge of two parsed JSON documents (base None when they share no version).
+
+    Dicts are merged key by key and lists as in merge_list; raises
+    ValueError when both sides changed the same value differently.
+    """
+    return _merge_json(_MISSING if base is None else base, local, remote)
+
+
+def merge_case(base, local, remote):
+    """Three-way merge of one case (None = the case does not exist on that side).
+
+    Fields changed on one side only are taken from that side; lists such as
+    "Payments" keep the additions of both. When both sides changed the same
+    field to different values the local value wins, and is uploaded next.
+    """
+    if local == base:
+        return remote
+    if remote == base or remote == local:
+        return local
+    if local is None or remote is None:
+        # Edited on one side, deleted on the other: the edit survives
+        return local if local is not None else remote
+
+    base = base or {}
+    merged = dict(local)
+    for key in set(base) | set(remote):
+        b, l, r = base.get(key, _MISSING), local.get(key, _MISSING), remote.get(key, _MISSING)
+        if r == b or r == l:
+            continue
+        if l == b:
+            if r is _MISSING:
+                merged.pop(key, None)
+            else:
+                merged[key] = r
+        elif isinstance(l, list) and isinstance(r, list):
+            merged[key] = merge_list(None if b is _MISSING else b, l, r)
+    # Newer than both sides, so an editor holding either one sees the change
+    merged[REVISION_FIELD] = max(case_revision(local), case_revision(remote))
+    if merged != local and merged != remote:
+        merged[REVISION_FIELD] += 1
+    return merged
+
+
+def field_conflicts(base, mine, theirs):
+    """Fields both sides changed from base, to different values: [(field, base, mine, theirs)].
+
+    Missing fields are reported as None. Lists are merged item by item
+    (see merge_list), so they only conflict when both sides replaced the
+    same item, e.g. edited one payment differently.
+    """
+    conflicts = []
+    for key in sorted(set(base) | set(mine) | set(theirs)):
+        if key == REVISION_FIELD:
+            continue
+        b, m, t = base.get(key, _MISSING), mine.get(key, _MISSING), theirs.get(key, _MISSING)
+        if m == b or t == b or m == t:
+            continue
+        if isinstance(m, list) and isinstance(t, list) and (b is _MISSING or isinstance(b, list)):
+            mc, tc = _item_counts(m), _item_counts(t)
+            bc = _item_counts(b) if isinstance(b, list) else mc & tc
+            replaced = any(mc[key] < bc[key] and tc[key] < bc[key] for key in bc)
+            added_mine = any(mc[key] > bc[key] and mc[key] > tc[key] for key in mc)
+            added_theirs = any(tc[key] > bc[key] and tc[key] > mc[key] for key in tc)
+            if not (replaced and added_mine and added_theirs):
+                continue
+        conflicts.append(tuple(None if v is _MISSING else v for v in (key, b, m, t)))
+    return conflicts
+
+
+def case_sort_key(case):
+    """Sort key by case date; cases without a valid date sort first."""
+    return case.date_ordinal or 0
+
+
+def contribution(case):
+    """(day ordinal or None, final paise, completed, approved) of one case."""
+    completed = case.get("Payment Status", "").lower() in ("completed", "done")
+    approved = case.get("Work Status", "").lower() == "approved"
+    return case.date_ordinal, case.final_paise, completed, approved
+
+
+def contribution_totals(item):
+    """What a contribution() adds to totals laid out as TOTAL ... APPROVED_COUNT."""
+    day, paise, completed, approved = item
+    return (paise, paise if completed else 0, 1, 1 if completed else 0, 1 if approved else 0)
+
+
+class Case(dict):
+    """A case record with its derived fields parsed once.
+
+    It is still a dict with the same keys as data.json, so ``case.get(...)``
+    and json.dump keep working. The date ordinal and paise totals are
+    computed on first use and dropped when "Date", "Final Amount" or
+    "Payments" is replaced. Edits made inside the "Payments" list are
+    picked up when the case is saved through the case store.
+    """
+
+    __slots__ = ("_date_ordinal", "_final_paise", "_paid_paise")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        intern_record(self)
+        self.invalidate()
+
+    @classmethod
+    def from_interned(cls, record):
+        case = cls.__new__(cls)
+        dict.update(case, record)
+        case.invalidate()
+        return case
+
+    def __reduce__(self):
+        # Pickle as plain data; the caches are rebuilt on first use
+        return (Case, (dict(self),))
+
+    def invalidate(self):
+        """Forget the cached derived values."""
+        self._date_ordinal = _UNSET
+        self._final_paise = _UNSET
+        self._paid_paise = _UNSET
+
+    # --------------------------------------------------
+    #   DICT API (keeps the caches honest)
+    # --------------------------------------------------
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key in DERIVED_FROM:
+            self.invalidate()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        if key in DERIVED_FROM:
+            self.invalidate()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        intern_record(self)
+        self.invalidate()
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        if key in DERIVED_FROM:
+            self.invalidate()
+        return value
+
+    def pop(self, key, *args):
+        value = super().pop(key, *args)
+        if key in DERIVED_FROM:
+            self.invalidate()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.invalidate()
+        return item
+
+    def clear(self):
+        super().clear()
+        self.invalidate()
+
+    # --------------------------------------------------
+    #   DERIVED FIELDS
+    # --------------------------------------------------
+    @property
+    def date_ordinal(self):
+        """The case "Date" as a date ordinal, or None when it is not a valid date."""
+        if self._date_ordinal is _UNSET:
+            self._date_ordinal = parse_date_ordinal(self.get("Date", ""))
+        return self._date_ordinal
+
+    @property
+    def final_paise(self):
+        if self._final_paise is _UNSET:
+            self._final_paise = to_paise(self.get("Final Amount", "0"))
+        return self._final_paise
+
+    @property
+    def paid_paise(self):
+        if self._paid_paise is _UNSET:
+            self._paid_paise = sum(to_paise(p.get("Amount Paid", "0")) for p in self.get("Payments", []))
+        return self._paid_paise
+
+    @property
+    def remaining_paise(self):
+        return self.final_paise - self.paid_paise
+
+    @property
+    def final_amount(self):
+        return self.final_paise / 100
+
+    @property
+    def paid_amount(self):
+        return self.paid_paise / 100
+
+    @property
+    def remaining_amount(self):
+        return self.remaining_paise / 100
+
+    @property
+    def derived_payment_status(self):
+        """Payment Status implied by the payments made against Final Amount."""
+        paid = self.paid_paise
+        if paid == 0:
+            return "Pending"
+        if paid < self.final_paise:
+            return "Half Paid"
+        if paid > self.final_paise:
+            return "Overpayment"
+        return "Completed"
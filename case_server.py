@@ -0,0 +1,221 @@
+# case_server.py
+#
+# LAN mode: one process per office owns the cases and the case locks, and
+# the desktops work through it instead of each keeping and syncing its own
+# data.json:
+#
+#     python case_server.py [port]
+#     CASE_SERVER=http://<server>:8767 python main.py
+#
+# The server keeps the case store of the account it runs under
+# (~/.my_app_data) and is the only one syncing data.json with GitHub. The
+# desktops learn about each other's saves by long-polling GET /events.
+#
+#     GET  /cases                       every case, with the current seq
+#     GET  /lookup?file_no=...          {File No.: case or null}
+#     GET  /events?since=seq&wait=25    cases changed after seq, or reload
+#     POST /save {"client", "cases": {File No.: case or null}}   revisions set here,
+#                                       409 with the current copies when one is behind
+#     POST /commit {"client", "base", "record"}   409 with the conflicts
+#     GET  /leases, POST /acquire /renew /release    as lock_server.py
+
+import sys
+import gzip
+import json
+import signal
+import time
+import threading
+import urllib.parse
+from collections import deque
+from http.server import ThreadingHTTPServer
+from PyQt5.QtCore import QCoreApplication, QTimer
+from lock_server import LeaseTable, LockHandler
+from case_store import CaseConflict
+from case_record import REVISION_FIELD, case_revision
+
+DEFAULT_PORT = 8767
+# Longest a GET /events is held open
+MAX_WAIT = 60
+
+
+class ChangeFeed:
+    """A numbered log of the File Nos. each save touched.
+
+    Only the File Nos. are kept; readers get the cases as they are now, so
+    a case saved twice is sent once. None marks "everything may have
+    changed", as do numbers already dropped from the log.
+    """
+
+    KEEP = 5000
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.events = deque(maxlen=self.KEEP)
+
+    def publish(self, file_nos):
+        with self.cond:
+            self.seq += 1
+            self.events.append((self.seq, list(file_nos) or None))
+            self.cond.notify_all()
+
+    def since(self, seq, wait):
+        """(current seq, File Nos. changed after seq or None for all), waiting up to wait seconds."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq != seq, timeout=wait)
+            if seq > self.seq or (self.events and self.events[0][0] > seq + 1):
+                # From before a restart, or too far behind
+                return self.seq, None
+            file_nos = set()
+            for number, changed in self.events:
+                if number > seq:
+                    if changed is None:
+                        return self.seq, None
+                    file_nos.update(changed)
+            return self.seq, file_nos
+
+
+class CaseHandler(LockHandler):
+    store = None
+    feed = None
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        compress = len(body) > 1024 and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        if compress:
+            body = gzip.compress(body, 6)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def records(self, file_nos):
+        records = {}
+        with self.store._lock:
+            for file_no in file_nos:
+                case = self.store.get(file_no)
+                records[file_no] = None if case is None else dict(case)
+        return records
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        path = url.path.rstrip('/')
+        try:
+            if path == '/cases':
+                # seq first: whatever is published after it is sent again with the next events
+                seq = self.feed.seq
+                with self.store._lock:
+                    cases = [dict(case) for case in self.store.ensure_loaded()]
+                return self.send_json(200, {"seq": seq, "cases": cases})
+            if path == '/lookup':
+                return self.send_json(200, {"cases": self.records(params.get("file_no", []))})
+            if path == '/events':
+                since = int(params.get("since", ["0"])[0])
+                wait = min(float(params.get("wait", ["25"])[0]), MAX_WAIT)
+                seq, file_nos = self.feed.since(since, wait)
+                if file_nos is None:
+                    return self.send_json(200, {"seq": seq, "reload": True})
+                return self.send_json(200, {"seq": seq, "cases": self.records(sorted(file_nos))})
+        except ValueError as e:
+            return self.send_json(400, {"message": str(e)})
+        super().do_GET()
+
+    def do_POST(self):
+        if self.path not in ('/save', '/commit'):
+            return super().do_POST()
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            if self.path == '/commit':
+                base, record = dict(data["base"]), dict(data["record"])
+            else:
+                cases = data["cases"]
+                if not isinstance(cases, dict):
+                    raise TypeError("cases must map File No. to a case or null")
+        except (ValueError, KeyError, TypeError) as e:
+            return self.send_json(400, {"message": str(e)})
+
+        if self.path == '/commit':
+            try:
+                saved = self.store.commit(base, record)
+            except CaseConflict as e:
+                print(f"/commit {e.file_no} by {data.get('client')}: {str(e)}")
+                return self.send_json(409, {"conflicts": e.conflicts, "current": e.current})
+            print(f"/commit {saved.get('File No.')} by {data.get('client')}")
+            return self.send_json(200, {"case": dict(saved)})
+
+        def take(file_no, local):
+            # Revisions are given out here: two desktops saving the same case
+            # would both send the same next revision
+            record = cases[file_no]
+            if record is None:
+                return None
+            record = dict(record)
+            record[REVISION_FIELD] = case_revision(local) if local is not None else 0
+            if record != local:
+                record[REVISION_FIELD] += 1
+            return record
+
+        with self.store.locked():
+            # A record edited from an older copy than the one here would undo
+            # the saves made since, so none of the batch is taken then
+            behind = {}
+            for file_no, record in cases.items():
+                local = self.store.get(file_no)
+                if (record is not None and local is not None and case_revision(record) <= case_revision(local)
+                        and dict(record, **{REVISION_FIELD: 0}) != dict(local, **{REVISION_FIELD: 0})):
+                    behind[file_no] = dict(local)
+            if behind:
+                print(f"/save {sorted(behind)} by {data.get('client')}: behind the server's copy")
+                return self.send_json(409, {"conflicts": behind})
+            changed = self.store.merge_remote(list(cases), take)
+        if changed:
+            print(f"/save {changed} by {data.get('client')}")
+        self.send_json(200, {"seq": self.feed.seq, "changed": changed})
+
+
+def main(port=DEFAULT_PORT):
+    app = QCoreApplication(sys.argv)
+
+    from case_store import case_store, CASE_SERVER
+    if CASE_SERVER:
+        sys.exit("CASE_SERVER is set: this would be a client of another case server")
+    import case_sync  # noqa: F401 (registers the data.json sync handler)
+    import chunk_store  # noqa: F401 (registers the chunked file handler)
+    from sync_queue import sync_queue
+    from startup_sync import startup_sync
+    from replica import replica
+
+    # GitHub stays in step in the background, like on a desktop; the first
+    # run has to wait for data.json to arrive
+    sync_queue.start()
+    startup_sync.start()
+    while not startup_sync.local_copies_ready():
+        app.processEvents()
+        time.sleep(0.05)
+
+    print("Loading cases...")
+    case_store.ensure_year()
+    feed = ChangeFeed()
+    case_store.cases_changed.connect(feed.publish)
+    app.aboutToQuit.connect(case_store.flush)
+    # Ctrl+C quits through Qt so pending saves are written first
+    signal.signal(signal.SIGINT, lambda *args: app.quit())
+    idle = QTimer()
+    idle.timeout.connect(lambda: None)
+    idle.start(500)
+    replica.start()
+
+    handler = type('Handler', (CaseHandler,), {'table': LeaseTable(), 'store': case_store, 'feed': feed})
+    server = ThreadingHTTPServer(('0.0.0.0', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Case server with {len(case_store.cases)} cases on port {port}")
+    sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT)
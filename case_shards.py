@@ -0,0 +1,154 @@
+# case_shards.py
+
+import os
+import json
+import threading
+from datetime import date
+from case_record import (parse_date_ordinal, intern_records, Case, case_sort_key,
+                         contribution, contribution_totals)
+import snapshot_cache
+
+# Bump whenever the shard layout changes; older shards are then rebuilt
+SHARD_FORMAT_VERSION = 1
+
+# Oldest pending and finalized cases kept per year in the manifest
+SUMMARY_ROWS = 10
+
+
+def record_year(record):
+    """Year of a case's "Date", or None when it has no valid date."""
+    ordinal = parse_date_ordinal(record.get("Date", ""))
+    return date.fromordinal(ordinal).year if ordinal else None
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def group_by_year(records):
+    """{year: [records]} keeping file order within each year (None = undated)."""
+    groups = {}
+    for record in records:
+        groups.setdefault(record_year(record), []).append(record)
+    return groups
+
+
+def ordered_by_year(records):
+    """Records grouped undated first, then by ascending year, otherwise in file order."""
+    groups = group_by_year(records)
+    ordered = groups.pop(None, [])
+    for year in sorted(groups):
+        ordered.extend(groups[year])
+    return ordered
+
+
+def year_summary(records):
+    """What the dashboard shows of a year without loading it.
+
+    "totals" as case_record.contribution_totals adds them up; "pending"
+    and "finalized" are the oldest SUMMARY_ROWS records of each;
+    "customers" the names the add entry form suggests.
+    """
+    totals = [0] * 5
+    pending, finalized = [], []
+    customers = set()
+    for case in sorted(map(Case, records), key=case_sort_key):
+        item = contribution(case)
+        for i, value in enumerate(contribution_totals(item)):
+            totals[i] += value
+        rows = finalized if item[2] else pending
+        if len(rows) < SUMMARY_ROWS:
+            rows.append(dict(case))
+        if case.get("Customer Name"):
+            customers.add(case["Customer Name"])
+    return {"totals": totals, "pending": pending, "finalized": finalized, "customers": sorted(customers)}
+
+
+class CaseShards:
+    """Per-year copies of data.json under ``folder``.
+
+    data.json stays the file that is synced and edited; the shards are
+    derived from it so the current year can be loaded without parsing
+    every past year. ``manifest.json`` records which data.json the shards
+    were cut from, and is written last so a half-written set is never
+    mistaken for a current one.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.manifest_file = os.path.join(folder, 'manifest.json')
+        self._write_lock = threading.RLock()
+
+    def shard_file(self, year):
+        return os.path.join(self.folder, f"cases-{'undated' if year is None else year}.json")
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get("format") != SHARD_FORMAT_VERSION:
+            return None
+        return manifest
+
+    def is_current(self, source_file):
+        """True when the shards were cut from source_file as it is now."""
+        manifest = self.read_manifest()
+        try:
+            return manifest is not None and manifest.get("source") == source_stamp(source_file)
+        except OSError:
+            return False
+
+    def read(self, year):
+        """Interned records of one shard (through the snapshot cache)."""
+        return snapshot_cache.load_json(self.shard_file(year), prepare=intern_records)
+
+    def write(self, records, stamp):
+        """Replace the shards with ``records``, the contents of data.json as of ``stamp``; returns the new manifest."""
+        with self._write_lock:
+            os.makedirs(self.folder, exist_ok=True)
+            if os.path.exists(self.manifest_file):
+                os.remove(self.manifest_file)
+
+            groups = group_by_year(records)
+            wanted = set()
+            for year, group in groups.items():
+                shard_file = self.shard_file(year)
+                wanted.add(os.path.basename(shard_file))
+                tmp_file = f"{shard_file}.{os.getpid()}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(group, f, ensure_ascii=False)
+                os.replace(tmp_file, shard_file)
+                try:
+                    snapshot_cache.store(shard_file, intern_records(group))
+                except Exception as e:
+                    print(f"Error updating shard snapshot cache: {str(e)}")
+
+            # Years that no longer have any cases
+            for name in os.listdir(self.folder):
+                if name.startswith("cases-") and name.endswith(".json") and name not in wanted:
+                    os.remove(os.path.join(self.folder, name))
+
+            manifest = {
+                "format": SHARD_FORMAT_VERSION,
+                "source": stamp,
+                "years": {str(year): len(group) for year, group in groups.items() if year is not None},
+                "undated": len(groups.get(None, [])),
+                "summaries": {str(year): year_summary(group) for year, group in groups.items() if year is not None},
+            }
+            tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_file, self.manifest_file)
+            return manifest
+
+    def rebuild_from(self, source_file):
+        """Cut the shards from source_file's current contents."""
+        with self._write_lock:
+            # stat before reading: if the file changes meanwhile the shards are just stale
+            stamp = source_stamp(source_file)
+            with open(source_file, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            self.write(records, stamp)
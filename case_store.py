@@ -0,0 +1,747 @@
+# case_store.py
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from PyQt5.QtCore import QObject, pyqtSignal
+from sync_queue import sync_queue
+from datetime import date
+from case_db import CaseDatabase
+from case_record import (Case, to_cases, intern_records, upgrade_record, merge_case, field_conflicts,
+                         case_revision, REVISION_FIELD)
+from case_shards import CaseShards, ordered_by_year, source_stamp
+import snapshot_cache
+from json_stream import iter_json_batches
+
+# URL of the office's case server (see case_server.py); unset = this desktop keeps its own store
+CASE_SERVER = os.environ.get('CASE_SERVER')
+
+
+class CaseConflict(Exception):
+    """A conditional save found the case changed by someone else since it was read.
+
+    ``conflicts`` lists the fields both sides changed as (field, original,
+    mine, theirs); ``current`` is the case as it is now, or None when it
+    was deleted.
+    """
+
+    def __init__(self, file_no, conflicts, current):
+        self.file_no = file_no
+        self.conflicts = conflicts
+        self.current = current
+        if current is None:
+            message = f"Case {file_no} was deleted by another user"
+        else:
+            message = f"Case {file_no} was changed by another user: {', '.join(c[0] for c in conflicts)}"
+        super().__init__(message)
+
+
+def _superseded(record, loaded, deleted):
+    # A shard record is stale once its File No. is loaded or was deleted
+    file_no = record.get("File No.", "")
+    return bool(file_no) and (file_no in loaded or file_no in deleted)
+
+
+class CaseStore(QObject):
+    """Owns the parsed cases from data.json so every module shares one copy.
+
+    data.json is the snapshot. Single-case saves are appended to
+    data.journal as upsert/delete lines keyed by "File No." and a background
+    compaction folds the journal back into the snapshot. Saves arriving
+    within COALESCE_WINDOW of each other share one compaction; flush()
+    forces it (e.g. on quit).
+
+    If ``cases.db`` exists (see case_db.py for the migrator) the cases are
+    also kept in SQLite: it is loaded instead of data.json while the two
+    agree, and query() is answered from its indexes.
+
+    Without SQLite, data.json is also cut into per-year shards (see
+    case_shards.py). Undated cases and the current year load eagerly; past
+    years are added to the list when a filter, search or lookup first
+    reaches them (ensure_year()).
+    """
+
+    # File Nos. touched by a save; an empty list means "everything may have changed"
+    cases_changed = pyqtSignal(list)
+
+    # Cases per on_batch callback while streaming data.json
+    STREAM_BATCH_SIZE = 2000
+
+    # Seconds a journaled save waits for others before data.json is rewritten
+    COALESCE_WINDOW = 2.0
+
+    def __init__(self):
+        super().__init__()
+        self.user_data_folder = os.path.join(str(Path.home()), '.my_app_data')
+        self.data_file = os.path.join(self.user_data_folder, 'data.json')
+        self.journal_file = os.path.join(self.user_data_folder, 'data.journal')
+        self.db_file = os.path.join(self.user_data_folder, 'cases.db')
+        self.shards = CaseShards(os.path.join(self.user_data_folder, 'shards'))
+        os.makedirs(self.user_data_folder, exist_ok=True)
+
+        # Optional SQLite engine, enabled by migrating data.json into cases.db
+        self.db = CaseDatabase(self.db_file) if os.path.exists(self.db_file) else None
+
+        # The list object never changes identity, so modules holding a
+        # reference to it always see the current cases.
+        self.cases = []
+        self.loaded = False
+        self._index = {}
+        self._lock = threading.RLock()
+
+        # Past years whose shard is not in self.cases yet, and File Nos.
+        # deleted while their year may still be sitting in such a shard
+        self._unloaded_years = set()
+        self._tombstones = set()
+        # Per-year summaries from the shard manifest (see past_year_summaries)
+        self._year_summaries = {}
+
+        # mtime/size of data.json as last read or written here, so changes
+        # made outside this process can be told apart from our own
+        self._disk_stamp = None
+
+        # Write scheduler: pending changes, when they are due, and whether the
+        # compaction worker is running
+        self._dirty = False
+        self._due = 0.0
+        self._compacting = False
+        self._write_cond = threading.Condition(self._lock)
+
+    # --------------------------------------------------
+    #   READ
+    # --------------------------------------------------
+    def ensure_loaded(self, on_batch=None):
+        """Return the shared case list, parsing data.json on first use only.
+
+        When data.json has to be parsed from scratch and ``on_batch`` is
+        given, cases are streamed into the list and ``on_batch(count)`` is
+        called after each batch so callers can show partial results.
+        """
+        with self._lock:
+            if not self.loaded:
+                self._read_file(on_batch)
+            return self.cases
+
+    def reload(self):
+        """Re-parse data.json (e.g. after a download) and notify all modules."""
+        with self._lock:
+            self._read_file()
+        self.cases_changed.emit([])
+        return self.cases
+
+    def _read_file(self, on_batch=None):
+        self._unloaded_years = set()
+        self._tombstones = set()
+        self._year_summaries = {}
+        self._disk_stamp = self._current_stamp()
+        if self.db is not None and self.db.is_current(self.data_file) and not self._journal_pending():
+            self.cases[:] = to_cases(self.db.load_all())
+            self._rebuild_index()
+            self.loaded = True
+            if self._upgrade_schema(self.cases):
+                self.db.import_cases(self.cases)
+                self._schedule_compaction()
+            return
+
+        sharded = False
+        if not (os.path.exists(self.data_file) and os.path.getsize(self.data_file) > 0):
+            self.cases[:] = []
+        elif self.db is None and self.shards.is_current(self.data_file) and self._read_current_shards(on_batch):
+            sharded = True
+        elif on_batch is not None and not snapshot_cache.is_current(self.data_file):
+            self._stream_file(on_batch)
+        else:
+            # Parsed Case records come from the snapshot cache when data.json is unchanged
+            self.cases[:] = to_cases(snapshot_cache.load_json(self.data_file, prepare=intern_records), interned=True)
+        self._rebuild_index()
+        self.loaded = True
+
+        # Changes that were journaled but not yet compacted (e.g. the app
+        # closed right after a save) are replayed on top of the snapshot.
+        replayed = self._replay_journal()
+        if replayed:
+            # The shards are behind the journal until compaction cuts new ones
+            self._year_summaries = {}
+        upgraded = self._upgrade_schema(self.cases)
+        if self.db is not None:
+            # data.json was replaced (e.g. downloaded) or the journal was not
+            # folded in yet; bring the database in line with it.
+            self.db.import_cases(self.cases, None if replayed or upgraded else self.data_file)
+        if replayed or upgraded:
+            # Compaction cuts new shards as well
+            self._schedule_compaction()
+        elif self.db is None and not sharded and self.cases:
+            self._rebuild_shards_in_background()
+
+    def _current_stamp(self):
+        try:
+            return source_stamp(self.data_file)
+        except OSError:
+            return None
+
+    def data_version(self):
+        """Identifies the cases on disk (data.json and its journal) without reading them; None if unknown."""
+        try:
+            journal = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+            return f"{source_stamp(self.data_file)}:{journal}"
+        except OSError:
+            return None
+
+    def changed_on_disk(self):
+        """True when data.json was replaced since it was last read or written here."""
+        return self.loaded and self._current_stamp() != self._disk_stamp
+
+    def refresh(self):
+        """Pick up a data.json changed outside this process (e.g. downloaded).
+
+        Unlike reload(), unchanged cases keep their objects and modules are
+        only notified, with the File Nos. involved, when some case actually
+        differs. Returns those File Nos.
+        """
+        with self._lock:
+            # A background compaction is rewriting it; its stamp is recorded when done
+            if self._compacting or not self.changed_on_disk():
+                return []
+            previous = {}
+            for case in self.cases:
+                previous.setdefault(case.get("File No.", ""), case)
+            saved = (list(self.cases), self._unloaded_years, self._tombstones, self._disk_stamp)
+            try:
+                self._read_file()
+            except Exception:
+                # e.g. caught mid-download; keep what we had and retry later
+                self.cases[:], self._unloaded_years, self._tombstones, self._disk_stamp = saved
+                self._rebuild_index()
+                raise
+
+            changed = []
+            merged = []
+            for case in self.cases:
+                file_no = case.get("File No.", "")
+                old = previous.pop(file_no, None) if file_no else None
+                if old is None:
+                    merged.append(case)
+                    changed.append(file_no)
+                    continue
+                if old != case:
+                    old.clear()
+                    old.update(case)
+                    changed.append(file_no)
+                merged.append(old)
+            # Whatever is left was deleted
+            changed.extend(file_no for file_no in previous if file_no)
+            self.cases[:] = merged
+            self._rebuild_index()
+
+        if changed:
+            self.cases_changed.emit(changed)
+        return changed
+
+    def _read_current_shards(self, on_batch):
+        # Shards come in newest first: undated and current (or later) years
+        # now, every other year on demand
+        current_year = date.today().year
+        manifest = self.shards.read_manifest() or {}
+        years = sorted((int(year) for year in manifest.get("years", {})), reverse=True)
+        eager = ([None] if manifest.get("undated") else []) + [y for y in years if y >= current_year]
+        try:
+            self.cases[:] = []
+            with snapshot_cache.paused_gc():
+                for year in eager:
+                    self.cases.extend(to_cases(self.shards.read(year), interned=True))
+                    if on_batch is not None:
+                        on_batch(len(self.cases))
+        except (OSError, ValueError, EOFError) as e:
+            print(f"Error reading case shards, falling back to data.json: {str(e)}")
+            return False
+        self._unloaded_years = {y for y in years if y < current_year}
+        self._year_summaries = manifest.get("summaries", {})
+        return True
+
+    def _rebuild_shards_in_background(self):
+        def worker():
+            try:
+                self.shards.rebuild_from(self.data_file)
+            except Exception as e:
+                print(f"Error rebuilding case shards: {str(e)}")
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def ensure_year(self, year=None, on_batch=None):
+        """Make sure the cases dated in ``year`` (every year when None) are loaded.
+
+        Past years are appended to the shared list, so indexes into it stay
+        valid. Returns True and notifies all modules when anything was added.
+        """
+        return self._ensure_years(None if year is None else {int(year)}, on_batch)
+
+    def ensure_dates(self, start=None, end=None):
+        """ensure_year() for the years that day ordinals start to end (inclusive, None = open) reach."""
+        first = date.fromordinal(start).year if start else None
+        last = date.fromordinal(end).year if end else None
+        with self._lock:
+            years = {y for y in self._unloaded_years
+                     if (first is None or y >= first) and (last is None or y <= last)}
+        return self._ensure_years(years) if years else False
+
+    def _ensure_years(self, wanted, on_batch=None):
+        with self._lock:
+            self.ensure_loaded()
+            if wanted is None:
+                years = set(self._unloaded_years)
+            else:
+                years = self._unloaded_years & set(wanted)
+            if not years:
+                return False
+            self._rebuild_index()
+            first_new = len(self.cases)
+            with snapshot_cache.paused_gc():
+                for shard_year in sorted(years, reverse=True):
+                    try:
+                        records = self.shards.read(shard_year)
+                    except (OSError, ValueError, EOFError) as e:
+                        print(f"Error reading case shard for {shard_year}: {str(e)}")
+                        continue
+                    # Newer copies (journal replays) and deletions made since
+                    # the shards were cut win over the shard's records
+                    self.cases.extend(
+                        Case.from_interned(record) for record in records
+                        if not _superseded(record, self._index, self._tombstones)
+                    )
+                    self._unloaded_years.discard(shard_year)
+                    if on_batch is not None:
+                        on_batch(len(self.cases))
+            self._rebuild_index()
+            if self._upgrade_schema(self.cases[first_new:]):
+                self._schedule_compaction()
+        self.cases_changed.emit([])
+        return True
+
+    def _stream_file(self, on_batch):
+        self.cases[:] = []
+        with snapshot_cache.paused_gc():
+            for batch in iter_json_batches(self.data_file, self.STREAM_BATCH_SIZE):
+                self.cases.extend(to_cases(intern_records(batch), interned=True))
+                on_batch(len(self.cases))
+        snapshot_cache.rebuild_in_background(self.data_file, intern_records)
+
+    def _upgrade_schema(self, cases):
+        """Upgrade records written by older versions; True if any were.
+
+        The caller saves them, so each record is upgraded only once.
+        """
+        upgraded = sum(1 for case in cases if upgrade_record(case))
+        if upgraded:
+            print(f"Upgraded {upgraded} case records to the current schema")
+        return upgraded > 0
+
+    def _journal_pending(self):
+        return os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > 0
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_file):
+            return False
+        replayed = False
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-append
+                    continue
+                file_no = entry.get("File No.", "")
+                existing = self._find(file_no)
+                if entry.get("op") == "delete":
+                    if existing is not None:
+                        self.cases.remove(existing)
+                        self._rebuild_index()
+                    if self._unloaded_years:
+                        self._tombstones.add(file_no)
+                elif existing is not None:
+                    existing.clear()
+                    existing.update(entry["case"])
+                else:
+                    case = Case(entry["case"])
+                    self.cases.append(case)
+                    self._index[file_no] = case
+                replayed = True
+        return replayed
+
+    def _rebuild_index(self):
+        self._index = {}
+        for case in self.cases:
+            self._index.setdefault(case.get("File No.", ""), case)
+
+    def _find(self, file_no):
+        # Modules edit cases in place (including "File No." itself), so a
+        # stale index hit is detected and the index rebuilt.
+        case = self._index.get(file_no)
+        if case is not None and case.get("File No.", "") == file_no:
+            return case
+        self._rebuild_index()
+        return self._index.get(file_no)
+
+    def past_year_summaries(self):
+        """{year: summary (see case_shards.year_summary)} of the past years not loaded yet.
+
+        They come from the shard manifest, so no shard is read. A year the
+        manifest cannot vouch for is loaded instead and left out: one with
+        no summary, or cases already here (from the journal, a save or a
+        merge) whose copy in the shard may be older, or when deletions
+        are still waiting for compaction.
+        """
+        with self._lock:
+            self.ensure_loaded()
+            if not self._unloaded_years:
+                return {}
+            if self._tombstones:
+                uncertain = None
+            else:
+                loaded_years = {date.fromordinal(case.date_ordinal).year for case in self.cases if case.date_ordinal}
+                uncertain = {year for year in self._unloaded_years
+                             if year in loaded_years or str(year) not in self._year_summaries}
+            if uncertain is None or uncertain:
+                self._ensure_years(uncertain)
+            # A shard that failed to load is left out rather than guessed at
+            return {year: self._year_summaries[str(year)] for year in self._unloaded_years
+                    if str(year) in self._year_summaries}
+
+    def locked(self):
+        """The store's lock; hold it (``with case_store.locked():``) to read cases as of one moment."""
+        return self._lock
+
+    def find(self, file_no):
+        """The loaded case with this File No., or None. Unlike get(), never loads past years."""
+        with self._lock:
+            return self._find(file_no)
+
+    def get(self, file_no):
+        """Find a case by File No."""
+        with self._lock:
+            self.ensure_loaded()
+            case = self._find(file_no)
+            if case is None and self.ensure_year():
+                case = self._find(file_no)
+            return case
+
+    def exists(self, file_no):
+        """Case-insensitive File No. check used for duplicate detection."""
+        self.ensure_year()
+        file_no = file_no.lower()
+        return any(case.get("File No.", "").lower() == file_no for case in self.cases)
+
+    def query(self, year=None, month=None, day=None, payment_status=None, work_status=None,
+              party_district=None, party_village=None):
+        """File Nos. of cases matching the date parts, statuses and party address (None = any).
+
+        payment_status is matched against Case.derived_payment_status, the
+        status the payments page shows. Uses the SQLite indexes when that
+        engine is enabled, otherwise a single pass over the loaded cases.
+        Without a year every past year is loaded first.
+        """
+        self.ensure_year(year)
+        with self._lock:
+            if self.db is not None:
+                return self.db.query(year, month, day, payment_status, work_status,
+                                     party_district, party_village)
+
+            date_filtered = year is not None or month is not None or day is not None
+            matched = set()
+            for case in self.cases:
+                if payment_status is not None and case.derived_payment_status != payment_status:
+                    continue
+                if work_status is not None and case.get("Work Status", "Pending") != work_status:
+                    continue
+                if party_district is not None or party_village is not None:
+                    address = case.get("Party Address") or {}
+                    if ((party_district is not None and address.get("District", "") != party_district) or
+                            (party_village is not None and address.get("Village", "") != party_village)):
+                        continue
+                if date_filtered:
+                    if case.date_ordinal is None:
+                        continue
+                    d = date.fromordinal(case.date_ordinal)
+                    if ((year is not None and d.year != int(year)) or
+                            (month is not None and d.month != int(month)) or
+                            (day is not None and d.day != int(day))):
+                        continue
+                matched.add(case.get("File No.", ""))
+            return matched
+
+    # --------------------------------------------------
+    #   WRITE
+    # --------------------------------------------------
+    def add(self, case):
+        """Append a new case and save it."""
+        if not isinstance(case, Case):
+            case = Case(case)
+        upgrade_record(case)
+        with self._lock:
+            self.ensure_loaded().append(case)
+            self._index.setdefault(case.get("File No.", ""), case)
+        return self.save([case.get("File No.", "")])
+
+    def remove(self, file_no):
+        """Delete a case by File No. and save."""
+        with self._lock:
+            self.cases[:] = [c for c in self.ensure_loaded() if c.get("File No.", "") != file_no]
+            self._rebuild_index()
+            if self._unloaded_years:
+                self._tombstones.add(file_no)
+        return self.save([file_no])
+
+    def merge_remote(self, file_nos, merge):
+        """Fold cases changed elsewhere (e.g. by another office) into the store.
+
+        ``merge(file_no, local)`` gets the local case as a plain dict (None
+        when there is none) and returns the merged record, or None to delete
+        it. It runs under the store lock on the current cases, so edits made
+        here meanwhile take part in the merge. The result is saved like any
+        other edit. Returns the File Nos. that changed.
+        """
+        changed = []
+        with self._lock:
+            self.ensure_loaded()
+            if self._unloaded_years and any(self._find(file_no) is None for file_no in file_nos):
+                self.ensure_year()
+            for file_no in file_nos:
+                local = self._find(file_no)
+                merged = merge(file_no, None if local is None else dict(local))
+                if merged is not None:
+                    # Copied: the merge may hand back a record it still uses
+                    merged = dict(merged)
+                    upgrade_record(merged)
+                if merged is None:
+                    if local is not None:
+                        self.cases.remove(local)
+                        changed.append(file_no)
+                    if self._unloaded_years:
+                        self._tombstones.add(file_no)
+                elif local is None:
+                    self.cases.append(Case(merged))
+                    changed.append(file_no)
+                elif merged != local:
+                    local.clear()
+                    local.update(merged)
+                    changed.append(file_no)
+            self._rebuild_index()
+        if changed:
+            # Merged records carry their own revision
+            self._save(changed)
+        return changed
+
+    def commit(self, base, record):
+        """Save an edited copy of a case, on condition nobody else saved it since it was read.
+
+        ``base`` is the case as the editor read it, ``record`` the edited
+        copy. When the case's revision has moved on since, the edits are
+        three-way merged into it; fields that both sides changed raise
+        CaseConflict instead. To overwrite the other edits, commit again
+        with the conflict's ``current`` as the base. Returns the saved case.
+        """
+        file_no = base.get("File No.", "")
+        with self._lock:
+            current = self.get(file_no)
+            if current is None:
+                raise CaseConflict(file_no, [], None)
+            if case_revision(current) != case_revision(base):
+                theirs = dict(current)
+                conflicts = field_conflicts(base, record, theirs)
+                if conflicts:
+                    raise CaseConflict(file_no, conflicts, theirs)
+                record = merge_case(base, record, theirs)
+            record = dict(record)
+            upgrade_record(record)
+            record[REVISION_FIELD] = case_revision(current)
+            current.clear()
+            current.update(record)
+        self.save([file_no, current.get("File No.", "")])
+        return current
+
+    def save(self, file_nos=None):
+        """Persist changes to the shared cases and notify modules.
+
+        Cases are edited in place by the modules; ``file_nos`` names the ones
+        that changed, and their revision goes up by one. Those are appended
+        to the journal, which costs only the size of the cases involved, and
+        data.json is rewritten once the burst of saves is over. Without
+        ``file_nos`` nothing is journaled, so the whole snapshot is rewritten
+        before returning.
+        """
+        if file_nos:
+            with self._lock:
+                for case in {id(case): case for case in map(self._find, file_nos) if case is not None}.values():
+                    case[REVISION_FIELD] = case_revision(case) + 1
+        return self._save(file_nos)
+
+    def _save(self, file_nos=None):
+        # Payments may have been edited inside their list, which the cases
+        # cannot notice themselves
+        with self._lock:
+            if file_nos:
+                for file_no in file_nos:
+                    case = self._find(file_no)
+                    if case is not None:
+                        case.invalidate()
+            else:
+                for case in self.cases:
+                    case.invalidate()
+
+        if file_nos:
+            self._append_journal(file_nos)
+            self._schedule_compaction()
+        else:
+            if self.db is not None:
+                with self._lock:
+                    self.db.import_cases(self.cases)
+            self._schedule_compaction(delay=0)
+            self.flush()
+
+        self.cases_changed.emit(list(file_nos or []))
+        return True
+
+    def _append_journal(self, file_nos):
+        with self._lock:
+            lines = []
+            changes = []
+            for file_no in dict.fromkeys(file_nos):
+                case = self._find(file_no)
+                if case is None:
+                    entry = {"op": "delete", "File No.": file_no}
+                else:
+                    entry = {"op": "upsert", "File No.": file_no, "case": case}
+                lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+                changes.append((file_no, case))
+
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if self.db is not None:
+                self.db.apply(changes)
+
+    # --------------------------------------------------
+    #   WRITE SCHEDULER
+    # --------------------------------------------------
+    def _schedule_compaction(self, delay=None):
+        """Mark the store dirty; data.json is rewritten ``delay`` seconds after
+        the first unwritten change (COALESCE_WINDOW by default)."""
+        with self._lock:
+            due = time.monotonic() + (self.COALESCE_WINDOW if delay is None else delay)
+            # The deadline is not pushed back by later saves, so a steady
+            # stream of them still gets written out
+            self._due = min(self._due, due) if self._dirty else due
+            self._dirty = True
+            if self._compacting:
+                self._write_cond.notify_all()
+                return
+            self._compacting = True
+        threading.Thread(target=self._compaction_worker, daemon=True).start()
+
+    def _compaction_worker(self):
+        while True:
+            with self._lock:
+                while True:
+                    if not self._dirty:
+                        self._compacting = False
+                        self._write_cond.notify_all()
+                        return
+                    wait = self._due - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._write_cond.wait(wait)
+                self._dirty = False
+            try:
+                self.compact()
+            except Exception as e:
+                # The journal still holds the changes; the next save retries
+                print(f"Error compacting data journal: {str(e)}")
+
+    def flush(self):
+        """Write pending changes to data.json now and wait until that is done."""
+        with self._lock:
+            if self._dirty:
+                self._due = 0.0
+                self._write_cond.notify_all()
+            while self._compacting:
+                self._write_cond.wait()
+
+    # --------------------------------------------------
+    #   COMPACTION
+    # --------------------------------------------------
+
+    def compact(self):
+        """Fold the journal into data.json and upload the new snapshot."""
+        with self._lock:
+            # The C encoder (no indent) runs without yielding to other Python
+            # threads, so this is a consistent copy even while the GUI thread
+            # keeps editing cases.
+            snapshot = json.dumps(self.cases, ensure_ascii=False)
+            journal_offset = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+            unloaded_years = sorted(self._unloaded_years)
+            tombstones = set(self._tombstones)
+
+        records = json.loads(snapshot)
+        if unloaded_years:
+            # Years never loaded this session are carried over from their shards
+            loaded = {record.get("File No.", "") for record in records}
+            for year in unloaded_years:
+                records.extend(
+                    record for record in self.shards.read(year)
+                    if not _superseded(record, loaded, tombstones)
+                )
+        if self.db is None:
+            records = ordered_by_year(records)
+
+        # Keep the pretty-printed layout data.json has always had. Written
+        # aside and renamed over it, so a crash never leaves it truncated.
+        tmp_file = f"{self.data_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+        with self._lock:
+            self._disk_stamp = self._current_stamp()
+
+        if self.db is None:
+            try:
+                manifest = self.shards.write(records, source_stamp(self.data_file))
+                with self._lock:
+                    self._year_summaries = manifest["summaries"]
+            except Exception as e:
+                print(f"Error updating case shards: {str(e)}")
+
+        # Drop only what the snapshot covers; lines appended meanwhile stay
+        with self._lock:
+            if journal_offset and os.path.exists(self.journal_file):
+                with open(self.journal_file, 'r+b') as f:
+                    f.seek(journal_offset)
+                    tail = f.read()
+                    f.seek(0)
+                    f.write(tail)
+                    f.truncate()
+            if self.db is not None:
+                # The database already holds every save up to now
+                self.db.mark_source(self.data_file)
+            # Deletions are now part of data.json and its shards
+            self._tombstones -= tombstones
+
+        # The next start can skip parsing data.json
+        try:
+            snapshot_cache.store(self.data_file, intern_records(records))
+        except Exception as e:
+            print(f"Error updating data snapshot cache: {str(e)}")
+
+        # Upload in the background; the queue retries while offline
+        sync_queue.enqueue(self.data_file)
+
+
+if CASE_SERVER:
+    from case_client import CaseClient
+    case_store = CaseClient(CASE_SERVER)
+else:
+    case_store = CaseStore()
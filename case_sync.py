@@ -0,0 +1,257 @@
+# case_sync.py
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime
+from pathlib import Path
+from github_sync import github_sync
+from chunk_store import chunk_store
+from case_store import case_store, CASE_SERVER
+from case_shards import ordered_by_year
+from case_record import merge_case, upgrade_record
+
+# Cases uploaded since data.json was last rewritten, one file per upload
+CHANGES_FOLDER = 'data_changes'
+# Once this many change files pile up, the uploader folds them into data.json
+FOLD_AFTER = 100
+
+def index_records(records):
+    """{File No.: record}; records without a File No. cannot be synced per case.
+
+    Records are upgraded to the current schema, as the case store upgrades
+    the local ones on load, so a case that was only upgraded is not taken
+    for an edit and uploaded.
+    """
+    for record in records:
+        upgrade_record(record)
+    return {record["File No."]: record for record in records if record.get("File No.")}
+
+
+def diff_cases(base, local):
+    """(changed records, deleted File Nos.) that turn ``base`` into ``local``."""
+    changed = [record for file_no, record in local.items() if base.get(file_no) != record]
+    deleted = [file_no for file_no in base if file_no not in local]
+    return changed, deleted
+
+
+def apply_changes(cases, changes):
+    """Apply one change file to {File No.: record}.
+
+    A file that names the base each case was edited from ("bases") is
+    three-way merged into a case another upload changed since, so edits to
+    different fields both survive whichever file sorts last. Files written
+    by older versions replace whole records.
+    """
+    bases = changes.get("bases")
+    for record in changes.get("changed", []) + [base for base in (bases or {}).values() if base]:
+        upgrade_record(record)
+    updates = [(record["File No."], record) for record in changes.get("changed", [])]
+    updates += [(file_no, None) for file_no in changes.get("deleted", [])]
+    for file_no, record in updates:
+        if bases is not None and file_no in bases and cases.get(file_no) != bases[file_no]:
+            # On a field both changed, the later upload wins
+            record = merge_case(bases[file_no], record, cases.get(file_no))
+        if record is None:
+            cases.pop(file_no, None)
+        else:
+            cases[file_no] = record
+
+
+class CaseSync:
+    """Syncs data.json with GitHub case by case instead of as a whole file.
+
+    In the repository data.json is a snapshot and every upload adds a small
+    file to CHANGES_FOLDER holding just the cases it changed or deleted;
+    the remote state is the snapshot with those applied in name (= time)
+    order. Each file carries the base of every case it changes, so two
+    uploads of the same case are merged rather than the later one replacing
+    the earlier. Uploads therefore never conflict and cost the size of the edit.
+    The snapshot is kept in the chunk store, so folding the changes into it
+    only sends the chunks that changed.
+
+    The base (~/.my_app_data/sync_base.json) is the remote state as last
+    seen here. An upload first merges in what other offices uploaded since,
+    then sends local cases that differ from it; a download three-way merges the cases that changed remotely into the case store,
+    so offices editing different cases never overwrite each other.
+    """
+
+    def __init__(self, file_name='data.json'):
+        self.file_name = file_name
+        self.base_file = os.path.join(str(Path.home()), '.my_app_data', 'sync_base.json')
+        self.client = socket.gethostname()
+        self._base = None
+        self._lock = threading.RLock()
+
+    # --------------------------------------------------
+    #   BASE
+    # --------------------------------------------------
+    def _load_base(self):
+        if self._base is None:
+            try:
+                with open(self.base_file, 'r', encoding='utf-8') as f:
+                    base = json.load(f)
+                base["cases"] = index_records(base["cases"])
+                self._base = base
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+        return self._base
+
+    def _save_base(self, base):
+        os.makedirs(os.path.dirname(self.base_file), exist_ok=True)
+        tmp_file = f"{self.base_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(base, cases=list(base["cases"].values())), f, ensure_ascii=False)
+        os.replace(tmp_file, self.base_file)
+        self._base = base
+
+    def _first_base(self, local_path):
+        """Base for a data.json that was last synced as a whole file."""
+        synced_sha = github_sync.manifest.get(self.file_name, {}).get('sha')
+        if synced_sha:
+            try:
+                cases = index_records(json.loads(chunk_store.read(synced_sha, self.file_name, local_path)))
+                return {"snapshot": synced_sha, "folder": None, "changes": [], "cases": cases}
+            except Exception as e:
+                print(f"Error reading last synced {self.file_name}: {str(e)}")
+        # Unknown: treat the local copy as unedited, so remote changes win
+        with open(local_path, 'r', encoding='utf-8') as f:
+            cases = index_records(json.load(f))
+        return {"snapshot": None, "folder": None, "changes": [], "cases": cases}
+
+    # --------------------------------------------------
+    #   REMOTE STATE
+    # --------------------------------------------------
+    def remote_version(self):
+        versions = github_sync.remote_versions()
+        snapshot = chunk_store.remote_version(self.file_name, versions)
+        if snapshot is None:
+            return None
+        return f"{snapshot}:{versions.get(CHANGES_FOLDER, '')}"
+
+    def _fetch_remote(self, base, local_path=None):
+        """The remote state, fetching only what is not in ``base`` already."""
+        versions = github_sync.remote_versions()
+        snapshot = chunk_store.remote_version(self.file_name, versions)
+        if snapshot is None:
+            raise Exception(f"{self.file_name} not found in {github_sync.repo_name}")
+        folder = versions.get(CHANGES_FOLDER)
+        if base is not None and base["snapshot"] == snapshot and base["folder"] == folder:
+            return base
+
+        changes = github_sync.list_folder(CHANGES_FOLDER) if folder else {}
+        names = sorted(name for name in changes if name.endswith('.json'))
+        applied = set(base["changes"]) if base is not None else set()
+        new = [name for name in names if name not in applied]
+        if (base is not None and base["snapshot"] == snapshot and applied <= set(names)
+                and (not applied or not new or new[0] > max(applied))):
+            cases = dict(base["cases"])
+        else:
+            # A new snapshot, or changes that sort before ones applied already
+            cases = index_records(json.loads(chunk_store.read(snapshot, self.file_name, local_path)))
+            new = names
+        for name in new:
+            apply_changes(cases, json.loads(github_sync.read_blob(changes[name])))
+        return {"snapshot": snapshot, "folder": folder, "changes": names, "cases": cases}
+
+    # --------------------------------------------------
+    #   DOWNLOAD / UPLOAD
+    # --------------------------------------------------
+    def download(self, local_path):
+        if CASE_SERVER:
+            # LAN mode: the case server syncs data.json for the office
+            return
+        with self._lock:
+            has_local = os.path.exists(local_path) and os.path.getsize(local_path) > 0
+            base = self._load_base()
+            if base is None and has_local:
+                base = self._first_base(local_path)
+            remote = self._fetch_remote(base, local_path if has_local else None)
+
+            if not has_local:
+                self._write_local(local_path, remote["cases"])
+            elif remote is not base:
+                old, new = base["cases"], remote["cases"]
+                touched = [file_no for file_no in set(old) | set(new) if old.get(file_no) != new.get(file_no)]
+                if touched:
+                    merged = case_store.merge_remote(
+                        touched, lambda file_no, local: merge_case(old.get(file_no), local, new.get(file_no)))
+                    print(f"Merged {len(touched)} remotely changed case(s), {len(merged)} updated here")
+            if remote is not self._base:
+                self._save_base(remote)
+                chunk_store.set_latest(self.file_name, remote["snapshot"])
+
+    def upload(self, local_path):
+        if CASE_SERVER:
+            return
+        with self._lock:
+            # Merge what other offices uploaded since the base first, so the
+            # diff below holds only edits made here and never undoes theirs
+            github_sync.remote_versions(refresh=True)
+            self.download(local_path)
+            # Every save (and that merge) must be in data.json before diffing it
+            case_store.flush()
+            base = self._base
+
+            with open(local_path, 'r', encoding='utf-8') as f:
+                local = index_records(json.load(f))
+            changed, deleted = diff_cases(base["cases"], local)
+            if not changed and not deleted:
+                return
+
+            name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.json"
+            content = json.dumps({
+                "client": self.client,
+                "time": datetime.now().isoformat(timespec='seconds'),
+                "changed": changed,
+                "deleted": deleted,
+                "bases": {file_no: base["cases"].get(file_no)
+                          for file_no in [record["File No."] for record in changed] + deleted},
+            }, indent=4, ensure_ascii=False).encode('utf-8')
+            github_sync.create_remote_file(
+                f"{CHANGES_FOLDER}/{name}", content,
+                f"Update {len(changed) + len(deleted)} case(s) in {self.file_name} - {datetime.now()}")
+
+            cases = dict(base["cases"])
+            apply_changes(cases, {"changed": changed, "deleted": deleted})
+            # The folder's version is unknown now; the next fetch lists it again
+            self._save_base({"snapshot": base["snapshot"], "folder": None,
+                             "changes": sorted(base["changes"] + [name]), "cases": cases})
+
+            if len(self._base["changes"]) >= FOLD_AFTER:
+                try:
+                    self._fold()
+                except Exception as e:
+                    # Someone else folded first, or the network dropped; the changes stay valid
+                    print(f"Error folding case changes into {self.file_name}: {str(e)}")
+
+    def _fold(self):
+        """Rewrite data.json with every change file applied, then remove those files."""
+        remote = self._fetch_remote(self._base)
+        self._save_base(remote)
+        content = json.dumps(ordered_by_year(list(remote["cases"].values())),
+                             indent=4, ensure_ascii=False).encode('utf-8')
+        snapshot = chunk_store.write(
+            self.file_name, content, remote["snapshot"], f"Fold case changes into {self.file_name} - {datetime.now()}")
+        self._save_base(dict(remote, snapshot=snapshot, folder=None, changes=[]))
+        chunk_store.set_latest(self.file_name, snapshot)
+
+        changes = github_sync.list_folder(CHANGES_FOLDER)
+        for name in remote["changes"]:
+            if name in changes:
+                github_sync.delete_remote_file(f"{CHANGES_FOLDER}/{name}", changes[name],
+                                               f"Folded into {self.file_name}")
+
+    def _write_local(self, local_path, cases):
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        tmp_file = f"{local_path}.{os.getpid()}.download"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(ordered_by_year(list(cases.values())), f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, local_path)
+
+
+case_sync = CaseSync()
+github_sync.register_handler(case_sync.file_name, case_sync)
@@ -0,0 +1,394 @@
+# chunk_store.py
+
+import os
+import json
+import zlib
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import github
+from github_sync import github_sync, git_blob_sha, merge_contents
+from sync_metrics import sync_metrics
+
+# Chunk sizes in bytes: a cut is made after a line whose hash matches
+# BOUNDARY_MASK (about one line in 256, i.e. a few KB of indented JSON)
+MIN_CHUNK = 2 * 1024
+MAX_CHUNK = 64 * 1024
+BOUNDARY_MASK = 0xFF
+# Compressed chunks live here in the repository, named by their sha256
+CHUNKS_FOLDER = 'chunks'
+# A file stored as chunks is described by "<name>.chunks" next to it
+RECIPE_SUFFIX = '.chunks'
+RECIPE_FORMAT = 'chunked-1'
+RECIPE_MAGIC = b'{"format": "chunked-1"'
+# Clients from before chunking read only the whole file. While an office
+# still runs one, set SYNC_WRITE_WHOLE_FILES=1 on the others so it is
+# written next to its recipe; that sends the whole file on every upload.
+WRITE_WHOLE_FILES = os.environ.get('SYNC_WRITE_WHOLE_FILES') == '1'
+# Whole files synced through the chunk store (data.json has case_sync)
+CHUNKED_FILES = [
+    'work_types.json',
+    'work_done.json',
+    'locations.json'
+]
+
+
+def chunk_id(chunk):
+    return hashlib.sha256(chunk).hexdigest()
+
+
+def split_chunks(content):
+    """Split content into chunks at boundaries chosen by the content itself.
+
+    Boundaries fall after lines whose hash matches BOUNDARY_MASK, so an
+    edit only changes the chunk it falls in: the lines after it, and so
+    the boundaries after it, are the same as before.
+    """
+    chunks = []
+    start = pos = 0
+    size = len(content)
+    while pos < size:
+        newline = content.find(b'\n', pos)
+        end = size if newline < 0 else newline + 1
+        if end - start > MAX_CHUNK:
+            # Cut before this line, or inside it when the line alone is too long
+            cut = pos if pos > start else start + MAX_CHUNK
+            chunks.append(content[start:cut])
+            start = pos = cut
+            continue
+        line = content[pos:end]
+        pos = end
+        if end - start >= MIN_CHUNK and zlib.crc32(line) & BOUNDARY_MASK == 0:
+            chunks.append(content[start:end])
+            start = end
+    if start < size:
+        chunks.append(content[start:])
+    return chunks
+
+
+def recipe_name(file_name):
+    return f"{file_name}{RECIPE_SUFFIX}"
+
+
+class ChunkStore:
+    """Content-addressed storage of files as compressed chunks.
+
+    A file is stored as a recipe (the list of its chunk ids) plus the
+    chunks, each zlib-compressed in CHUNKS_FOLDER under its sha256. Chunks
+    already in the repository are never uploaded again, and chunks already
+    here (in the cache or in the local copy of the file) are never
+    downloaded again, so an edit costs about one compressed chunk each way.
+
+    Recipes and chunks are cached in ~/.my_app_data/chunk_cache; only those
+    of the latest version of each file are kept.
+    """
+
+    # Chunks fetched at the same time
+    DOWNLOAD_WORKERS = 4
+
+    def __init__(self):
+        self.cache_folder = os.path.join(str(Path.home()), '.my_app_data', 'chunk_cache')
+        self.latest_file = os.path.join(self.cache_folder, 'latest.json')
+        self._lock = threading.RLock()
+
+    # --------------------------------------------------
+    #   LOCAL CACHE
+    # --------------------------------------------------
+    def _cache_path(self, kind, name):
+        return os.path.join(self.cache_folder, kind, name)
+
+    def _cache_read(self, kind, name):
+        try:
+            with open(self._cache_path(kind, name), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _cache_write(self, kind, name, content):
+        path = self._cache_path(kind, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_file, path)
+
+    def _cached_chunk(self, cid):
+        packed = self._cache_read('chunks', cid)
+        if packed is None:
+            return None
+        try:
+            chunk = zlib.decompress(packed)
+        except zlib.error:
+            return None
+        return chunk if chunk_id(chunk) == cid else None
+
+    def _load_latest(self):
+        try:
+            with open(self.latest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def set_latest(self, file_name, version):
+        """Remember the version of file_name last synced and drop cache entries no version uses."""
+        with self._lock:
+            latest = self._load_latest()
+            latest[file_name] = version
+            os.makedirs(self.cache_folder, exist_ok=True)
+            tmp_file = f"{self.latest_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(latest, f, indent=4)
+            os.replace(tmp_file, self.latest_file)
+
+            used = set()
+            for sha in latest.values():
+                recipe = self.cached_recipe(sha)
+                if recipe is not None:
+                    used.update(recipe["chunks"])
+            for kind, keep in (('recipes', {f"{sha}.json" for sha in latest.values()}), ('chunks', used)):
+                folder = os.path.join(self.cache_folder, kind)
+                for name in os.listdir(folder) if os.path.isdir(folder) else []:
+                    if name not in keep:
+                        try:
+                            os.remove(os.path.join(folder, name))
+                        except OSError:
+                            pass
+
+    # --------------------------------------------------
+    #   RECIPES
+    # --------------------------------------------------
+    def remote_version(self, file_name, versions=None):
+        """git blob sha of file_name's recipe, or of the whole file while it is newer.
+
+        The whole file is newer when it is not chunked yet, or when a client
+        that does not know recipes has replaced it since the recipe was written
+        (the recipe's "whole" is the whole file's version as of the recipe).
+        """
+        if versions is None:
+            versions = github_sync.remote_versions()
+        version = versions.get(recipe_name(file_name))
+        whole = versions.get(file_name)
+        if version is None:
+            return whole
+        if whole is not None:
+            recipe, _ = self._fetch(version)
+            if recipe is None or recipe.get("whole") != whole:
+                return whole
+        return version
+
+    def cached_recipe(self, sha):
+        content = self._cache_read('recipes', f"{sha}.json")
+        return json.loads(content) if content is not None else None
+
+    def _fetch(self, sha):
+        """(recipe, None) for a recipe version, (None, content) for a whole file."""
+        recipe = self.cached_recipe(sha)
+        if recipe is not None:
+            return recipe, None
+        content = github_sync.read_blob(sha)
+        if not content.startswith(RECIPE_MAGIC):
+            return None, content
+        self._cache_write('recipes', f"{sha}.json", content)
+        return json.loads(content), None
+
+    def _recipe_of(self, file_name, version):
+        """The recipe of a remote version of file_name, or None for a whole (unchunked) file."""
+        recipe = self.cached_recipe(version)
+        if recipe is None and github_sync.remote_versions().get(recipe_name(file_name)) == version:
+            recipe, _ = self._fetch(version)
+        return recipe
+
+    # --------------------------------------------------
+    #   READ / WRITE
+    # --------------------------------------------------
+    def _download_chunk(self, cid):
+        packed = github_sync.read_remote_file(f"{CHUNKS_FOLDER}/{cid}")
+        chunk = zlib.decompress(packed)
+        if chunk_id(chunk) != cid:
+            raise Exception(f"Chunk {cid} is corrupt in {github_sync.repo_name}")
+        self._cache_write('chunks', cid, packed)
+        return chunk, len(packed)
+
+    def read(self, version, file_name='', local_path=None):
+        """Content of a version returned by remote_version().
+
+        Chunks found in local_path (the current local copy) or in the cache
+        are not downloaded.
+        """
+        recipe, content = self._fetch(version)
+        if recipe is None:
+            return content
+
+        known = {}
+        if local_path and os.path.exists(local_path):
+            with open(local_path, 'rb') as f:
+                known = {chunk_id(chunk): chunk for chunk in split_chunks(f.read())}
+        missing = []
+        for cid in dict.fromkeys(recipe["chunks"]):
+            if cid not in known:
+                chunk = self._cached_chunk(cid)
+                if chunk is None:
+                    missing.append(cid)
+                else:
+                    known[cid] = chunk
+
+        transferred = 0
+        if missing:
+            # The workers' requests count towards this thread's operation
+            download = sync_metrics.bind(self._download_chunk)
+            with ThreadPoolExecutor(max_workers=self.DOWNLOAD_WORKERS) as pool:
+                for cid, (chunk, packed_size) in zip(missing, pool.map(download, missing)):
+                    known[cid] = chunk
+                    transferred += packed_size
+        sync_metrics.count(cache_hits=len(recipe["chunks"]) - len(missing))
+        print(f"Fetched {len(missing)} of {len(recipe['chunks'])} chunks of {file_name or version} "
+              f"({transferred} of {recipe['size']} bytes)")
+
+        content = b"".join(known[cid] for cid in recipe["chunks"])
+        if len(content) != recipe["size"] or hashlib.sha256(content).hexdigest() != recipe["sha256"]:
+            raise Exception(f"Reassembled {file_name or version} does not match its recipe")
+        return content
+
+    def content_matches(self, file_name, version, content):
+        """True if version (from remote_version()) holds exactly content, judged without downloading it."""
+        recipe = self._recipe_of(file_name, version)
+        if recipe is None:
+            return git_blob_sha(content) == version
+        return recipe["size"] == len(content) and recipe["sha256"] == hashlib.sha256(content).hexdigest()
+
+    def write(self, file_name, content, version, message):
+        """Store content as file_name, replacing remote version ``version``.
+
+        Only chunks the repository does not have yet are uploaded, all in
+        one commit with the recipe (and the whole file if WRITE_WHOLE_FILES). Raises GithubException 409/422 when ``version``
+        is no longer current. Returns the new version.
+        """
+        chunks = {}
+        ids = []
+        for chunk in split_chunks(content):
+            cid = chunk_id(chunk)
+            chunks[cid] = chunk
+            ids.append(cid)
+
+        versions = github_sync.remote_versions()
+        if self.remote_version(file_name, versions) != version:
+            raise github.GithubException(409, {"message": f"{file_name} has changed in {github_sync.repo_name}"})
+        old_version = versions.get(recipe_name(file_name))
+        old_recipe = self._recipe_of(file_name, old_version) if old_version is not None else None
+        present = set(old_recipe["chunks"]) if old_recipe is not None else set()
+        for sha in self._load_latest().values():
+            recipe = self.cached_recipe(sha)
+            if recipe is not None:
+                present.update(recipe["chunks"])
+
+        files = {}
+        transferred = 0
+        new_ids = [cid for cid in chunks if cid not in present]
+        for cid in new_ids:
+            packed = zlib.compress(chunks[cid], 9)
+            files[f"{CHUNKS_FOLDER}/{cid}"] = packed
+            transferred += len(packed)
+
+        recipe = {
+            "format": RECIPE_FORMAT,
+            "size": len(content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "chunks": ids,
+        }
+        if WRITE_WHOLE_FILES:
+            files[file_name] = content
+            recipe["whole"] = git_blob_sha(content)
+        elif versions.get(file_name) is not None:
+            # Left as it is, so only a later write by an old client makes it newer
+            recipe["whole"] = versions.get(file_name)
+        recipe_content = json.dumps(recipe).encode('utf-8')
+        files[recipe_name(file_name)] = recipe_content
+
+        # Both names must still be as read, or another office has written in between
+        expected = {recipe_name(file_name): old_version, file_name: versions.get(file_name)}
+        new_version = github_sync.commit_files(files, message, expected)[recipe_name(file_name)]
+        for cid in new_ids:
+            self._cache_write('chunks', cid, files[f"{CHUNKS_FOLDER}/{cid}"])
+        self._cache_write('recipes', f"{new_version}.json", recipe_content)
+        sync_metrics.count(cache_hits=len(ids) - len(new_ids))
+        print(f"Uploaded {len(new_ids)} of {len(ids)} chunks of {file_name} ({transferred} of {len(content)} bytes)")
+        return new_version
+
+
+class ChunkedSync:
+    """github_sync handler that transfers a whole file through the chunk store."""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+
+    def remote_version(self):
+        return chunk_store.remote_version(self.file_name)
+
+    def download(self, local_path):
+        version = self.remote_version()
+        if version is None:
+            raise Exception(f"{self.file_name} not found in {github_sync.repo_name}")
+        has_local = os.path.exists(local_path)
+        if has_local and github_sync.manifest.get(self.file_name, {}).get('sha') == version:
+            # Unchanged remotely since the last sync; local edits stay
+            sync_metrics.count(cache_hits=1)
+            return
+
+        content = chunk_store.read(version, self.file_name, local_path)
+        if has_local:
+            with open(local_path, 'rb') as f:
+                if f.read() == content:
+                    github_sync.record_version(self.file_name, local_path, version)
+                    chunk_store.set_latest(self.file_name, version)
+                    return
+
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        tmp_file = f"{local_path}.{os.getpid()}.download"
+        with open(tmp_file, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_file, local_path)
+        github_sync.record_version(self.file_name, local_path, version)
+        chunk_store.set_latest(self.file_name, version)
+
+    def upload(self, local_path):
+        github_sync.create_backup(local_path)
+        with open(local_path, 'rb') as f:
+            content = f.read()
+
+        version = self.remote_version()
+        if version is not None and chunk_store.content_matches(self.file_name, version, content):
+            github_sync.record_version(self.file_name, local_path, version)
+            return
+
+        message = f"Update {self.file_name} - {datetime.now()}"
+        # The version last synced here; a newer remote one is another
+        # office's upload, merged in before ours is written over it
+        base = github_sync.manifest.get(self.file_name, {}).get('sha')
+        for attempt in range(3):
+            if version is not None and version != base:
+                sync_metrics.count(conflicts=1)
+                remote = chunk_store.read(version, self.file_name, local_path)
+                content = merge_contents(self.file_name, chunk_store.read(base, self.file_name) if base else None,
+                                         content, remote)
+                github_sync.write_local(local_path, content)
+                if content == remote:
+                    break
+                base = version
+            try:
+                version = chunk_store.write(self.file_name, content, version, message)
+                break
+            except github.GithubException as e:
+                # 409/422: someone uploaded since the version was read; merge theirs too
+                if e.status not in (409, 422) or attempt == 2:
+                    raise
+                sync_metrics.count(retries=1)
+                version = chunk_store.remote_version(self.file_name, github_sync.remote_versions(refresh=True))
+        github_sync.record_version(self.file_name, local_path, version)
+        chunk_store.set_latest(self.file_name, version)
+
+
+chunk_store = ChunkStore()
+for _file_name in CHUNKED_FILES:
+    github_sync.register_handler(_file_name, ChunkedSync(_file_name))
@@ -2,18 +2,27 @@
 
 import sys
 import os
-import json
+import heapq
+import threading
+from collections import namedtuple
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QPushButton, QFrame, QTableWidget, QTableWidgetItem, QHeaderView,
+    QPushButton, QFrame, QTableView, QHeaderView,
     QScrollArea, QComboBox, QMessageBox, QDateEdit
 )
 from PyQt5.QtGui import QFont, QColor, QPixmap, QPainter, QIcon
-from PyQt5.QtCore import Qt, QSize, QThread, pyqtSignal, QDate, QTimer
-from github_sync import github_sync
+from PyQt5.QtCore import Qt, QSize, QObject, QThread, pyqtSignal, QDate, QElapsedTimer, QTimer
+from replica import replica
 from activity_tracker import ActivityTracker
+from case_store import case_store
+from case_record import Case, case_sort_key, COUNT
+from case_aggregates import case_aggregates
+from data_watcher import data_watcher
+from record_table_model import RecordTableModel, field, amount
+import dashboard_snapshot
 
 # PyQtChart imports for the graph
 from PyQt5.QtChart import (
@@ -23,24 +32,169 @@ from PyQt5.QtChart import (
 
 
 class DataLoader(QThread):
-    data_loaded = pyqtSignal(list)
+    data_loaded = pyqtSignal(object)  # the shared list itself, not a converted copy
+    batch_loaded = pyqtSignal(int)  # cases parsed so far while data.json streams in
     error_occurred = pyqtSignal(str)
     
     def __init__(self, data_file):
         super().__init__()
         self.data_file = data_file
+        self.force_reload = False
+        # Set until the dashboard has taken the result
+        self.loading = False
         
     def run(self):
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                self.data_loaded.emit(data)
+            # Parse through the shared store so other modules reuse this copy
+            if self.force_reload:
+                data = case_store.reload()
             else:
-                self.data_loaded.emit([])
+                data = case_store.ensure_loaded(on_batch=self.batch_loaded.emit)
+            # Past years are counted from the shard manifest, not loaded
+            # (see case_aggregates.overview). Build the totals and date index
+            # here rather than on the first paint
+            case_aggregates.summary()
+            self.data_loaded.emit(data)
         except Exception as e:
             self.error_occurred.emit(str(e))
 
+# Everything one dashboard refresh shows, built by DashboardWorker. Amounts
+# and counts as case_aggregates.summary; chart: ((label, count, colour), ...);
+# cases (newest first), pending, finalized and activities: tuples of the rows
+# for the tables (activities None: leave the table as it is); unlisted: cases
+# of past years that are counted but not loaded, so not in cases
+DashboardView = namedtuple('DashboardView', [
+    'generation', 'partial', 'summary', 'chart', 'cases', 'pending', 'finalized', 'activities', 'unlisted'])
+
+
+# What the tables show of a case; the views hold copies of just these
+ROW_FIELDS = ("File No.", "Customer Name", "Date", "Village", "Payment Status", "Work Status", "Final Amount")
+
+
+def table_row(case):
+    """A copy of what the tables show of case, safe to read after the store has moved on."""
+    return Case.from_interned({name: case[name] for name in ROW_FIELDS if name in case})
+
+
+def is_completed(record):
+    return record.get("Payment Status", "").lower() in ("completed", "done")
+
+
+def recent_activities(activity_tracker, selected_date):
+    """Activities of the last 30 days on selected_date (or "All Days"), newest first, without syncs and refreshes."""
+    activities = []
+    for activity in activity_tracker.get_activities(limit=None):
+        try:
+            activity_date = datetime.strptime(activity['datetime'].split()[0], "%Y-%m-%d")
+            # Only include activities from last 30 days
+            if (datetime.now() - activity_date).days > 30:
+                continue
+            if selected_date != "All Days" and not activity['datetime'].startswith(selected_date):
+                continue
+            if (activity['action'] in ('Data Sync', 'Refresh') or
+                    'refresh' in activity['details'].lower() or 'sync' in activity['details'].lower()):
+                continue
+            activities.append(activity)
+        except:
+            continue
+    # '%Y-%m-%d %H:%M:%S' sorts the same as text as it does as a time
+    activities.sort(key=lambda x: x['datetime'], reverse=True)
+    return tuple(activities)
+
+
+class DashboardWorker(QObject):
+    """Builds DashboardViews on a background thread.
+
+    submit() replaces a request that has not started yet and cancels the
+    one being built: it stops at its next check and is never delivered.
+    Scrolling through dates therefore only ever finishes the last range,
+    and the GUI thread does no more than show a finished view.
+    """
+
+    view_ready = pyqtSignal(object)  # DashboardView; emitted from the worker thread
+
+    def __init__(self, activity_tracker):
+        super().__init__()
+        self.activity_tracker = activity_tracker
+        # Number of the latest request; views of older ones are stale
+        self.generation = 0
+        self._request = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, start=None, end=None, activity_date="All Days", partial=False):
+        """Request a view of the cases dated between day ordinals start and end (all without a range)."""
+        with self._cond:
+            self.generation += 1
+            self._request = (self.generation, start, end, activity_date, partial)
+            self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dashboard-worker', daemon=True)
+                self._thread.start()
+        return self.generation
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._request is None:
+                    self._cond.wait()
+                request, self._request = self._request, None
+            generation, start, end, activity_date, partial = request
+            # Read first: a save meanwhile makes the snapshot look stale, never current
+            version = case_store.data_version()
+            try:
+                view = self.build(*request)
+            except Exception as e:
+                print(f"Error computing the dashboard: {str(e)}")
+                continue
+            if view is not None and self.is_current(view.generation):
+                self.view_ready.emit(view)
+            if view is not None and not partial and start is None and end is None:
+                self.save_snapshot(view, version)
+
+    def save_snapshot(self, view, version):
+        """Keep view for the first paint of the next start (see dashboard_snapshot)."""
+        dashboard_snapshot.save(view.summary, view.chart, view.pending, view.finalized, version)
+
+    def build(self, generation, start, end, activity_date, partial):
+        """The DashboardView of one request, or None once a newer one has come in."""
+        # The cases are live and other threads save into them, so the rows
+        # are copied out before the store lock is let go
+        with case_store.locked():
+            # From the shared totals and date index: a bisect and a slice
+            summary, cases, past = case_aggregates.overview(start, end)
+            if not self.is_current(generation):
+                return None
+
+            # Oldest first already: the first ten will do. Past years not loaded
+            # keep their oldest ten of each in the shard manifest
+            past_pending, past_finalized = [], []
+            for year in sorted(past):
+                past_pending.extend(Case(r) for r in past[year]["pending"])
+                past_finalized.extend(Case(r) for r in past[year]["finalized"])
+            pending = tuple(map(table_row, islice(heapq.merge(
+                (r for r in cases if not is_completed(r)), past_pending, key=case_sort_key), 10)))
+            finalized = tuple(map(table_row, islice(heapq.merge(
+                (r for r in cases if is_completed(r)), past_finalized, key=case_sort_key), 10)))
+            # While data.json streams in the All Cases table waits for all of it
+            newest_first = () if partial else tuple(map(table_row, reversed(cases)))
+        unlisted = sum(year_summary["totals"][COUNT] for year_summary in past.values())
+        if not self.is_current(generation):
+            return None
+
+        activities = recent_activities(self.activity_tracker, activity_date)
+        chart = (
+            ("Pending", summary["pending_cases"], "#FFA33E"),
+            ("All", summary["cases"], "#47bfff"),
+            ("Approve", summary["approved_cases"], "#c7f464"),
+            ("Finalize", summary["completed_cases"], "#ff8c00"),
+        )
+        return DashboardView(generation, partial, summary, chart, newest_first, pending, finalized, activities, unlisted)
+
+
 class DashboardModule(QWidget):
     def __init__(self):
         super().__init__()
@@ -48,10 +202,6 @@ class DashboardModule(QWidget):
         # Initialize activity tracker
         self.activity_tracker = ActivityTracker()
 
-        # Cache mechanism
-        self._data_cache = None
-        self._last_load_time = None
-        
         # Filter state flag
         self.date_filter_applied = False # Ensure this is initialized early
 
@@ -65,13 +215,20 @@ class DashboardModule(QWidget):
         # Initialize data loader
         self.data_loader = DataLoader(self.data_file)
         self.data_loader.data_loaded.connect(self.on_data_loaded)
+        self.data_loader.batch_loaded.connect(self.on_batch_loaded)
         self.data_loader.error_occurred.connect(self.on_load_error)
+        self.partial_update_timer = QElapsedTimer()
 
-        # If running from PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # Download files from Drive if they don't exist
-            if not os.path.exists(self.data_file):
-                github_sync.download_file('data.json', self.data_file)
+        # Totals, chart and tables are computed in the background
+        self.dashboard_worker = DashboardWorker(self.activity_tracker)
+        self.dashboard_worker.view_ready.connect(self.apply_view)
+        # Set while the snapshot of the last session is on screen
+        self.showing_snapshot = False
+        # After main.py's case_store.flush, so the snapshot matches data.json as left on disk
+        QApplication.instance().aboutToQuit.connect(self.save_snapshot)
+
+        # Pick up saves made by the other modules
+        case_store.cases_changed.connect(self.on_cases_changed)
 
         # Define the default data folder and file path
         self.data_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
@@ -101,10 +258,6 @@ class DashboardModule(QWidget):
             # Ensure folder exists in normal environment
             os.makedirs(self.data_folder, exist_ok=True)
 
-        # Ensure data is synced from GitHub
-        if not os.path.exists(self.data_file):
-            github_sync.download_file('data.json', self.data_file)
-
         self.setWindowTitle("Dashboard with Advanced Scroll + Filter")
         self.setStyleSheet("""
             QWidget {
@@ -154,7 +307,6 @@ class DashboardModule(QWidget):
         # 1) Data / Summaries (variables)
         # ---------------------------------------------------------
         self.data = []
-        self.filtered_data = []  # Month/Year filter applied data
 
         self.total_pending_amount = 0.0
         self.total_remaining_amount = 0.0
@@ -222,6 +374,12 @@ class DashboardModule(QWidget):
 
         top_bar_layout.addStretch()
 
+        # Shown while the figures are those of the last session
+        self.snapshot_label = QLabel()
+        self.snapshot_label.setStyleSheet("color: #b08d74; font-size: 12px;")
+        self.snapshot_label.hide()
+        top_bar_layout.addWidget(self.snapshot_label)
+
         # -- Date Range Filter --
         date_filter_style = """
             QDateEdit {
@@ -280,6 +438,15 @@ class DashboardModule(QWidget):
         self.apply_filter_button.clicked.connect(self.apply_date_range_filter) # Connect Filter button
         top_bar_layout.addWidget(self.apply_filter_button)
 
+        # Once filtered, the dashboard follows the pickers; scrolling through
+        # dates repaints once it settles
+        self.range_timer = QTimer(self)
+        self.range_timer.setSingleShot(True)
+        self.range_timer.setInterval(150)
+        self.range_timer.timeout.connect(self.update_dashboard)
+        self.start_date_edit.dateChanged.connect(self.on_date_range_changed)
+        self.end_date_edit.dateChanged.connect(self.on_date_range_changed)
+
         # -- Refresh button --
         self.refresh_button = QPushButton()
         refresh_icon_path = os.path.join("icons", "refresh_dashborad.svg")
@@ -416,24 +583,29 @@ class DashboardModule(QWidget):
         left_section_layout.addWidget(graph_frame) # Add graph back to left layout
 
         # All Cases Table - Moved back to left section
-        all_cases_label = QLabel("All Cases (Filtered)")
-        all_cases_label.setFont(QFont("Century Gothic", 14, QFont.Bold))
-        all_cases_label.setStyleSheet("color: #7e5d47;") # Removed margin-top
-        left_section_layout.addWidget(all_cases_label)
-
-        self.all_cases_table = QTableWidget()
-        self.all_cases_table.setColumnCount(7) # Adjust column count as needed
-        self.all_cases_table.setHorizontalHeaderLabels([
-            "File No.", "Customer Name", "Date", "Village", 
-            "Payment Status", "Work Status", "Final Amount"
+        self.all_cases_label = QLabel("All Cases (Filtered)")
+        self.all_cases_label.setFont(QFont("Century Gothic", 14, QFont.Bold))
+        self.all_cases_label.setStyleSheet("color: #7e5d47;") # Removed margin-top
+        left_section_layout.addWidget(self.all_cases_label)
+
+        self.all_cases_table = QTableView()
+        self.all_cases_model = RecordTableModel([
+            ("File No.", field("File No."), Qt.AlignCenter),
+            ("Customer Name", field("Customer Name"), Qt.AlignCenter),
+            ("Date", field("Date"), Qt.AlignCenter),
+            ("Village", field("Village"), Qt.AlignCenter),
+            ("Payment Status", field("Payment Status"), Qt.AlignCenter),
+            ("Work Status", field("Work Status"), Qt.AlignCenter),
+            ("Final Amount", amount, Qt.AlignCenter),
         ])
+        self.all_cases_table.setModel(self.all_cases_model)
         self.all_cases_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.all_cases_table.verticalHeader().setDefaultSectionSize(40)
         self.all_cases_table.verticalHeader().setVisible(False)
         self.all_cases_table.setShowGrid(False)
         # Apply the same stylesheet as other tables
         self.all_cases_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #fffefd;
                 border: 0px solid #ffcea1;
                 border-radius: 10px;
@@ -447,7 +619,7 @@ class DashboardModule(QWidget):
                 font-size: 14px;
                 font-weight: bold;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 5px;
                 font-size: 14px;
                 border: none solid #ffcea1;
@@ -455,7 +627,7 @@ class DashboardModule(QWidget):
                 color: #564234;
                 text-align: center;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #ffcea1;
                 color: #ffffff;
             }
@@ -489,18 +661,22 @@ class DashboardModule(QWidget):
         pending_label.setFont(QFont("Century Gothic", 14, QFont.Bold))
         pending_label.setStyleSheet("color: #7e5d47;")
         left_section_layout.addWidget(pending_label)
-        self.pending_table = QTableWidget()
-        self.pending_table.setColumnCount(6)
-        self.pending_table.setHorizontalHeaderLabels([
-            "File No.", "Customer Name", "Date",
-            "Village", "Payment Status", "Final Amount"
+        self.pending_table = QTableView()
+        self.pending_model = RecordTableModel([
+            ("File No.", field("File No."), Qt.AlignCenter),
+            ("Customer Name", field("Customer Name"), Qt.AlignCenter),
+            ("Date", field("Date"), Qt.AlignCenter),
+            ("Village", field("Village"), Qt.AlignCenter),
+            ("Payment Status", field("Payment Status"), Qt.AlignCenter),
+            ("Final Amount", amount, Qt.AlignCenter),
         ])
+        self.pending_table.setModel(self.pending_model)
         self.pending_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.pending_table.verticalHeader().setDefaultSectionSize(40)
         self.pending_table.verticalHeader().setVisible(False)
         self.pending_table.setShowGrid(False)
         self.pending_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #fffefd;
                 border: 0px solid #ffcea1;
                 border-radius: 10px;
@@ -514,7 +690,7 @@ class DashboardModule(QWidget):
                 font-size: 14px;
                 font-weight: bold;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 5px;
                 font-size: 14px;
                 border: none solid #ffcea1;
@@ -522,7 +698,7 @@ class DashboardModule(QWidget):
                 color: #564234;
                 text-align: center;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #ffcea1;
                 color: #ffffff;
             }
@@ -556,18 +732,21 @@ class DashboardModule(QWidget):
         finalized_label.setFont(QFont("Century Gothic", 14, QFont.Bold))
         finalized_label.setStyleSheet("color: #7e5d47;")
         left_section_layout.addWidget(finalized_label)
-        self.finalized_table = QTableWidget()
-        self.finalized_table.setColumnCount(4)
-        self.finalized_table.setHorizontalHeaderLabels([
-            "File No.", "Date", "Payment Status", "Work Status"
+        self.finalized_table = QTableView()
+        self.finalized_model = RecordTableModel([
+            ("File No.", field("File No."), Qt.AlignCenter),
+            ("Date", field("Date"), Qt.AlignCenter),
+            ("Payment Status", field("Payment Status"), Qt.AlignCenter),
+            ("Work Status", field("Work Status"), Qt.AlignCenter),
         ])
+        self.finalized_table.setModel(self.finalized_model)
         self.finalized_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.finalized_table.verticalHeader().setDefaultSectionSize(40)
         self.finalized_table.setAlternatingRowColors(False)
         self.finalized_table.verticalHeader().setVisible(False)
         self.finalized_table.setShowGrid(False)
         self.finalized_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #fffefd;
                 border: 0px solid #ffcea1;
                 border-radius: 10px;
@@ -581,7 +760,7 @@ class DashboardModule(QWidget):
                 font-size: 14px;
                 font-weight: bold;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 5px;
                 font-size: 14px;
                 border: none solid #ffcea1;
@@ -589,7 +768,7 @@ class DashboardModule(QWidget):
                 color: #564234;
                 text-align: center;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #ffcea1;
                 color: #ffffff;
             }
@@ -757,9 +936,14 @@ class DashboardModule(QWidget):
         activity_layout.addSpacing(10)
         
         # Activity Table
-        self.activity_table = QTableWidget()
-        self.activity_table.setColumnCount(4)
-        self.activity_table.setHorizontalHeaderLabels(["Time", "Module", "Action", "Details"])
+        self.activity_table = QTableView()
+        self.activity_model = RecordTableModel([
+            ("Time", field("datetime"), Qt.AlignCenter),
+            ("Module", field("module"), Qt.AlignCenter),
+            ("Action", field("action"), Qt.AlignCenter),
+            ("Details", field("details"), None),
+        ])
+        self.activity_table.setModel(self.activity_model)
         self.activity_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.activity_table.verticalHeader().setDefaultSectionSize(40)
         self.activity_table.setAlternatingRowColors(False)
@@ -767,7 +951,7 @@ class DashboardModule(QWidget):
         self.activity_table.setShowGrid(False)
         self.activity_table.setFixedHeight(300)
         self.activity_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #fffefd;
                 border: 0px solid #ffcea1;
                 border-radius: 10px;
@@ -781,7 +965,7 @@ class DashboardModule(QWidget):
                 font-size: 14px;
                 font-weight: bold;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 5px;
                 font-size: 14px;
                 border: none solid #ffcea1;
@@ -789,7 +973,7 @@ class DashboardModule(QWidget):
                 color: #564234;
                 text-align: center;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #ffcea1;
                 color: #ffffff;
             }
@@ -823,56 +1007,72 @@ class DashboardModule(QWidget):
         # Load initial activities
         self.load_activities()
 
-        # Finally, load data and refresh
+        # Finally, load data and refresh; the last session's figures fill
+        # in until the live ones are ready
+        self.show_snapshot()
         self.load_data()
 
-        # Add auto-refresh timer
-        self.refresh_timer = QTimer()
-        self.refresh_timer.timeout.connect(self.auto_refresh)
-        self.refresh_timer.start(30000)  # Refresh every 30 seconds
+        # Reload only when data.json actually changes (locally or on GitHub);
+        # changed cases reach us through case_store.cases_changed
+        data_watcher.start()
 
     # --------------------------------------------------
     #   DATA REFRESH/LOAD
     # --------------------------------------------------
     def refresh_data(self):
-        """Refresh data from GitHub and reset filter state"""
+        """Reload from the local replica, reconcile with GitHub in the background and reset filter state"""
         self.date_filter_applied = False # Reset filter flag
         try:
-            if github_sync.download_file('data.json', self.data_file):
-                self.activity_tracker.log_activity("Dashboard", "Data Sync", "Successfully synced data from GitHub")
-                QMessageBox.information(self, "Success", "Data successfully synced")
-            else:
-                self.activity_tracker.log_activity("Dashboard", "Data Sync", "Failed to sync from GitHub")
-                QMessageBox.warning(self, "Warning", "Could not sync from GitHub. Using local data.")
-            
-            self.load_data() # Load data (will trigger update_dashboard showing all data)
+            # Changes pulled from GitHub arrive through case_store.cases_changed
+            replica.reconcile()
+            self.load_data(force=True) # Load data (will trigger update_dashboard showing all data)
         except Exception as e:
             self.activity_tracker.log_activity("Dashboard", "Error", f"Error refreshing data: {str(e)}")
             QMessageBox.warning(self, "Error", f"Error refreshing data: {str(e)}")
             
     def on_data_loaded(self, data):
         """Called when data is loaded in background"""
-        self._data_cache = data
-        self._last_load_time = datetime.now()
+        self.data_loader.force_reload = False
+        self.data_loader.loading = False
         self.data = data
         self.update_dashboard() # Update dashboard (will use self.date_filter_applied state)
+
+    def on_batch_loaded(self, count):
+        """Show partial results while data.json is still being parsed."""
+        # Recomputing is O(cases so far), so don't do it for every batch
+        if self.partial_update_timer.isValid() and self.partial_update_timer.elapsed() < 500:
+            return
+        self.partial_update_timer.start()
+        self.data = case_store.cases
+        self.update_dashboard(partial=True)
+
+    def on_cases_changed(self, file_nos):
+        """Recompute from the shared store after another module saved."""
+        # Our own background reload reports through on_data_loaded instead
+        if self.data_loader.isRunning() or self.data_loader.loading:
+            return
+        if hasattr(self, 'data'):
+            self.update_dashboard()
         
     def on_load_error(self, error_message):
         """Called when error occurs during data loading"""
+        self.data_loader.force_reload = False
+        self.data_loader.loading = False
         QMessageBox.critical(self, "Error", f"Error loading data: {error_message}")
         
-    def load_data(self):
-        """Load data with caching"""
-        # If cache exists and is less than 5 minutes old, use it
-        if self._data_cache and self._last_load_time:
-            cache_age = (datetime.now() - self._last_load_time).total_seconds()
-            if cache_age < 300:  # 5 minutes
-                self.data = self._data_cache
-                self.update_dashboard() # Update with cached data (uses self.date_filter_applied state)
-                return
+    def load_data(self, force=False):
+        """Load data from the shared case store"""
+        # Already parsed by this or another module: reuse it
+        if case_store.loaded and not force:
+            self.data = case_store.cases
+            self.update_dashboard() # Update with cached data (uses self.date_filter_applied state)
+            return
                 
         # Start background loading
-        self.data_loader.start()
+        if not self.data_loader.isRunning():
+            self.data_loader.force_reload = force
+            self.data_loader.loading = True
+            self.data_loader.start()
 
     # --------------------------------------------------
     #   FILTERING
@@ -886,89 +1086,28 @@ class DashboardModule(QWidget):
         end_date = self.end_date_edit.date().toString("dd/MM/yyyy")
         self.log_activity("Dashboard", "Filter Applied", f"Date Range: {start_date} - {end_date}")
 
-    def apply_filter(self, records):
-        """Filters records based on the date range IF the filter is applied."""
+    def date_range(self):
+        """(start, end) day ordinals of the pickers IF the filter is applied, else (None, None)."""
         if not self.date_filter_applied:
-            return records # Return all records if filter is not active
-
-        # Apply date range filter only if flag is True
-        start_date = self.start_date_edit.date()
-        end_date = self.end_date_edit.date()
+            return None, None
+        return (self.start_date_edit.date().toPyDate().toordinal(),
+                self.end_date_edit.date().toPyDate().toordinal())
 
-        filtered = []
-        for r in records:
-            date_str = r.get("Date", "")
-            try:
-                date_obj = datetime.strptime(date_str, "%d/%m/%Y").date()
-                qt_date_obj = QDate(date_obj.year, date_obj.month, date_obj.day)
-                if start_date <= qt_date_obj <= end_date:
-                    filtered.append(r)
-            except ValueError:
-                continue 
-        return filtered
-
-    # --------------------------------------------------
-    #   COMPUTE SUMMARY
-    # --------------------------------------------------
-    def compute_summary(self):
-        self.total_pending_amount = 0.0
-        self.total_completed_amount = 0.0
-        self.total_amount = 0.0
-        self.total_remaining_amount = 0.0
-
-        self.all_case_count = 0
-        self.final_case_count = 0
-        self.approve_case_count = 0
-        self.pending_case_count = 0
-
-        for record in self.filtered_data:
-            final_amt_str = record.get("Final Amount", "0")
-            try:
-                final_amt = float(final_amt_str)
-            except:
-                final_amt = 0.0
-
-            self.total_amount += final_amt
-            self.all_case_count += 1
-
-            pay_status = record.get("Payment Status", "").lower()
-            if pay_status in ("completed", "done"):
-                self.total_completed_amount += final_amt
-                self.final_case_count += 1
-            else:
-                self.total_pending_amount += final_amt
-                self.pending_case_count += 1
-
-            work_status = record.get("Work Status", "").lower()
-            if work_status == "approved":
-                self.approve_case_count += 1
-
-        self.total_remaining_amount = self.total_amount - self.total_completed_amount
+    def on_date_range_changed(self):
+        """Follow the date pickers while a range filter is applied."""
+        if self.date_filter_applied:
+            self.range_timer.start()
 
     # --------------------------------------------------
     #   GRAPH (Bar Chart) CREATION
     # --------------------------------------------------
-    def create_bar_chart(self):
-        set_pending = QBarSet("Pending")
-        set_allcase = QBarSet("All")
-        set_approve = QBarSet("Approve")
-        set_final = QBarSet("Finalize")
-
-        set_pending.append(self.pending_case_count)
-        set_allcase.append(self.all_case_count)
-        set_approve.append(self.approve_case_count)
-        set_final.append(self.final_case_count)
-
+    def create_bar_chart(self, bars):
         series = QBarSeries()
-        series.append(set_pending)
-        series.append(set_allcase)
-        series.append(set_approve)
-        series.append(set_final)
-
-        set_pending.setColor(QColor("#FFA33E"))  
-        set_allcase.setColor(QColor("#47bfff"))
-        set_approve.setColor(QColor("#c7f464"))
-        set_final.setColor(QColor("#ff8c00"))
+        for label, count, colour in bars:
+            bar_set = QBarSet(label)
+            bar_set.append(count)
+            bar_set.setColor(QColor(colour))
+            series.append(bar_set)
 
         chart = QChart()
         chart.addSeries(series)
@@ -982,12 +1121,7 @@ class DashboardModule(QWidget):
         chart.addAxis(axisX, Qt.AlignBottom)
         series.attachAxis(axisX)
 
-        max_val = max(
-            self.all_case_count,
-            self.approve_case_count,
-            self.final_case_count,
-            self.pending_case_count
-        )
+        max_val = max(count for label, count, colour in bars)
         axisY = QValueAxis()
         axisY.setRange(0, max_val + 1)
         axisY.setLabelFormat("%.0f")
@@ -1003,128 +1137,40 @@ class DashboardModule(QWidget):
         chart_view.setFixedHeight(500)
         return chart_view
 
-    # --------------------------------------------------
-    #   TABLES
-    # --------------------------------------------------
-    def populate_all_cases_table(self):
-        """Populate the table showing all cases within the filtered date range."""
-        try:
-            # Sort filtered data by date (optional, can sort as needed)
-            def parse_date(record):
-                date_str = record.get("Date", "")
-                try:
-                    return datetime.strptime(date_str, "%d/%m/%Y")
-                except:
-                    return datetime.min # Oldest possible date for sorting errors
-            
-            sorted_data = sorted(self.filtered_data, key=parse_date, reverse=True) # Newest first
-
-            self.all_cases_table.setRowCount(len(sorted_data))
-
-            for row_index, record in enumerate(sorted_data):
-                file_no = record.get("File No.", "")
-                cust_name = record.get("Customer Name", "")
-                date = record.get("Date", "")
-                village = record.get("Village", "")
-                payment_status = record.get("Payment Status", "")
-                work_status = record.get("Work Status", "")
-                amt_str = record.get("Final Amount", "0")
-                try:
-                    amt_val = float(amt_str)
-                    final_amt_formatted = f"₹{amt_val:,.2f}"
-                except:
-                    final_amt_formatted = "₹0.00" 
-
-                row_data = [file_no, cust_name, date, village, payment_status, work_status, final_amt_formatted]
-
-                for col_index, value in enumerate(row_data):
-                    item = QTableWidgetItem(str(value))
-                    item.setTextAlignment(Qt.AlignCenter)
-                    self.all_cases_table.setItem(row_index, col_index, item)
-        except Exception as e:
-            print(f"Error populating all cases table: {e}")
-            QMessageBox.warning(self, "Table Error", f"Could not populate All Cases table: {e}")
-
-    def populate_pending_table(self):
-        pending_records = []
-        for r in self.filtered_data:
-            pay_status = r.get("Payment Status", "").lower()
-            if pay_status not in ("completed", "done"):
-                pending_records.append(r)
-
-        def parse_date(record):
-            date_str = record.get("Date", "")
-            try:
-                return datetime.strptime(date_str, "%d/%m/%Y")
-            except:
-                return datetime.min
-
-        pending_records.sort(key=parse_date)
-        pending_records = pending_records[:10]
-
-        self.pending_table.setRowCount(len(pending_records))
-
-        for row_index, record in enumerate(pending_records):
-            file_no = record.get("File No.", "")
-            cust_name = record.get("Customer Name", "")
-            date = record.get("Date", "")
-            village = record.get("Village", "")
-            payment_status = record.get("Payment Status", "")
-            amt_str = record.get("Final Amount", "0")
-            try:
-                amt_val = float(amt_str)
-            except:
-                amt_val = 0.0
-
-            final_amt_formatted = f"₹{amt_val:,.2f}"
-            row_data = [file_no, cust_name, date, village, payment_status, final_amt_formatted]
-
-            for col_index, value in enumerate(row_data):
-                item = QTableWidgetItem(str(value))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.pending_table.setItem(row_index, col_index, item)
-
-    def populate_finalized_table(self):
-        finalized_records = []
-        for r in self.filtered_data:
-            pay_status = r.get("Payment Status", "").lower()
-            if pay_status in ("completed", "done"):
-                finalized_records.append(r)
-
-        def parse_date(record):
-            date_str = record.get("Date", "")
-            try:
-                return datetime.strptime(date_str, "%d/%m/%Y")
-            except:
-                return datetime.min
-
-        finalized_records.sort(key=parse_date)
-        finalized_records = finalized_records[:10]
-
-        self.finalized_table.setRowCount(len(finalized_records))
-
-        for row_index, record in enumerate(finalized_records):
-            file_no = record.get("File No.", "")
-            date = record.get("Date", "")
-            pay_status = record.get("Payment Status", "")
-            work_status = record.get("Work Status", "")
-
-            row_data = [file_no, date, pay_status, work_status]
-
-            for col_index, value in enumerate(row_data):
-                item = QTableWidgetItem(str(value))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.finalized_table.setItem(row_index, col_index, item)
-
     # --------------------------------------------------
     #   UPDATE DASHBOARD
     # --------------------------------------------------
-    def update_dashboard(self):
-        # Filter data based on the current state of self.date_filter_applied
-        self.filtered_data = self.apply_filter(self.data)
-
-        # Compute summary based on filtered_data (which might be all data or ranged data)
-        self.compute_summary()
+    def update_dashboard(self, partial=False):
+        """Recompute the dashboard in the background for the current filter; apply_view shows it."""
+        # partial: data.json is still streaming in; the All Cases table is
+        # only filled once everything has arrived.
+        start, end = self.date_range()
+        # Nothing is complete until the cases are in
+        partial = partial or not case_store.loaded
+        self.dashboard_worker.submit(start, end, self.activity_date_filter.currentText(), partial)
+
+    def apply_view(self, view):
+        """Show a DashboardView from the worker, unless a newer request has been made since."""
+        if not self.dashboard_worker.is_current(view.generation):
+            return
+        # Figures from half the cases would be further off than the snapshot's
+        if view.partial and self.showing_snapshot:
+            return
+        self.showing_snapshot = False
+        self.snapshot_label.hide()
+        self.show_view(view)
+
+    def show_view(self, view):
+        summary = view.summary
+        self.total_amount = summary["total"]
+        self.total_completed_amount = summary["completed"]
+        self.total_pending_amount = summary["pending"]
+        self.total_remaining_amount = summary["pending"]
+
+        self.all_case_count = summary["cases"]
+        self.final_case_count = summary["completed_cases"]
+        self.approve_case_count = summary["approved_cases"]
+        self.pending_case_count = summary["pending_cases"]
 
         # Update cards
         if self.pending_card_label:
@@ -1145,10 +1191,9 @@ class DashboardModule(QWidget):
             self.approve_case_box_label.setText(f"{self.approve_case_count:,}")
         if self.pending_case_box_label:
             self.pending_case_box_label.setText(f"{self.pending_case_count:,}")
-            
-        # Update charts and tables using self.filtered_data
+
         # Re-create chart with filtered data
-        new_chart_view = self.create_bar_chart()
+        new_chart_view = self.create_bar_chart(view.chart)
         # Find the layout containing the chart view
         parent_layout = self.chart_view.parentWidget().layout()
         # Get the index of the current chart view
@@ -1163,12 +1208,56 @@ class DashboardModule(QWidget):
         parent_layout.insertWidget(idx, self.chart_view) # Insert at the original index
 
         # Populate tables
-        self.populate_all_cases_table()
-        self.populate_pending_table()
-        self.populate_finalized_table()
+        if not view.partial:
+            self.all_cases_model.set_records(view.cases)
+            if view.unlisted:
+                self.all_cases_label.setText(f"All Cases (Filtered) - {view.unlisted:,} older cases not listed, "
+                                             f"pick a date range to see them")
+            else:
+                self.all_cases_label.setText("All Cases (Filtered)")
+        self.pending_model.set_records(view.pending)
+        self.finalized_model.set_records(view.finalized)
+        if view.activities is not None:
+            self.activity_model.set_records(view.activities)
 
-        # Update activities (remains separate filter)
-        self.filter_activities()
+    # --------------------------------------------------
+    #   SNAPSHOT
+    # --------------------------------------------------
+    def show_snapshot(self):
+        """Paint the dashboard saved by the last session until the live one is ready."""
+        if case_store.loaded:
+            # Another module has the cases already: the live figures are a moment away
+            return
+        snapshot = dashboard_snapshot.load()
+        if snapshot is None:
+            return
+        try:
+            view = DashboardView(
+                0, True, snapshot["summary"], tuple(tuple(bar) for bar in snapshot["chart"]), (),
+                tuple(Case(r) for r in snapshot["pending"]), tuple(Case(r) for r in snapshot["finalized"]), None, 0)
+            self.show_view(view)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Error showing the dashboard snapshot: {str(e)}")
+            return
+        self.showing_snapshot = True
+        # Unknown (LAN mode) or changed since: say the figures may be behind
+        version = snapshot.get("data_version")
+        if version is None or version != case_store.data_version():
+            self.snapshot_label.setText(f"Figures from {snapshot.get('saved', '')}, updating...")
+            self.snapshot_label.show()
+
+    def save_snapshot(self):
+        """Save the unfiltered dashboard as of now for the next start (on quit)."""
+        if not case_store.loaded:
+            return
+        try:
+            version = case_store.data_version()
+            worker = self.dashboard_worker
+            view = worker.build(worker.generation, None, None, "All Days", False)
+            if view is not None:
+                worker.save_snapshot(view, version)
+        except Exception as e:
+            print(f"Error saving the dashboard snapshot: {str(e)}")
 
     def load_activities(self):
         """Load and display recent activities with date filtering"""
@@ -1202,66 +1291,9 @@ class DashboardModule(QWidget):
         self.filter_activities()
 
     def filter_activities(self):
-        """Filter activities based on selected date"""
-        selected_date = self.activity_date_filter.currentText()
-        activities = self.activity_tracker.get_activities(limit=None)  # Get all activities from last 30 days
-        
-        filtered_activities = []
-        for activity in activities:
-            try:
-                activity_date = datetime.strptime(activity['datetime'].split()[0], "%Y-%m-%d")
-                # Only include activities from last 30 days
-                if (datetime.now() - activity_date).days > 30:
-                    continue
-                    
-                if selected_date == "All Days" or activity['datetime'].startswith(selected_date):
-                    filtered_activities.append(activity)
-            except:
-                continue
-        
-        # Update table with filtered activities
-        self.update_activity_table(filtered_activities)
-
-    def update_activity_table(self, activities):
-        """Update the activity table with the provided activities"""
-        # Filter out Data Sync and refresh activities
-        filtered_activities = [
-            activity for activity in activities 
-            if not (activity['action'] == 'Data Sync' or 
-                   activity['action'] == 'Refresh' or 
-                   'refresh' in activity['details'].lower() or 
-                   'sync' in activity['details'].lower())
-        ]
-        
-        # Sort activities by datetime in reverse order (newest first)
-        filtered_activities.sort(key=lambda x: datetime.strptime(x['datetime'], '%Y-%m-%d %H:%M:%S'), reverse=True)
-        
-        self.activity_table.setRowCount(len(filtered_activities))
-        for row, activity in enumerate(filtered_activities):
-            # Time
-            time_item = QTableWidgetItem(activity['datetime'])
-            time_item.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 0, time_item)
-            
-            # Module
-            module_item = QTableWidgetItem(activity['module'])
-            module_item.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 1, module_item)
-            
-            # Action
-            action_item = QTableWidgetItem(activity['action'])
-            action_item.setTextAlignment(Qt.AlignCenter)
-            self.activity_table.setItem(row, 2, action_item)
-            
-            # Details
-            details_item = QTableWidgetItem(activity['details'])
-            self.activity_table.setItem(row, 3, details_item)
-            
-        # Adjust column widths
-        self.activity_table.setColumnWidth(0, 150)  # Time
-        self.activity_table.setColumnWidth(1, 100)  # Module
-        self.activity_table.setColumnWidth(2, 100)  # Action
-        # Details column is already set to stretch
+        """Show the activities of the selected date"""
+        # Computed along with the rest of the dashboard
+        self.update_dashboard(partial=self.data_loader.loading)
 
     def log_activity(self, module: str, action: str, details: str):
         """Log a new activity and refresh the activity table"""
@@ -1277,17 +1309,9 @@ class DashboardModule(QWidget):
         self.update_dashboard()
         self.save_activity("Dashboard", "Refresh", "Dashboard data refreshed")
         
-    def auto_refresh(self):
-        """Automatically refresh data if it's not locked"""
-        try:
-            if not github_sync.is_locked():
-                self.refresh_data()
-        except Exception as e:
-            self.activity_tracker.log_activity("Dashboard", "Error", f"Auto-refresh failed: {str(e)}")
-            
     def closeEvent(self, event):
         """Clean up when window is closed"""
-        self.refresh_timer.stop()
+        data_watcher.stop()
         super().closeEvent(event)
 
 # For standalone testing
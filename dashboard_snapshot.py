@@ -0,0 +1,49 @@
+# dashboard_snapshot.py
+
+import os
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Bump whenever the saved shape changes
+SNAPSHOT_FORMAT_VERSION = 1
+
+snapshot_file = os.path.join(str(Path.home()), '.my_app_data', 'dashboard_snapshot.json')
+
+
+def save(summary, chart, pending, finalized, data_version):
+    """Save the cards, chart and top rows of an unfiltered dashboard.
+
+    data_version is case_store.data_version() as of before the figures
+    were computed, so the snapshot is only taken for current when the cases
+    on disk are still the ones it was built from.
+    """
+    snapshot = {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "data_version": data_version,
+        "saved": datetime.now().strftime("%d/%m/%Y %H:%M"),
+        "summary": summary,
+        "chart": [list(bar) for bar in chart],
+        "pending": [dict(record) for record in pending],
+        "finalized": [dict(record) for record in finalized],
+    }
+    tmp_file = f"{snapshot_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_file, snapshot_file)
+    except OSError as e:
+        print(f"Error saving the dashboard snapshot: {str(e)}")
+
+
+def load():
+    """The last saved snapshot as a dict (see save), or None if there is no usable one."""
+    try:
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return snapshot
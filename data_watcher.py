@@ -0,0 +1,72 @@
+# data_watcher.py
+
+import os
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher
+from case_store import case_store
+
+
+class DataWatcher(QObject):
+    """Notices when data.json changes on disk outside this process.
+
+    Changes come from a QFileSystemWatcher, backed by a cheap mtime/size
+    poll for drives where file notifications are unreliable. The case store
+    then refreshes in place and notifies modules only of the cases that
+    actually changed. Changes on GitHub are pulled by the replica
+    (replica.py).
+    """
+
+    # Poll intervals (ms)
+    POLL_INTERVAL = 5000
+    # Wait for a burst of file events (e.g. a write in progress) to settle
+    SETTLE_DELAY = 500
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.data_file = store.data_file
+
+        # Created in start(): it needs the QApplication to exist
+        self.watcher = None
+
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.timeout.connect(self.check_local)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.check_local)
+
+    def start(self):
+        if self.watcher is None:
+            self.watcher = QFileSystemWatcher(self)
+            self.watcher.fileChanged.connect(self.schedule_check)
+            self.watcher.directoryChanged.connect(self.schedule_check)
+        # The folder is watched too: an atomic replace drops the file's watch
+        self.watcher.addPath(os.path.dirname(self.data_file))
+        self._watch_file()
+        self.poll_timer.start(self.POLL_INTERVAL)
+
+    def stop(self):
+        self.poll_timer.stop()
+        self.settle_timer.stop()
+
+    def _watch_file(self):
+        if os.path.exists(self.data_file) and self.data_file not in self.watcher.files():
+            self.watcher.addPath(self.data_file)
+
+    # --------------------------------------------------
+    #   LOCAL
+    # --------------------------------------------------
+    def schedule_check(self, path=None):
+        self._watch_file()
+        self.settle_timer.start(self.SETTLE_DELAY)
+
+    def check_local(self):
+        """Refresh the case store if data.json changed outside this process."""
+        try:
+            self.store.refresh()
+        except Exception as e:
+            # Most likely read mid-write; the next poll tries again
+            print(f"Error refreshing changed data.json: {str(e)}")
+
+
+data_watcher = DataWatcher(case_store)
@@ -7,7 +7,8 @@ import shutil
 from functools import partial
 from datetime import datetime
 from pathlib import Path
-from github_sync import github_sync
+from replica import replica
+from case_store import case_store
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
@@ -28,17 +29,14 @@ class FinalizedReportModule(QWidget):
         # Create user data folder if it doesn't exist
         os.makedirs(self.user_data_folder, exist_ok=True)
         
-        # If running from PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # Download files from Drive if they don't exist
-            if not os.path.exists(self.data_file):
-                github_sync.download_file('data.json', self.data_file)
-
         # Initialize UI components
         self.init_ui()
 
-        # Load data after UI is initialized
-        self.load_payments()
+        # Hidden until picked in the sidebar: load on first show so startup
+        # does not wait for data.json (the dashboard streams it meanwhile)
+        self.payments = []
+        self._stale = True
+        case_store.cases_changed.connect(self.on_cases_changed)
 
     def init_ui(self):
         """Initialize the user interface components."""
@@ -127,6 +125,8 @@ class FinalizedReportModule(QWidget):
         self.year_filter_combo = QComboBox()
         self.year_filter_combo.addItem("All Years")
         self.year_filter_combo.addItems([str(year) for year in range(2020, 2041)])
+        # Past years load on demand, so the current year is shown at first
+        self.year_filter_combo.setCurrentText(str(datetime.now().year))
         self.year_filter_combo.setFixedWidth(100)
         self.year_filter_combo.setStyleSheet("""
             QComboBox {
@@ -196,20 +196,20 @@ class FinalizedReportModule(QWidget):
         self.setLayout(main_layout)
 
     def load_payments(self):
-        """Load payment data from data.json and populate the table."""
+        """Load payment data from the shared case store and populate the table."""
+        self._stale = False
         try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                self.payments = json.load(f)
+            cases = case_store.ensure_loaded()
         except json.JSONDecodeError:
             QMessageBox.critical(self, "Error", "Failed to decode JSON. Please check the data.json file.")
-            self.payments = []
+            cases = []
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred while loading payments:\n{str(e)}")
-            self.payments = []
+            cases = []
 
         # Filter payments based on all three conditions with exact values
         self.payments = [
-            p for p in self.payments 
+            p for p in cases 
             if p.get("Payment Prrovel status", "").lower() == "done" and
                p.get("Payment Status", "").lower() == "completed" and
                p.get("Work Status", "").lower() == "approved"
@@ -217,6 +217,18 @@ class FinalizedReportModule(QWidget):
 
         self.display_payments(self.payments)
 
+    def on_cases_changed(self, file_nos):
+        """Reload when a save happens; defer while this page is hidden."""
+        if self.isVisible():
+            self.load_payments()
+        else:
+            self._stale = True
+
+    def showEvent(self, event):
+        if self._stale:
+            self.load_payments()
+        super().showEvent(event)
+
     def display_payments(self, payments):
         """Display finalized payment data in the table."""
         self.table.setRowCount(0)
@@ -282,19 +294,17 @@ class FinalizedReportModule(QWidget):
         selected_year = self.year_filter_combo.currentText()
         search_query = self.search_box.text().strip().lower()
 
+        # Past years load on demand (reloading self.payments); a year filter
+        # only needs its own shard
+        case_store.ensure_year(None if selected_year == "All Years" else int(selected_year))
         filtered_payments = self.payments
 
-        if selected_month != "All Months":
-            filtered_payments = [
-                p for p in filtered_payments
-                if self.get_month(p.get("Date", "")) == selected_month
-            ]
-
-        if selected_year != "All Years":
-            filtered_payments = [
-                p for p in filtered_payments
-                if self.get_year(p.get("Date", "")) == selected_year
-            ]
+        if selected_month != "All Months" or selected_year != "All Years":
+            matched = case_store.query(
+                year=None if selected_year == "All Years" else int(selected_year),
+                month=None if selected_month == "All Months" else datetime.strptime(selected_month, "%B").month
+            )
+            filtered_payments = [p for p in filtered_payments if p.get("File No.", "") in matched]
 
         if search_query:
             filtered_payments = [
@@ -305,33 +315,13 @@ class FinalizedReportModule(QWidget):
 
         self.display_payments(filtered_payments)
 
-    def get_month(self, date_str):
-        """Extract the month name from a date string formatted as DD/MM/YYYY."""
-        try:
-            date_obj = datetime.strptime(date_str, "%d/%m/%Y")
-            return date_obj.strftime("%B")
-        except:
-            return ""
-
-    def get_year(self, date_str):
-        """Extract the year from a date string formatted as DD/MM/YYYY."""
-        try:
-            date_obj = datetime.strptime(date_str, "%d/%m/%Y")
-            return str(date_obj.year)
-        except:
-            return ""
-
     def refresh_data(self):
-        """Refresh data from GitHub"""
+        """Re-read local data and reconcile with GitHub in the background"""
         try:
-            # Try to download latest data from GitHub
-            if github_sync.download_file('data.json', self.data_file):
-                QMessageBox.information(self, "Success", "Data successfully synced")
-            else:
-                QMessageBox.warning(self, "Warning", "Could not sync from GitHub. Using local data.")
-            
-            # Reload data
-            self.load_payments()
+            # Changes pulled from GitHub arrive through case_store.cases_changed
+            replica.reconcile()
+            # Re-parse the file once for every module
+            case_store.reload()
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Error refreshing data: {str(e)}")
 
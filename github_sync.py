@@ -1 +1,399 @@
- 
\ No newline at end of file
+# github_sync.py
+
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+import github
+from github import Github, Auth
+from sync_metrics import sync_metrics
+from case_record import merge_json
+
+# Credentials never live in the source. Set GITHUB_TOKEN to a token with
+# access to the data repository. GITHUB_API_URL points the app at another
+# API server, e.g. sync_stub_server.py for offline testing.
+DEFAULT_REPO = 'aesanjagral/global-engineering-data'
+DEFAULT_API_URL = 'https://api.github.com'
+
+
+def git_blob_sha(content):
+    """The sha GitHub reports for a file with these bytes."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def merge_contents(file_name, base, local, remote):
+    """local merged with remote, a newer upload from another office (bytes; base None if unknown).
+
+    Raises when both changed the same value, so the upload is reported
+    as failed rather than made over the other office's version.
+    """
+    try:
+        merged = merge_json(json.loads(base) if base is not None else None, json.loads(local), json.loads(remote))
+    except ValueError as e:
+        raise Exception(f"{file_name} conflicts with another office's upload: {e}")
+    return json.dumps(merged, indent=4, ensure_ascii=False).encode('utf-8')
+
+
+class GitHubSync:
+    """Downloads and uploads the app's data files to a GitHub repository.
+
+    A manifest under ~/.my_app_data records the remote version (git blob
+    sha) of every file as of its last download or upload. Versions are read
+    from one listing of the repository root, so a file whose remote version
+    has not moved is neither downloaded nor uploaded again.
+    """
+
+    # Seconds a root listing answers version checks before it is fetched again
+    LISTING_TTL = 10
+
+    def __init__(self):
+        self.token = os.environ.get('GITHUB_TOKEN')
+        self.api_url = os.environ.get('GITHUB_API_URL', DEFAULT_API_URL)
+        self.github = Github(auth=Auth.Token(self.token) if self.token else None, base_url=self.api_url)
+        self.repo_name = os.environ.get('GITHUB_SYNC_REPO', DEFAULT_REPO)
+        self.branch = 'main'
+        self.setup_logging()
+        self.last_sync_time = None
+        self.sync_status = {}
+
+        self.manifest_file = os.path.join(str(Path.home()), '.my_app_data', 'sync_manifest.json')
+        self.manifest = self.load_manifest()
+        self._repo = None
+        self._listing = None
+        self._listing_time = 0
+        self._lock = threading.RLock()
+        # Files synced by a handler instead of as a whole (see register_handler)
+        self.handlers = {}
+
+    def setup_logging(self):
+        self.logger = logging.getLogger('GitHubSync')
+        self.logger.setLevel(logging.INFO)
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        handler.setFormatter(formatter)
+        self.logger.addHandler(handler)
+
+    def get_sync_status(self, file_name):
+        return self.sync_status.get(file_name, {'last_sync': None, 'status': 'unknown', 'error': None})
+
+    def update_sync_status(self, file_name, status, error=None):
+        self.sync_status[file_name] = {'last_sync': datetime.now(), 'status': status, 'error': error}
+        operation = sync_metrics.current()
+        if status == 'failed' and operation is not None:
+            operation.fail(error)
+        self.logger.info(f"Sync status for {file_name}: {status}")
+
+    def validate_file(self, local_file):
+        try:
+            return os.path.isfile(local_file) and os.access(local_file, os.R_OK)
+        except Exception:
+            return False
+
+    def create_backup(self, local_file):
+        backup_path = f"{local_file}.bak"
+        if os.path.exists(local_file):
+            with open(local_file, 'rb') as src, open(backup_path, 'wb') as dst:
+                dst.write(src.read())
+
+    def init_repo(self):
+        if self._repo is None:
+            # Lazy: no request until the repository is actually used
+            self._repo = self.github.get_repo(self.repo_name, lazy=True)
+        return self._repo
+
+    def register_handler(self, file_name, handler):
+        """Sync file_name through handler instead of as a whole file.
+
+        The handler provides download(local_path), upload(local_path) and
+        remote_version(); they raise on failure.
+        """
+        self.handlers[file_name] = handler
+
+    # --------------------------------------------------
+    #   VERSION MANIFEST
+    # --------------------------------------------------
+    def load_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            return manifest if isinstance(manifest, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_file), exist_ok=True)
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _local_stamp(self, local_path):
+        st = os.stat(local_path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def record_version(self, file_name, local_path, sha):
+        with self._lock:
+            self.manifest[file_name] = {
+                'sha': sha,
+                'local': self._local_stamp(local_path),
+                'synced': datetime.now().isoformat(timespec='seconds'),
+            }
+            self.save_manifest()
+            # A handler's version is not the sha of a root entry of this name
+            if self._listing is not None and file_name not in self.handlers:
+                self._listing[file_name] = sha
+
+    def _local_sha(self, file_name, local_path):
+        # Hashing is skipped while the file is as we last synced it
+        entry = self.manifest.get(file_name, {})
+        if entry.get('local') == self._local_stamp(local_path):
+            return entry.get('sha')
+        with open(local_path, 'rb') as f:
+            return git_blob_sha(f.read())
+
+    def remote_versions(self, refresh=False):
+        """{name: sha} of the repository root; folders carry their tree sha."""
+        with self._lock:
+            if refresh or self._listing is None or time.monotonic() - self._listing_time > self.LISTING_TTL:
+                # One small request covers every file; no file content is sent
+                entries = self.init_repo().get_contents("", ref=self.branch)
+                sync_metrics.count(requests=1)
+                self._listing = {entry.name: entry.sha for entry in entries}
+                self._listing_time = time.monotonic()
+            return dict(self._listing)
+
+    def get_remote_version(self, file_name):
+        """Remote version of file_name, or None if it does not exist."""
+        handler = self.handlers.get(file_name)
+        if handler is not None:
+            return handler.remote_version()
+        return self.remote_versions().get(file_name)
+
+    def list_folder(self, path):
+        """{file name: git blob sha} of a folder in the repository ({} if missing)."""
+        try:
+            entries = self.init_repo().get_contents(path, ref=self.branch)
+        except github.GithubException as e:
+            if e.status == 404:
+                return {}
+            raise
+        finally:
+            sync_metrics.count(requests=1)
+        return {entry.name: entry.sha for entry in entries if entry.type == 'file'}
+
+    def read_blob(self, sha):
+        """Content of a file version by its git blob sha."""
+        # The blob API serves files of any size (contents stops at 1 MB)
+        content = base64.b64decode(self.init_repo().get_git_blob(sha).content)
+        sync_metrics.count(requests=1, bytes_down=len(content))
+        return content
+
+    def read_remote_file(self, path):
+        """Current content of a (small) file by its path in the repository."""
+        content = self.init_repo().get_contents(path, ref=self.branch).decoded_content
+        sync_metrics.count(requests=1, bytes_down=len(content))
+        return content
+
+    def create_remote_file(self, path, content, message):
+        """Create a file in the repository; returns its git blob sha."""
+        sync_metrics.count(requests=1, bytes_up=len(content))
+        result = self.init_repo().create_file(path, message, content, branch=self.branch)
+        with self._lock:
+            self._listing = None
+        return result['content'].sha
+
+    def update_remote_file(self, path, content, sha, message):
+        """Replace version ``sha`` of a file; returns the new git blob sha."""
+        sync_metrics.count(requests=1, bytes_up=len(content))
+        result = self.init_repo().update_file(path, message, content, sha, branch=self.branch)
+        with self._lock:
+            self._listing = None
+        return result['content'].sha
+
+    def delete_remote_file(self, path, sha, message):
+        sync_metrics.count(requests=1)
+        self.init_repo().delete_file(path, message, sha, branch=self.branch)
+        with self._lock:
+            self._listing = None
+
+    def commit_files(self, files, message, expected=None):
+        """Write several files ({path: content}) in one commit; returns {path: git blob sha}.
+
+        expected maps root files to the version (git blob sha, or None for
+        absent) they must still have; GithubException 409 is raised when one
+        has moved. The branch is moved without force, so a commit made in
+        the meantime is never overwritten.
+        """
+        repo = self.init_repo()
+        elements = []
+        shas = {}
+        for path, content in files.items():
+            # Blobs stay valid across attempts; only the commit is redone
+            sync_metrics.count(requests=1, bytes_up=len(content))
+            blob = repo.create_git_blob(base64.b64encode(content).decode('ascii'), 'base64')
+            elements.append(github.InputGitTreeElement(path, '100644', 'blob', sha=blob.sha))
+            shas[path] = blob.sha
+
+        for attempt in range(3):
+            ref = repo.get_git_ref(f"heads/{self.branch}")
+            head = repo.get_git_commit(ref.object.sha)
+            sync_metrics.count(requests=2)
+            if expected:
+                current = {entry.path: entry.sha for entry in repo.get_git_tree(head.tree.sha).tree}
+                sync_metrics.count(requests=1)
+                for path, sha in expected.items():
+                    if current.get(path) != sha:
+                        raise github.GithubException(409, {"message": f"{path} has changed in {self.repo_name}"})
+            tree = repo.create_git_tree(elements, head.tree)
+            commit = repo.create_git_commit(message, tree, [head])
+            sync_metrics.count(requests=3)
+            try:
+                ref.edit(commit.sha, force=False)
+                break
+            except github.GithubException as e:
+                # 422: the branch moved since it was read; check again from the new head
+                if e.status != 422 or attempt == 2:
+                    raise
+                sync_metrics.count(retries=1)
+        with self._lock:
+            self._listing = None
+        return shas
+
+    # --------------------------------------------------
+    #   TRANSFER
+    # --------------------------------------------------
+    def write_local(self, local_path, content):
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        tmp_file = f"{local_path}.{os.getpid()}.download"
+        with open(tmp_file, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_file, local_path)
+
+    def download_file(self, file_name, local_path):
+        """Bring local_path up to date with file_name in the repository.
+
+        Nothing is transferred when the remote version is the one last
+        synced (local edits not yet uploaded are kept) or the local file
+        already has the same content.
+        """
+        with sync_metrics.operation('download', file_name):
+            return self._download_file(file_name, local_path)
+
+    def _download_file(self, file_name, local_path):
+        try:
+            handler = self.handlers.get(file_name)
+            if handler is not None:
+                handler.download(local_path)
+                self.update_sync_status(file_name, 'success')
+                return True
+
+            remote_sha = self.get_remote_version(file_name)
+            if remote_sha is None:
+                raise Exception(f"{file_name} not found in {self.repo_name}")
+
+            if os.path.exists(local_path):
+                if self.manifest.get(file_name, {}).get('sha') == remote_sha:
+                    sync_metrics.count(cache_hits=1)
+                    self.update_sync_status(file_name, 'success')
+                    return True
+                if self._local_sha(file_name, local_path) == remote_sha:
+                    sync_metrics.count(cache_hits=1)
+                    self.record_version(file_name, local_path, remote_sha)
+                    self.update_sync_status(file_name, 'success')
+                    return True
+
+            self.write_local(local_path, self.read_blob(remote_sha))
+            self.record_version(file_name, local_path, remote_sha)
+            self.update_sync_status(file_name, 'success')
+            return True
+        except github.GithubException as e:
+            error_msg = e.data.get('message', str(e)) if isinstance(e.data, dict) else str(e)
+            self.logger.error(f"GitHub API error: {error_msg}")
+            self.update_sync_status(file_name, 'failed', error_msg)
+            return False
+        except Exception as e:
+            error_msg = str(e)
+            self.logger.error(f"Failed to download file: {error_msg}")
+            self.update_sync_status(file_name, 'failed', error_msg)
+            return False
+
+    def sync_file(self, local_file):
+        """Upload local_file to the repository root, unless it is unchanged there."""
+        with sync_metrics.operation('upload', Path(local_file).name):
+            return self._sync_file(local_file)
+
+    def _sync_file(self, local_file):
+        file_name = Path(local_file).name
+        if not self.validate_file(local_file):
+            self.update_sync_status(file_name, 'failed', 'Invalid or inaccessible file')
+            return False
+
+        try:
+            handler = self.handlers.get(file_name)
+            if handler is not None:
+                handler.upload(local_file)
+                self.update_sync_status(file_name, 'success')
+                return True
+
+            self.create_backup(local_file)
+            with open(local_file, 'rb') as f:
+                content = f.read()
+            local_sha = git_blob_sha(content)
+
+            repo = self.init_repo()
+            remote_sha = self.get_remote_version(file_name)
+            if remote_sha == local_sha:
+                self.record_version(file_name, local_file, local_sha)
+                self.update_sync_status(file_name, 'success')
+                return True
+
+            # The version last synced here; a newer remote one is another
+            # office's upload, merged in before ours goes over it
+            base_sha = self.manifest.get(file_name, {}).get('sha')
+            for attempt in range(3):
+                if remote_sha is not None and remote_sha != base_sha:
+                    sync_metrics.count(conflicts=1)
+                    base = self.read_blob(base_sha) if base_sha else None
+                    content = merge_contents(file_name, base, content, self.read_blob(remote_sha))
+                    self.write_local(local_file, content)
+                    if git_blob_sha(content) == remote_sha:
+                        self.record_version(file_name, local_file, remote_sha)
+                        self.update_sync_status(file_name, 'success')
+                        return True
+                    base_sha = remote_sha
+
+                sync_metrics.count(requests=1, bytes_up=len(content))
+                try:
+                    if remote_sha is None:
+                        result = repo.create_file(file_name, f"Create {file_name} - {datetime.now()}", content, branch=self.branch)
+                    else:
+                        result = repo.update_file(file_name, f"Update {file_name} - {datetime.now()}", content, remote_sha, branch=self.branch)
+                    break
+                except github.GithubException as e:
+                    # 409/422: someone uploaded since the version was read; merge theirs too
+                    if e.status not in (409, 422) or attempt == 2:
+                        raise
+                    sync_metrics.count(retries=1)
+                    remote_sha = self.remote_versions(refresh=True).get(file_name)
+
+            self.record_version(file_name, local_file, result['content'].sha)
+            self.update_sync_status(file_name, 'success')
+            return True
+        except github.GithubException as e:
+            error_msg = e.data.get('message', str(e)) if isinstance(e.data, dict) else str(e)
+            self.logger.error(f"GitHub API error: {error_msg}")
+            self.update_sync_status(file_name, 'failed', error_msg)
+            return False
+        except Exception as e:
+            error_msg = str(e)
+            self.logger.error(f"Failed to sync file: {error_msg}")
+            self.update_sync_status(file_name, 'failed', error_msg)
+            return False
+
+
+github_sync = GitHubSync()
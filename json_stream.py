@@ -0,0 +1,76 @@
+# json_stream.py
+
+import json
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(path, block_size=1 << 16):
+    """Yield the items of a top-level JSON array one at a time.
+
+    The file is read in blocks and each item is decoded as soon as it is
+    complete, so only one block plus the current item is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(block_size)
+        eof = not buf
+        pos = 0
+
+        def skip(chars):
+            nonlocal buf, pos, eof
+            while True:
+                while pos < len(buf) and buf[pos] in chars:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                buf, pos = f.read(block_size), 0
+                eof = not buf
+
+        skip(_WHITESPACE)
+        if pos >= len(buf) or buf[pos] != '[':
+            raise json.JSONDecodeError("Expecting '['", buf, pos)
+        pos += 1
+
+        first = True
+        while True:
+            skip(_WHITESPACE)
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            if not first:
+                if pos >= len(buf) or buf[pos] != ',':
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+                pos += 1
+                skip(_WHITESPACE)
+            first = False
+
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    # Only trust the item once its delimiter is in the buffer:
+                    # a number cut at a block boundary decodes as a shorter one
+                    nxt = end
+                    while nxt < len(buf) and buf[nxt] in _WHITESPACE:
+                        nxt += 1
+                    if eof or (nxt < len(buf) and buf[nxt] in ',]'):
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                more = f.read(block_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+            pos = end
+            yield item
+
+
+def iter_json_batches(path, batch_size=1000):
+    """Yield lists of up to ``batch_size`` items of a top-level JSON array."""
+    batch = []
+    for item in iter_json_array(path):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
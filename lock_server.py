@@ -0,0 +1,122 @@
+# lock_server.py
+#
+# A small case lock server for offices on one LAN, and a stand-in for
+# testing case_locks without GitHub:
+#
+#     python lock_server.py [port]
+#     CASE_LOCK_SERVER=http://<server>:8766 python main.py
+#
+# Leases are kept in memory; after a restart clients re-claim theirs with
+# their next heartbeat.
+
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8766
+
+
+class LeaseTable:
+    """{File No.: lease} with expiry by the server's own clock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.leases = {}
+
+    def _live(self):
+        now = time.monotonic()
+        self.leases = {f: lease for f, lease in self.leases.items() if lease["expires"] > now}
+        return self.leases
+
+    def _public(self, lease):
+        return {"owner": lease["owner"], "client": lease["client"],
+                "ttl": max(0.0, lease["expires"] - time.monotonic())}
+
+    def snapshot(self):
+        with self.lock:
+            return {f: self._public(lease) for f, lease in self._live().items()}
+
+    def acquire(self, file_nos, owner, client, ttl):
+        with self.lock:
+            leases = self._live()
+            for file_no in file_nos:
+                held = leases.get(file_no)
+                if held is not None and held["client"] != client:
+                    return {"granted": False, "file_no": file_no, "held_by": self._public(held)}
+            for file_no in file_nos:
+                leases[file_no] = {"owner": owner, "client": client, "expires": time.monotonic() + ttl}
+            return {"granted": True}
+
+    def renew(self, file_nos, owner, client, ttl):
+        with self.lock:
+            leases = self._live()
+            lost = []
+            for file_no in file_nos:
+                held = leases.get(file_no)
+                if held is not None and held["client"] != client:
+                    lost.append(file_no)
+                else:
+                    leases[file_no] = {"owner": owner, "client": client, "expires": time.monotonic() + ttl}
+            return {"lost": lost}
+
+    def release(self, file_nos, client):
+        with self.lock:
+            leases = self._live()
+            for file_no in file_nos:
+                if leases.get(file_no, {}).get("client") == client:
+                    del leases[file_no]
+            return {}
+
+
+class LockHandler(BaseHTTPRequestHandler):
+    table = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/leases':
+            return self.send_json(200, {"leases": self.table.snapshot()})
+        self.send_json(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            file_nos = [str(f) for f in data.get("file_nos", [])]
+            if self.path == '/acquire':
+                result = self.table.acquire(file_nos, data["owner"], data["client"], float(data["ttl"]))
+            elif self.path == '/renew':
+                result = self.table.renew(file_nos, data["owner"], data["client"], float(data["ttl"]))
+            elif self.path == '/release':
+                result = self.table.release(file_nos, data["client"])
+            else:
+                return self.send_json(404, {"message": "Not Found"})
+        except (ValueError, KeyError, TypeError) as e:
+            return self.send_json(400, {"message": str(e)})
+        print(f"{self.path} {file_nos} by {data.get('client')}: {result}")
+        self.send_json(200, result)
+
+
+def serve(port=DEFAULT_PORT):
+    """Start a lock server in a background thread and return it."""
+    handler = type('Handler', (LockHandler,), {'table': LeaseTable()})
+    server = ThreadingHTTPServer(('0.0.0.0', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    handler = type('Handler', (LockHandler,), {'table': LeaseTable()})
+    print(f"Case lock server on port {port}")
+    ThreadingHTTPServer(('0.0.0.0', port), handler).serve_forever()
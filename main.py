@@ -11,7 +11,7 @@ from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QScrollArea, QStackedWidget, QMessageBox, QPushButton, QLineEdit
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QEventLoop
 from PyQt5.QtGui import QIcon
 from dashboard import DashboardModule
 from finalized_report import FinalizedReportModule
@@ -23,7 +23,17 @@ from paymentdon import PaymentDoneModule
 from profile import ProfileModule
 from manage_locations import ManageLocationsModule
 
-from github_sync import github_sync
+import snapshot_cache
+from case_store import case_store
+from startup_sync import startup_sync
+from sync_queue import sync_queue
+from replica import replica
+from case_locks import case_locks
+from sync_diagnostics import SyncDiagnosticsDialog
+# Syncs data.json case by case and the other data files as chunks
+# (both register themselves with github_sync)
+import case_sync  # noqa: F401 (registers the data.json sync handler)
+import chunk_store  # noqa: F401 (registers the chunked file handler)
 
 # NEW: import PrintReportModule
 from print_report import PrintReportModule
@@ -77,6 +87,15 @@ def resource_path(relative_path):
 
 # Set application icon globally
 app = QApplication(sys.argv)
+# Saves are written out in coalesced batches; don't quit with one pending
+app.aboutToQuit.connect(case_store.flush)
+# Uploads left over from the last run
+sync_queue.start()
+# Case lock leases: keep everyone's fresh for lock checks, give ours back on quit
+case_locks.start()
+app.aboutToQuit.connect(case_locks.release_all)
+# Local copies are the working store; GitHub is reconciled in the background
+replica.start()
 icon_path = get_app_icon()
 if icon_path:
     app_icon = QIcon(icon_path)
@@ -417,8 +436,7 @@ class MainWindow(QWidget):
         self.user_data_folder = os.path.join(str(Path.home()), '.my_app_data')
         self.locations_file = os.path.join(self.user_data_folder, 'locations.json')
         try:
-            with open(self.locations_file, 'r', encoding='utf-8') as f:
-                self.locations_data = json.load(f)
+            self.locations_data = snapshot_cache.load_json(self.locations_file)
         except:
             self.locations_data = {}
 
@@ -460,6 +478,28 @@ class MainWindow(QWidget):
 
         self.sidebar_layout.addStretch()
 
+        # Uploads waiting in the background sync queue; click to retry now
+        self.sync_status_button = QPushButton()
+        self.sync_status_button.setFixedSize(180, 40)
+        self.sync_status_button.setStyleSheet("""
+            QPushButton {
+                background-color: #fff6ee;
+                border: 1px solid #ffcea1;
+                padding: 5px 10px;
+                text-align: left;
+                font-size: 12px;
+                color: #564234;
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #ffd2a6;
+            }
+        """)
+        self.sync_status_button.clicked.connect(self.show_sync_diagnostics)
+        self.sidebar_layout.addWidget(self.sync_status_button)
+        replica.status_changed.connect(self.update_sync_status)
+        self.update_sync_status(replica.pending_changes(), replica.is_offline())
+
         sidebar_content = QWidget()
         sidebar_content.setLayout(self.sidebar_layout)
 
@@ -522,6 +562,39 @@ class MainWindow(QWidget):
         self.logout_button.clicked.connect(self.logout)
         self.manage_locations_button.clicked.connect(self.show_manage_locations)
 
+        # A data file updated by the startup sync or a later reconciliation
+        startup_sync.file_updated.connect(self.on_data_file_updated)
+        replica.file_updated.connect(self.on_data_file_updated)
+
+    def update_sync_status(self, pending, offline):
+        if offline:
+            self.sync_status_button.setText(f"\u26A0 Offline \u00B7 {pending} pending")
+            self.sync_status_button.setToolTip(
+                f"Working on local data; {pending} change(s) will be uploaded when GitHub is reachable. "
+                "Click for details or to retry now.")
+        elif pending:
+            self.sync_status_button.setText(f"\u21E7 Syncing {pending} change(s)")
+            self.sync_status_button.setToolTip("Saved changes are being uploaded to GitHub. Click for details.")
+        else:
+            self.sync_status_button.setText("\u2601 All changes synced")
+            self.sync_status_button.setToolTip("Click for sync details.")
+
+    def show_sync_diagnostics(self):
+        SyncDiagnosticsDialog(self).exec_()
+
+    def on_data_file_updated(self, file_name):
+        # data.json is refreshed through the case store
+        if file_name == 'locations.json':
+            try:
+                self.locations_data = snapshot_cache.load_json(self.locations_file)
+            except:
+                self.locations_data = {}
+            self.add_entry_module.load_locations()
+        elif file_name == 'work_types.json':
+            self.profile_module.load_work_types()
+        elif file_name == 'work_done.json':
+            self.profile_module.load_work_done()
+
     def add_sidebar_button(self, text, bg_color, active=False):
         button = QPushButton(text)
         button.setFixedSize(180, 50)
@@ -665,25 +738,14 @@ class MainWindow(QWidget):
     def check_for_updates(self):
         show_update_dialog()
 
-def sync_all_data():
-    """Sync all data files from GitHub"""
-    data_files = [
-        'data.json',
-        'work_types.json',
-        'work_done.json',
-        'locations.json'
-    ]
-    
-    user_data_folder = os.path.join(str(Path.home()), '.my_app_data')
-    os.makedirs(user_data_folder, exist_ok=True)
-    
-    failed_files = []
-    for file in data_files:
-        local_path = os.path.join(user_data_folder, file)
-        if not github_sync.download_file(file, local_path):
-            failed_files.append(file)
-            
-    return failed_files
+def show_sync_warning(failed_files):
+    # Files with a local copy are simply used offline (see the sidebar status)
+    missing = [name for name in failed_files if not os.path.exists(startup_sync.local_path(name))]
+    if not missing:
+        return
+    error_msg = "Following files could not be downloaded and have no local copy yet:\n- " + "\n- ".join(missing)
+    error_msg += "\n\nThey will be downloaded as soon as GitHub is reachable."
+    QMessageBox.warning(None, "Sync Warning", error_msg)
 
 if __name__ == "__main__":
     try:
@@ -706,16 +768,25 @@ if __name__ == "__main__":
         splash.move(screen.center() - splash.rect().center())
         splash.show()
         app.processEvents()  # Ensure splash is shown
-        
-        # Sync data files
-        failed_files = sync_all_data()
+
+        # Sync data files in the background; only files with no local copy
+        # yet are waited for, later updates arrive through file_updated
+        wait_loop = QEventLoop()
+
+        def on_file_synced(file_name, ok, done, total):
+            splash.setText(f"Syncing data files... {done}/{total}\n{file_name}{'' if ok else ' (failed)'}")
+            splash.adjustSize()
+            if startup_sync.local_copies_ready():
+                wait_loop.quit()
+
+        startup_sync.file_synced.connect(on_file_synced)
+        startup_sync.finished.connect(lambda failed: show_sync_warning(failed) if failed else None)
+        startup_sync.start()
+        if not startup_sync.local_copies_ready():
+            wait_loop.exec_()
+        startup_sync.file_synced.disconnect(on_file_synced)
         splash.close()
-        
-        if failed_files:
-            error_msg = "Following files failed to sync:\n- " + "\n- ".join(failed_files)
-            error_msg += "\n\nThe app will use local data if available."
-            QMessageBox.warning(None, "Sync Warning", error_msg)
-        
+
     except Exception as e:
         QMessageBox.critical(None, "Error", f"Failed to initialize application: {str(e)}")
         sys.exit(1)
@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPainter, QColor, QFont
-from github_sync import github_sync
+from sync_queue import sync_queue
 import json
 
 class CustomComboBox(QComboBox):
@@ -152,8 +152,8 @@ class ManageLocationsModule(QDialog):
             with open(self.locations_file, 'w', encoding='utf-8') as f:
                 json.dump(self.locations_data, f, indent=4, ensure_ascii=False)
             
-            # Sync with GitHub
-            github_sync.sync_file(self.locations_file)
+            # Queue the upload to GitHub
+            sync_queue.enqueue(self.locations_file)
             
             # Refresh AddEntryModule if it exists
             if hasattr(self.parent, 'add_entry_module'):
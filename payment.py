@@ -10,14 +10,18 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QIcon, QDoubleValidator, QFont, QColor, QPixmap
 import json
 import os
+import copy
 from functools import partial
 from datetime import datetime
-import sys
 import shutil
 from pathlib import Path
-from github_sync import github_sync
+from sync_queue import sync_queue
+from case_locks import case_locks
 from related_cases import RelatedCasesPaymentDialog
 from activity_tracker import ActivityTracker
+from case_store import case_store
+from case_record import Case
+from case_conflict import commit_case
 
 class PaymentStatusPopup(QDialog):
     """Popup dialog to manage payment status and multiple payments."""
@@ -29,23 +33,18 @@ class PaymentStatusPopup(QDialog):
         self.setGeometry(300, 300, 900, 500)
         
         # Add user_id attribute
-        self.user_id = os.getlogin()  # Get current Windows username as user_id
+        self.user_id = case_locks.owner
         
-        # Check if file is locked
-        self.lock_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locks', f"{sale.get('File No.', '')}.lock")
-        os.makedirs(os.path.dirname(self.lock_file), exist_ok=True)
-        
-        if os.path.exists(self.lock_file):
-            with open(self.lock_file, 'r') as f:
-                locked_by = f.read().strip()
-            if locked_by != self.user_id:
-                QMessageBox.warning(self, "File Locked", f"This file is currently being edited by {locked_by}. Please try again later.")
-                self.reject()
-                return
-        
-        # Create lock file
-        with open(self.lock_file, 'w') as f:
-            f.write(self.user_id)
+        # A case being edited elsewhere cannot be opened
+        self.file_no = sale.get('File No.', '')
+        holder = case_locks.holder(self.file_no)
+        self.locked_out = holder is not None
+        if self.locked_out:
+            QMessageBox.warning(self, "File Locked", f"This file is currently being edited by {holder['owner']}. Please try again later.")
+            self.reject()
+            return
+        # The case as opened; the payments are saved against it (see PaymentModule.open_payment_status_popup)
+        self.base = copy.deepcopy(dict(sale))
         
         self.setStyleSheet("""
             QDialog {
@@ -88,8 +87,11 @@ class PaymentStatusPopup(QDialog):
         """)
 
         self.total_amount = float(self.sale.get('Final Amount', 0.0))
-        self.payments = self.sale.get("Payments", [])
-        self.sale['related_cases'] = self.sale.get('related_cases', [])  # Initialize related cases
+        # Edited here and saved through commit_case once the popup is accepted
+        self.payments = copy.deepcopy(self.sale.get("Payments", []))
+        self.related_cases = list(self.sale.get('related_cases', []))
+        # Payments added here; they are copied to the related cases on save
+        self.new_payments = []
 
         layout = QVBoxLayout()
 
@@ -434,17 +436,10 @@ class PaymentStatusPopup(QDialog):
             }
             self.payments.append(new_payment)
 
-            # Automatically apply payment to related cases
-            if 'related_cases' in self.sale:
-                relationship_id = f"rel_{payment_date.replace('/', '')}_{payment_method}"
-                new_payment['Relationship ID'] = relationship_id
-                
-                parent = self.parent()
-                for file_no in self.sale['related_cases']:
-                    for case in parent.payments:
-                        if case.get('File No.') == file_no:
-                            case.setdefault('Payments', []).append(new_payment.copy())
-                            break
+            # Applied to the related cases too when the popup is saved
+            relationship_id = f"rel_{payment_date.replace('/', '')}_{payment_method}"
+            new_payment['Relationship ID'] = relationship_id
+            self.new_payments.append(new_payment)
 
             self.load_payments_table()
 
@@ -465,13 +460,10 @@ class PaymentStatusPopup(QDialog):
             payment_details = f"Added payment of ₹{amount:.2f} via {payment_method} for {self.sale.get('Customer Name', 'Unknown')}"
             self.activity_tracker.log_activity("Payment", "Added", payment_details)
             
-            # Sync with GitHub after adding payment
-            try:
-                parent = self.parent()
-                if hasattr(parent, 'data_file'):
-                    github_sync.sync_file(parent.data_file)
-            except Exception as e:
-                QMessageBox.warning(self, "Sync Warning", f"Payment added but sync failed: {str(e)}")
+            # Queue the upload to GitHub after adding payment
+            parent = self.parent()
+            if hasattr(parent, 'data_file'):
+                sync_queue.enqueue(parent.data_file)
             
             # Refresh the dashboard if it exists
             main_window = self.window()
@@ -490,6 +482,9 @@ class PaymentStatusPopup(QDialog):
             dialog = EditPaymentDialog(payment, self)
             if dialog.exec_() == QDialog.Accepted:
                 self.payments[row] = dialog.payment
+                for i, new_payment in enumerate(self.new_payments):
+                    if new_payment is payment:
+                        self.new_payments[i] = dialog.payment
                 self.load_payments_table()
 
                 # Update summary labels
@@ -528,6 +523,7 @@ class PaymentStatusPopup(QDialog):
             
             # Delete the payment
             del self.payments[row]
+            self.new_payments = [p for p in self.new_payments if p is not payment]
             
             # Update the table
             self.load_payments_table()
@@ -543,7 +539,13 @@ class PaymentStatusPopup(QDialog):
     def open_related_cases_payment(self):
         dialog = RelatedCasesPaymentDialog(self.parent().payments, self.sale, self.parent())
         if dialog.exec_() == QDialog.Accepted:
+            # The dialog saved its payments already, this case's among them:
+            # they count as part of the case this popup was opened on
+            for payment in dialog.added_payments.get(self.file_no, []):
+                self.payments.append(copy.deepcopy(payment))
+                self.base.setdefault("Payments", []).append(copy.deepcopy(payment))
             self.load_payments_table()
+            self.update_summary_labels()
             self.parent().load_payments()
 
     def save_and_close(self):
@@ -555,15 +557,6 @@ class PaymentStatusPopup(QDialog):
         self.total_paid_label.setText(f"Total Paid: ₹{self.get_total_paid():.2f}")
         self.remaining_amount_label.setText(f"Remaining: ₹{self.get_remaining_amount():.2f}")
 
-    def closeEvent(self, event):
-        """Handle the close event to remove the lock file."""
-        try:
-            if os.path.exists(self.lock_file):
-                os.remove(self.lock_file)
-        except Exception as e:
-            print(f"Error removing lock file: {str(e)}")
-        event.accept()
-
 class EditPaymentDialog(QDialog):
     """Dialog to edit an existing payment."""
     def __init__(self, payment, parent=None):
@@ -721,6 +714,8 @@ class BatchPaymentDialog(QDialog):
     def __init__(self, cases, parent=None):
         super().__init__(parent)
         self.cases = cases
+        # File Nos. that received a payment, for the caller to save
+        self.updated_file_nos = []
         self.setWindowTitle("Batch Payment Distribution")
         self.setGeometry(300, 300, 1000, 600)
         self.setStyleSheet("""
@@ -910,12 +905,8 @@ class BatchPaymentDialog(QDialog):
             self.cases_table.setItem(row, 1, QTableWidgetItem(case.get("File No.", "")))
             self.cases_table.setItem(row, 2, QTableWidgetItem(case.get("Customer Name", "")))
             
-            total_amount = float(case.get("Final Amount", 0.0))
-            self.cases_table.setItem(row, 3, QTableWidgetItem(f"₹{total_amount:.2f}"))
-            
-            total_paid = sum(float(p["Amount Paid"]) for p in case.get("Payments", []))
-            remaining = total_amount - total_paid
-            self.cases_table.setItem(row, 4, QTableWidgetItem(f"₹{remaining:.2f}"))
+            self.cases_table.setItem(row, 3, QTableWidgetItem(f"₹{case.final_amount:.2f}"))
+            self.cases_table.setItem(row, 4, QTableWidgetItem(f"₹{case.remaining_amount:.2f}"))
             
         # Connect itemChanged signal to update summary
         self.cases_table.itemChanged.connect(self.update_summary)
@@ -1040,18 +1031,31 @@ class BatchPaymentDialog(QDialog):
         cheque_no = self.cheque_no_edit.text() if payment_method == "Cheque" else ""
         cheque_date = self.cheque_date_edit.date().toString("dd/MM/yyyy") if payment_method == "Cheque" else ""
 
+        # Lock every selected case at once; none is paid while any is being edited elsewhere
+        file_nos = [self.cases[row].get("File No.", "") for row in distributions]
+        granted, holder = case_locks.acquire(file_nos)
+        if not granted:
+            QMessageBox.warning(self, "File Locked", f"File No. {holder['file_no']} is currently being edited by {holder['owner']}. Please try again later.")
+            return
+
         # Update payments for each case
-        for row, amount in distributions.items():
-            payment = {
-                "Amount Paid": f"{amount:.2f}",
-                "Payment Date": payment_date,
-                "Payment Method": payment_method,
-                "Narration": narration,
-                "Cheque No.": cheque_no,
-                "Cheque Date": cheque_date,
-                "Batch Payment": True  # Flag to identify batch payments
-            }
-            self.cases[row].setdefault("Payments", []).append(payment)
+        self.updated_file_nos = file_nos
+        try:
+            for row, amount in distributions.items():
+                payment = {
+                    "Amount Paid": f"{amount:.2f}",
+                    "Payment Date": payment_date,
+                    "Payment Method": payment_method,
+                    "Narration": narration,
+                    "Cheque No.": cheque_no,
+                    "Cheque Date": cheque_date,
+                    "Batch Payment": True  # Flag to identify batch payments
+                }
+                self.cases[row].setdefault("Payments", []).append(payment)
+            # Saved before the locks go, so no other office edits these cases in between
+            case_store.save(file_nos)
+        finally:
+            case_locks.release(file_nos)
 
         self.accept()
 
@@ -1167,6 +1171,8 @@ class PaymentModule(QWidget):
         self.year_filter_combo = QComboBox()
         self.year_filter_combo.addItem("All")
         self.year_filter_combo.addItems([str(year) for year in range(2020, 2041)])  # 2020 to 2040 inclusive
+        # Past years load on demand, so the current year is shown at first
+        self.year_filter_combo.setCurrentText(str(datetime.now().year))
         self.year_filter_combo.setFixedWidth(100)
         self.year_filter_combo.setStyleSheet("""
             QComboBox {
@@ -1449,20 +1455,16 @@ class PaymentModule(QWidget):
         # Create user data folder if it doesn't exist
         os.makedirs(self.user_data_folder, exist_ok=True)
 
-        # If running from PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # Download files from Drive if they don't exist
-            if not os.path.exists(self.data_file):
-                github_sync.download_file('data.json', self.data_file)
-
-        # Load data initially
-        self.load_payments()
+        # Hidden until picked in the sidebar: load on first show so startup
+        # does not wait for data.json (the dashboard streams it meanwhile)
+        self.payments = []
+        self._stale = True
+        case_store.cases_changed.connect(self.on_cases_changed)
 
     def load_payments(self):
-        """Load payment data from data.json and populate the table."""
+        """Load payment data from the shared case store and populate the table."""
         try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                self.payments = json.load(f)
+            self.payments = case_store.ensure_loaded()
         except json.JSONDecodeError:
             QMessageBox.critical(self, "Error", "Failed to decode JSON. Please check the data.json file.")
             self.payments = []
@@ -1477,25 +1479,26 @@ class PaymentModule(QWidget):
 
         self.update_all_payment_statuses()
 
+        self._stale = False
         self.display_payments(self.payments)
         self.update_summary()  # Update the summary after loading payments
 
+    def on_cases_changed(self, file_nos):
+        """Reload when a save happens; defer while this page is hidden."""
+        if self.isVisible():
+            self.load_payments()
+        else:
+            self._stale = True
+
+    def showEvent(self, event):
+        if self._stale:
+            self.load_payments()
+        super().showEvent(event)
+
     def update_all_payment_statuses(self):
         """Update Payment Status for all sales based on their payments."""
         for sale in self.payments:
-            total_paid = sum(float(p["Amount Paid"]) for p in sale.get("Payments", []))
-            final_amount = sale.get("Final Amount", "0.0")
-            if not final_amount or final_amount.strip() == '':
-                final_amount = "0.0"
-            total_amount = float(final_amount)
-            if total_paid == 0:
-                sale["Payment Status"] = "Pending"
-            elif 0 < total_paid < total_amount:
-                sale["Payment Status"] = "Half Paid"
-            elif total_paid > total_amount:
-                sale["Payment Status"] = "Overpayment"
-            else:
-                sale["Payment Status"] = "Completed"
+            sale["Payment Status"] = sale.derived_payment_status
 
     def display_payments(self, payments):
         """Display payment data in the table."""
@@ -1557,23 +1560,17 @@ class PaymentModule(QWidget):
             self.table.setItem(row_position, 9, plot_no_item)
 
             # Total Amount
-            final_amount = sale.get('Final Amount', "0.0")
-            if not final_amount or final_amount.strip() == '':
-                final_amount = "0.0"
-            total_amount = float(final_amount)
-            total_amount_item = QTableWidgetItem(f"₹{total_amount:,.2f}")
+            total_amount_item = QTableWidgetItem(f"₹{sale.final_amount:,.2f}")
             total_amount_item.setTextAlignment(Qt.AlignCenter)
             self.table.setItem(row_position, 10, total_amount_item)
 
             # Paid Payment
-            paid_payment = sum(float(p["Amount Paid"]) for p in sale.get("Payments", []))
-            paid_payment_item = QTableWidgetItem(f"₹{paid_payment:,.2f}")
+            paid_payment_item = QTableWidgetItem(f"₹{sale.paid_amount:,.2f}")
             paid_payment_item.setTextAlignment(Qt.AlignCenter)
             self.table.setItem(row_position, 11, paid_payment_item)
 
             # Remaining Amount
-            remaining_amount = total_amount - paid_payment
-            remaining_amount_item = QTableWidgetItem(f"₹{remaining_amount:,.2f}")
+            remaining_amount_item = QTableWidgetItem(f"₹{sale.remaining_amount:,.2f}")
             remaining_amount_item.setTextAlignment(Qt.AlignCenter)
             self.table.setItem(row_position, 12, remaining_amount_item)
 
@@ -1631,38 +1628,41 @@ class PaymentModule(QWidget):
     def open_payment_status_popup(self, sale):
         """Open the PaymentStatusPopup dialog for the given sale."""
         dialog = PaymentStatusPopup(sale, self)
+        if dialog.locked_out:
+            return
         if dialog.exec_() == QDialog.Accepted:
-            # Update the sale's payments
-            self.update_sale_payments(sale, dialog.payments)
-            self.save_payments()
-            self.load_payments()
+            # Saved only if nobody else saved the case since the popup opened,
+            # or their changes merge with the payments made here
+            record = Case(copy.deepcopy(dialog.base))
+            self.update_sale_payments(record, dialog.payments)
+            sale = commit_case(self, dialog.base, record)
+            if sale is None:
+                return
+            # Payments added in the popup are also copied to related cases
+            for file_no in dialog.related_cases if dialog.new_payments else []:
+                related = case_store.get(file_no)
+                if related is None:
+                    continue
+                base = copy.deepcopy(dict(related))
+                record = Case(copy.deepcopy(base))
+                self.update_sale_payments(record, record.get("Payments", []) + copy.deepcopy(dialog.new_payments))
+                commit_case(self, base, record)
             QMessageBox.information(self, "Success", "Payment details have been updated successfully.")
 
     def update_sale_payments(self, sale, updated_payments):
         """Update the payments for a specific sale."""
         sale['Payments'] = updated_payments
         # Update Payment Status based on updated payments
-        total_paid = sum(float(p["Amount Paid"]) for p in updated_payments)
-        total_amount = float(sale.get("Final Amount", 0.0))
-        if total_paid == 0:
-            sale["Payment Status"] = "Pending"
-        elif 0 < total_paid < total_amount:
-            sale["Payment Status"] = "Half Paid"
-        elif total_paid > total_amount:
-            sale["Payment Status"] = "Overpayment"
-        else:
-            sale["Payment Status"] = "Completed"
+        sale["Payment Status"] = sale.derived_payment_status
         # Ensure "Work Status" is not modified
 
-    def save_payments(self):
-        """Save the current payment data back to data.json."""
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.payments, f, indent=4, ensure_ascii=False)
-            
-            # Sync with GitHub
-            github_sync.sync_file(self.data_file)
+    def save_payments(self, file_nos):
+        """Save the named cases through the shared case store."""
+        # An empty list would mean "every case" to the store
+        if not file_nos:
             return True
+        try:
+            return case_store.save(file_nos)
         except Exception as e:
             print(f"Error saving data: {str(e)}")
             return False
@@ -1699,43 +1699,18 @@ class PaymentModule(QWidget):
         selected_status = self.filter_combo.currentText()
         search_query = self.search_box.text().strip().lower()
 
+        # Month/year/status are answered by the case store (indexed when the
+        # SQLite engine is enabled) instead of parsing every row's date here
+        matched = case_store.query(
+            year=None if selected_year == "All" else int(selected_year),
+            month=None if selected_month == "All" else datetime.strptime(selected_month, "%B").month,
+            payment_status=None if selected_status == "All" else selected_status
+        )
+
         for row in range(self.table.rowCount()):
             # Get sale data from the loaded payments
             sale = self.payments[row]
-
-            # Filter by Payment Status
-            status = sale.get("Payment Status", "Pending")
-            status_match = (selected_status == "All") or (status == selected_status)
-
-            # Filter by Month
-            month_match = True
-            if selected_month != "All":
-                # Use sale's "Date" field
-                sale_date_str = sale.get("Date", "")
-                try:
-                    sale_date_obj = datetime.strptime(sale_date_str, "%d/%m/%Y")
-                    sale_month = sale_date_obj.strftime("%B")
-                    if sale_month.lower() == selected_month.lower():
-                        month_match = True
-                    else:
-                        month_match = False
-                except:
-                    month_match = False
-
-            # Filter by Year
-            year_match = True
-            if selected_year != "All":
-                # Use sale's "Date" field
-                sale_date_str = sale.get("Date", "")
-                try:
-                    sale_date_obj = datetime.strptime(sale_date_str, "%d/%m/%Y")
-                    sale_year = str(sale_date_obj.year)
-                    if sale_year == selected_year:
-                        year_match = True
-                    else:
-                        year_match = False
-                except:
-                    year_match = False
+            filter_match = sale.get("File No.", "") in matched
 
             # Filter by Search Query
             if search_query:
@@ -1757,7 +1732,7 @@ class PaymentModule(QWidget):
                 search_match = True
 
             # Determine if the row should be shown
-            match = status_match and month_match and year_match and search_match
+            match = filter_match and search_match
             self.table.setRowHidden(row, not match)
 
         # Update the summary based on filtered data
@@ -1776,14 +1751,11 @@ class PaymentModule(QWidget):
             if self.table.isRowHidden(row):
                 continue
             sale = self.payments[row]
-            final_amount = sale.get('Final Amount', "0.0")
-            if not final_amount or final_amount.strip() == '':
-                final_amount = "0.0"
-            final_amount = float(final_amount)
+            final_amount = sale.final_amount
             total_amount += final_amount
             payment_status = sale.get('Payment Status', 'Pending')
-            paid_payment = sum(float(p["Amount Paid"]) for p in sale.get("Payments", []))
-            remaining = final_amount - paid_payment
+            paid_payment = sale.paid_amount
+            remaining = sale.remaining_amount
 
             if payment_status == "Pending":
                 total_pending += remaining
@@ -1897,13 +1869,10 @@ class PaymentModule(QWidget):
             payment_details = f"Added payment of ₹{amount:.2f} via {payment_method} for {self.sale.get('Customer Name', 'Unknown')}"
             self.activity_tracker.log_activity("Payment", "Added", payment_details)
             
-            # Sync with GitHub after adding payment
-            try:
-                parent = self.parent()
-                if hasattr(parent, 'data_file'):
-                    github_sync.sync_file(parent.data_file)
-            except Exception as e:
-                QMessageBox.warning(self, "Sync Warning", f"Payment added but sync failed: {str(e)}")
+            # Queue the upload to GitHub after adding payment
+            parent = self.parent()
+            if hasattr(parent, 'data_file'):
+                sync_queue.enqueue(parent.data_file)
             
             # Refresh the dashboard if it exists
             main_window = self.window()
@@ -1973,8 +1942,5 @@ class PaymentModule(QWidget):
         # Create and show the batch payment dialog directly with all payments
         dialog = BatchPaymentDialog(self.payments, self)
         if dialog.exec_() == QDialog.Accepted:
-            # Save the updated payments
-            self.save_payments()
-            # Reload the payments to refresh the display
-            self.load_payments()
+            # Saved by the dialog (the store refreshes the display)
             QMessageBox.information(self, "Success", "Batch payment has been processed successfully.")
@@ -8,7 +8,7 @@ from PyQt5.QtWidgets import (
     QSizePolicy, QStyledItemDelegate, QCompleter
 )
 from PyQt5.QtGui import QFont, QIcon
-from github_sync import github_sync
+from case_store import case_store, CASE_SERVER
 import json
 import os
 import sys
@@ -28,12 +28,6 @@ class PaymentDoneModule(QWidget):
         # Create user data folder if it doesn't exist
         os.makedirs(self.user_data_folder, exist_ok=True)
 
-        # If running from PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # Download files from Drive if they don't exist
-            if not os.path.exists(self.data_file):
-                github_sync.download_file('data.json', self.data_file)
-
         # Define the icons path
         self.icons_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Icons')
 
@@ -130,6 +124,8 @@ class PaymentDoneModule(QWidget):
         self.year_filter_combo = QComboBox()
         self.year_filter_combo.addItem("All Years")
         self.year_filter_combo.addItems([str(year) for year in range(2020, 2041)])
+        # Past years load on demand, so the current year is shown at first
+        self.year_filter_combo.setCurrentText(str(datetime.now().year))
         self.year_filter_combo.setFixedWidth(100)
         self.year_filter_combo.setStyleSheet("""
             QComboBox {
@@ -234,19 +230,22 @@ class PaymentDoneModule(QWidget):
 
         self.setLayout(main_layout)
 
-        # Load data initially
-        self.load_payments()
+        # Hidden until picked in the sidebar: load on first show so startup
+        # does not wait for data.json (the dashboard streams it meanwhile)
+        self.payments = []
+        self._stale = True
+        case_store.cases_changed.connect(self.on_cases_changed)
 
     def load_payments(self):
-        if not os.path.exists(self.data_file):
+        self._stale = False
+        if not CASE_SERVER and not os.path.exists(self.data_file) and not case_store.loaded:
             QMessageBox.warning(self, "No Data", "No payment data found.")
             self.payments = []
             self.display_payments(self.payments)
             return
 
         try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                self.payments = json.load(f)
+            self.payments = case_store.ensure_loaded()
         except json.JSONDecodeError:
             QMessageBox.critical(self, "Error", "Failed to decode JSON. Please check the data.json file.")
             self.payments = []
@@ -256,6 +255,18 @@ class PaymentDoneModule(QWidget):
 
         self.display_payments(self.payments)
 
+    def on_cases_changed(self, file_nos):
+        """Reload when a save happens; defer while this page is hidden."""
+        if self.isVisible():
+            self.load_payments()
+        else:
+            self._stale = True
+
+    def showEvent(self, event):
+        if self._stale:
+            self.load_payments()
+        super().showEvent(event)
+
     def display_payments(self, payments):
         self.table.setRowCount(0)
         filtered_payments = [
@@ -364,18 +375,13 @@ class PaymentDoneModule(QWidget):
         )
         if reply == QMessageBox.Yes:
             payment["Payment Prrovel status"] = "done"
-            self.save_payments()
-            self.load_payments()
+            self.save_payments([payment.get("File No.", "")])
             QMessageBox.information(self, "Success", f"Payment for File No. {payment.get('File No.', '')} has been marked as Done.")
 
-    def save_payments(self):
+    def save_payments(self, file_nos=None):
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.payments, f, indent=4, ensure_ascii=False)
-            
-            # Upload to GitHub
-            github_sync.sync_file(self.data_file)
-            return True
+            # Save through the shared store (which uploads to GitHub)
+            return case_store.save(file_nos)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save data: {str(e)}")
             return False
@@ -385,14 +391,12 @@ class PaymentDoneModule(QWidget):
         selected_year = self.year_filter_combo.currentText()
         search_query = self.search_box.text().strip().lower()
 
-        if not os.path.exists(self.data_file):
+        try:
+            # Past years load on demand; a year filter only needs its own shard
+            case_store.ensure_year(None if selected_year == "All Years" else int(selected_year))
+            self.payments = case_store.ensure_loaded()
+        except:
             self.payments = []
-        else:
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.payments = json.load(f)
-            except:
-                self.payments = []
 
         filtered_payments = [
             payment for payment in self.payments
@@ -401,17 +405,12 @@ class PaymentDoneModule(QWidget):
                payment.get("Payment Prrovel status", "").lower() != "done"
         ]
 
-        if selected_month != "All Months":
-            filtered_payments = [
-                p for p in filtered_payments
-                if self.get_month(p.get("Date", "")) == selected_month
-            ]
-
-        if selected_year != "All Years":
-            filtered_payments = [
-                p for p in filtered_payments
-                if self.get_year(p.get("Date", "")) == selected_year
-            ]
+        if selected_month != "All Months" or selected_year != "All Years":
+            matched = case_store.query(
+                year=None if selected_year == "All Years" else int(selected_year),
+                month=None if selected_month == "All Months" else datetime.strptime(selected_month, "%B").month
+            )
+            filtered_payments = [p for p in filtered_payments if p.get("File No.", "") in matched]
 
         if search_query:
             filtered_payments = [
@@ -422,22 +421,6 @@ class PaymentDoneModule(QWidget):
 
         self.display_payments(filtered_payments)
 
-    def get_month(self, date_str):
-        """Get month name from date string"""
-        try:
-            date_obj = datetime.strptime(date_str, "%d/%m/%Y")
-            return date_obj.strftime("%B")
-        except ValueError:
-            return ""
-
-    def get_year(self, date_str):
-        """Get year from date string"""
-        try:
-            date_obj = datetime.strptime(date_str, "%d/%m/%Y")
-            return str(date_obj.year)
-        except ValueError:
-            return ""
-
     def update_search_completer(self, text):
         """Update search completer suggestions based on input text"""
         if not text:
@@ -4,7 +4,8 @@ import json
 import shutil
 from datetime import datetime
 from pathlib import Path
-from github_sync import github_sync
+from replica import replica
+from case_store import case_store
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
@@ -85,12 +86,6 @@ class PrintReportModule(QWidget):
         # Create user data folder if it doesn't exist
         os.makedirs(self.user_data_folder, exist_ok=True)
 
-        # If running from PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # Download files from Drive if they don't exist
-            if not os.path.exists(self.data_file):
-                github_sync.download_file('data.json', self.data_file)
-
         self.data = []
         self.filtered_data = []
         self.current_selected_record = None  
@@ -312,6 +307,8 @@ class PrintReportModule(QWidget):
         self.year_combo.addItem("All")
         for y in range(2020, 2036):
             self.year_combo.addItem(str(y))
+        # Past years load on demand, so the current year is shown at first
+        self.year_combo.setCurrentText(str(datetime.now().year))
         filter_row_layout.addWidget(self.year_combo)
 
         self.filter_button = QPushButton("Filter")
@@ -427,37 +424,42 @@ class PrintReportModule(QWidget):
         scroll_area.setWidget(content_widget)
         self.setLayout(main_layout)
 
-        # Load data + populate
-        self.load_data()
-        self.apply_filters_and_populate_table()
+        # Hidden until picked in the sidebar: load on first show so startup
+        # does not wait for data.json (the dashboard streams it meanwhile)
+        self._stale = True
+        case_store.cases_changed.connect(self.on_cases_changed)
 
     def load_data(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, "r", encoding="utf-8") as f:
-                    self.data = json.load(f)
-            except Exception as e:
-                print("Error reading JSON:", e)
-                self.data = []
-        else:
-            print("data.json file not found.")
+        try:
+            self.data = case_store.ensure_loaded()
+        except Exception as e:
+            print("Error reading JSON:", e)
             self.data = []
+        self._stale = False
+
+    def on_cases_changed(self, file_nos):
+        """Re-filter when a save happens; defer while this page is hidden."""
+        if self.isVisible():
+            self.on_refresh_clicked()
+        else:
+            self._stale = True
+
+    def showEvent(self, event):
+        if self._stale:
+            self.on_refresh_clicked()
+        super().showEvent(event)
 
     def on_refresh_clicked(self):
         self.load_data()
         self.apply_filters_and_populate_table()
 
     def refresh_data(self):
-        """Refresh data from GitHub"""
+        """Re-read local data and reconcile with GitHub in the background"""
         try:
-            # Try to download latest data from GitHub
-            if github_sync.download_file('data.json', self.data_file):
-                QMessageBox.information(self, "Success", "Data successfully synced")
-            else:
-                QMessageBox.warning(self, "Warning", "Failed to sync from GitHub, using local data")
-            
-            # Reload data
-            self.load_data()
+            # Changes pulled from GitHub arrive through case_store.cases_changed
+            replica.reconcile()
+            # Re-parse the file once for every module
+            case_store.reload()
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Error refreshing data: {str(e)}")
 
@@ -1082,34 +1084,17 @@ class PrintReportModule(QWidget):
         selected_month = self.month_combo.currentText()
         selected_year = self.year_combo.currentText()
 
+        # Past years load on demand; a year filter only needs its own shard
+        case_store.ensure_year(None if selected_year == "All" else int(selected_year))
+
         if selected_month == "All" and selected_year == "All":
             return records
 
-        months = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
-
-        filtered = []
-        for rec in records:
-            date_str = rec.get("Date", "")
-            try:
-                date_obj = datetime.strptime(date_str, "%d/%m/%Y")
-            except:
-                continue
-
-            if selected_month != "All":
-                month_idx = months.index(selected_month) + 1
-                if date_obj.month != month_idx:
-                    continue
-
-            if selected_year != "All":
-                if date_obj.year != int(selected_year):
-                    continue
-
-            filtered.append(rec)
-
-        return filtered
+        matched = case_store.query(
+            year=None if selected_year == "All" else int(selected_year),
+            month=None if selected_month == "All" else datetime.strptime(selected_month, "%B").month
+        )
+        return [rec for rec in records if rec.get("File No.", "") in matched]
 
     def populate_table(self):
         self.report_table.setRowCount(len(self.filtered_data))
@@ -1124,22 +1109,9 @@ class PrintReportModule(QWidget):
             work_types = record.get("Work Types", [])
             work_type_str = ", ".join(work_types) if isinstance(work_types, list) else str(work_types)
             village = record.get("Village", "")
-            final_amt_str = record.get("Final Amount", "0")
-
-            paid_amount = 0.0
-            for p in record.get("Payments", []):
-                try:
-                    paid_amount += float(p.get('Amount Paid', '0'))
-                except:
-                    pass
-
-            try:
-                final_amt_val = float(final_amt_str)
-            except:
-                final_amt_val = 0.0
 
-            final_display = f"₹ {final_amt_val:,.2f}"
-            paid_display = f"₹ {paid_amount:,.2f}"
+            final_display = f"₹ {record.final_amount:,.2f}"
+            paid_display = f"₹ {record.paid_amount:,.2f}"
 
             file_item = QTableWidgetItem(file_no)
             file_item.setTextAlignment(Qt.AlignCenter)
@@ -11,7 +11,8 @@ import json
 import os
 import shutil  # डेटा कॉपी करने के लिए
 from pathlib import Path
-from github_sync import github_sync
+from sync_queue import sync_queue
+import snapshot_cache
 
 class ProfileModule(QWidget):
     def __init__(self):
@@ -58,12 +59,6 @@ class ProfileModule(QWidget):
             # Ensure folder exists in normal environment
             os.makedirs(self.data_folder, exist_ok=True)
 
-        # Ensure data is synced from GitHub
-        if not os.path.exists(self.work_types_file):
-            github_sync.download_file('work_types.json', self.work_types_file)
-        if not os.path.exists(self.work_done_file):
-            github_sync.download_file('work_done.json', self.work_done_file)
-
         # Initialize UI components first
         self.init_ui()
 
@@ -193,8 +188,7 @@ class ProfileModule(QWidget):
 
     def load_work_types(self):
         try:
-            with open(self.work_types_file, 'r', encoding='utf-8') as f:
-                self.work_types = json.load(f)
+            self.work_types = snapshot_cache.load_json(self.work_types_file)
         except json.JSONDecodeError:
             QMessageBox.critical(self, "Error", "Failed to decode JSON. Please check the work_types.json file.")
             self.work_types = []
@@ -238,9 +232,9 @@ class ProfileModule(QWidget):
         try:
             with open(self.work_types_file, 'w', encoding='utf-8') as f:
                 json.dump(work_types, f, indent=4, ensure_ascii=False)
-            # Sync with GitHub
-            github_sync.sync_file(self.work_types_file)
-            QMessageBox.information(self, "Success", "Work Types have been successfully updated and synced.")
+            # Queue the upload to GitHub
+            sync_queue.enqueue(self.work_types_file)
+            QMessageBox.information(self, "Success", "Work Types have been successfully updated and queued for sync.")
             return True
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save work types: {str(e)}")
@@ -248,8 +242,7 @@ class ProfileModule(QWidget):
 
     def load_work_done(self):
         try:
-            with open(self.work_done_file, 'r', encoding='utf-8') as f:
-                self.work_done = json.load(f)
+            self.work_done = snapshot_cache.load_json(self.work_done_file)
         except json.JSONDecodeError:
             QMessageBox.critical(self, "Error", "Failed to decode JSON. Please check the work_done.json file.")
             self.work_done = []
@@ -293,9 +286,9 @@ class ProfileModule(QWidget):
         try:
             with open(self.work_done_file, 'w', encoding='utf-8') as f:
                 json.dump(work_done, f, indent=4, ensure_ascii=False)
-            # Sync with GitHub
-            github_sync.sync_file(self.work_done_file)
-            QMessageBox.information(self, "Success", "Work Done entries have been successfully updated and synced.")
+            # Queue the upload to GitHub
+            sync_queue.enqueue(self.work_done_file)
+            QMessageBox.information(self, "Success", "Work Done entries have been successfully updated and queued for sync.")
             return True
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save work done: {str(e)}")
@@ -0,0 +1,61 @@
+# record_table_model.py
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+
+
+def field(name):
+    """Column getter showing record[name] as text."""
+    return lambda record: str(record.get(name, ""))
+
+
+def amount(record):
+    return f"₹{record.final_amount:,.2f}"
+
+
+class RecordTableModel(QAbstractTableModel):
+    """A read-only table over a list of records (cases or activities).
+
+    columns is a list of (header, getter, alignment); a getter turns a
+    record into the text of its cell. Nothing is built per cell: the view
+    asks data() for the rows on screen only, so showing a hundred
+    thousand cases costs the same as showing ten.
+    """
+
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.records = []
+
+    def set_records(self, records):
+        """Show records (kept as given, not copied) in place of the current ones."""
+        self.beginResetModel()
+        self.records = records
+        self.endResetModel()
+
+    def record(self, row):
+        return self.records[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        header, getter, alignment = self.columns[index.column()]
+        if role == Qt.DisplayRole:
+            try:
+                return getter(self.records[index.row()])
+            except Exception as e:
+                print(f"Error showing {header}: {e}")
+                return ""
+        if role == Qt.TextAlignmentRole and alignment is not None:
+            return int(alignment)
+        return QVariant()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return QVariant()
@@ -12,6 +12,8 @@ from PyQt5.QtGui import QIcon, QDoubleValidator, QFont, QColor, QPixmap
 import json
 import os
 from functools import partial
+from case_locks import case_locks
+from case_store import case_store
 
 class RelatedCasesPaymentDialog(QDialog):
     """Dialog for managing payments across multiple related cases of the same party."""
@@ -303,13 +305,10 @@ class RelatedCasesPaymentDialog(QDialog):
             self.cases_table.setItem(row, 4, QTableWidgetItem(work_types))
             
             # Total Amount
-            total_amount = float(case.get("Final Amount", 0.0))
-            self.cases_table.setItem(row, 5, QTableWidgetItem(f"₹{total_amount:.2f}"))
+            self.cases_table.setItem(row, 5, QTableWidgetItem(f"₹{case.final_amount:.2f}"))
             
             # Remaining Amount
-            total_paid = sum(float(p["Amount Paid"]) for p in case.get("Payments", []))
-            remaining = total_amount - total_paid
-            self.cases_table.setItem(row, 6, QTableWidgetItem(f"₹{remaining:.2f}"))
+            self.cases_table.setItem(row, 6, QTableWidgetItem(f"₹{case.remaining_amount:.2f}"))
 
     def toggle_all_cases(self, checked):
         """Toggle selection of all cases."""
@@ -440,17 +439,32 @@ class RelatedCasesPaymentDialog(QDialog):
         # Generate a unique relationship ID for this batch of payments
         relationship_id = f"rel_{payment_date.replace('/', '')}_{payment_method}"
         
-        # Update payments for each case
-        for row, amount in distributions.items():
-            payment = {
-                "Amount Paid": f"{amount:.2f}",
-                "Payment Date": payment_date,
-                "Payment Method": payment_method,
-                "Cheque No.": cheque_no,
-                "Cheque Date": cheque_date,
-                "Relationship ID": relationship_id,  # Add relationship ID to track related payments
-                "Related Payment": True  # Flag to identify related payments
-            }
-            self.related_cases[row].setdefault("Payments", []).append(payment)
+        # Lock every selected case at once; none is paid while any is being edited elsewhere
+        file_nos = [self.related_cases[row].get("File No.", "") for row in distributions]
+        granted, holder = case_locks.acquire(file_nos)
+        if not granted:
+            QMessageBox.warning(self, "File Locked", f"File No. {holder['file_no']} is currently being edited by {holder['owner']}. Please try again later.")
+            return
+
+        # Update payments for each case; the payments added, per File No., are kept for the caller
+        self.added_payments = {}
+        try:
+            for row, amount in distributions.items():
+                payment = {
+                    "Amount Paid": f"{amount:.2f}",
+                    "Payment Date": payment_date,
+                    "Payment Method": payment_method,
+                    "Cheque No.": cheque_no,
+                    "Cheque Date": cheque_date,
+                    "Relationship ID": relationship_id,  # Add relationship ID to track related payments
+                    "Related Payment": True  # Flag to identify related payments
+                }
+                case = self.related_cases[row]
+                case.setdefault("Payments", []).append(payment)
+                self.added_payments.setdefault(case.get("File No.", ""), []).append(payment)
+            # Saved before the locks go, so no other office edits these cases in between
+            case_store.save(file_nos)
+        finally:
+            case_locks.release(file_nos)
 
         self.accept()
\ No newline at end of file
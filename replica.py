@@ -0,0 +1,164 @@
+# replica.py
+
+import os
+import threading
+from pathlib import Path
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from github_sync import github_sync
+from case_store import case_store, CASE_SERVER
+from case_locks import case_locks
+from sync_queue import sync_queue
+from sync_metrics import sync_metrics
+from startup_sync import startup_sync, DATA_FILES
+
+
+class Replica(QObject):
+    """The local copies in ~/.my_app_data are the app's working store.
+
+    Modules read and save only those, so nothing waits on the network.
+    Reconciliation runs in the background: saved files are pushed by the
+    upload queue, and every RECONCILE_INTERVAL seconds a worker pulls the
+    files that changed on GitHub. A file with an upload still waiting is
+    not pulled, since its local copy is the newer one.
+
+    While GitHub is unreachable the worker tries every OFFLINE_INTERVAL
+    seconds. Once it gets through, the queue pushes what piled up at once.
+    """
+
+    RECONCILE_INTERVAL = 60
+    OFFLINE_INTERVAL = 15
+
+    # A local copy was replaced by a newer version from GitHub
+    file_updated = pyqtSignal(str)
+    # (saves waiting to be uploaded, offline)
+    status_changed = pyqtSignal(int, bool)
+    # A reconciliation round ended; carries the files that could not be pulled
+    reconciled = pyqtSignal(list)
+
+    # Emitted from the worker thread: (files updated, files failed)
+    _round_done = pyqtSignal(list, list)
+
+    def __init__(self, files=DATA_FILES):
+        super().__init__()
+        self.user_data_folder = os.path.join(str(Path.home()), '.my_app_data')
+        self.files = list(files)
+        self.reachable = True
+        self._running = False
+        # Created in start(): it needs the QApplication to exist
+        self.timer = None
+
+        self._round_done.connect(self._on_round_done)
+        self.file_updated.connect(self._refresh_case_store)
+        sync_queue.status_changed.connect(self._on_queue_status)
+        if CASE_SERVER:
+            case_store.status_changed.connect(lambda pending, offline: self._emit_status())
+        startup_sync.finished.connect(self._on_startup_finished)
+
+    def local_path(self, file_name):
+        return os.path.join(self.user_data_folder, file_name)
+
+    # --------------------------------------------------
+    #   STATUS
+    # --------------------------------------------------
+    def pending_changes(self):
+        """Saves made here that have not reached GitHub (or the case server) yet."""
+        pending = sum(entry.get('version', 1) for entry in sync_queue.waiting())
+        if CASE_SERVER:
+            pending += len(case_store.outbox)
+        return pending
+
+    def is_offline(self):
+        return not self.reachable or sync_queue.offline or (bool(CASE_SERVER) and case_store.offline)
+
+    def _emit_status(self):
+        self.status_changed.emit(self.pending_changes(), self.is_offline())
+
+    def _on_queue_status(self, depth, offline):
+        # An upload got through while pulls were failing: connectivity is back
+        if not offline and not self.reachable:
+            self.reconcile()
+        self._emit_status()
+
+    def _on_startup_finished(self, failed):
+        self.reachable = not failed
+        self._emit_status()
+
+    # --------------------------------------------------
+    #   RECONCILIATION
+    # --------------------------------------------------
+    def start(self):
+        if self.timer is None:
+            self.timer = QTimer(self)
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self.reconcile)
+        self._schedule()
+        self._emit_status()
+
+    def _schedule(self):
+        if self.timer is not None:
+            interval = self.RECONCILE_INTERVAL if self.reachable else self.OFFLINE_INTERVAL
+            self.timer.start(interval * 1000)
+
+    def reconcile(self):
+        """Start a reconciliation round now; returns immediately."""
+        if self._running or startup_sync.is_running():
+            return
+        self._running = True
+        threading.Thread(target=self._reconcile_worker, name='replica', daemon=True).start()
+
+    def _stamp(self, path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _reconcile_worker(self):
+        updated, failed = [], []
+        try:
+            with sync_metrics.operation('reconcile') as operation:
+                waiting = {os.path.basename(entry['file']) for entry in sync_queue.waiting()}
+                for file_name in self.files:
+                    if file_name in waiting:
+                        continue
+                    # Leave data.json alone while an edit here holds a case lock
+                    if file_name == 'data.json' and case_locks.holds_any():
+                        continue
+                    path = self.local_path(file_name)
+                    before = self._stamp(path)
+                    if not github_sync.download_file(file_name, path):
+                        # Most likely offline: the other files would only wait out the same timeout
+                        failed = [name for name in self.files[self.files.index(file_name):] if name not in waiting]
+                        operation.fail(github_sync.get_sync_status(file_name).get('error'))
+                        break
+                    if self._stamp(path) != before:
+                        updated.append(file_name)
+        except Exception as e:
+            print(f"Error reconciling data files: {str(e)}")
+            failed = failed or list(self.files)
+        finally:
+            self._round_done.emit(updated, failed)
+
+    def _on_round_done(self, updated, failed):
+        self._running = False
+        was_reachable = self.reachable
+        self.reachable = not failed
+        for file_name in updated:
+            self.file_updated.emit(file_name)
+        if self.reachable and not was_reachable:
+            # Back online: push what was saved meanwhile without waiting out the backoff
+            sync_queue.retry_now()
+        self._schedule()
+        self._emit_status()
+        self.reconciled.emit(failed)
+
+    def _refresh_case_store(self, file_name):
+        if file_name != 'data.json':
+            return
+        try:
+            case_store.refresh()
+        except Exception as e:
+            print(f"Error reloading downloaded data.json: {str(e)}")
+
+
+replica = Replica()
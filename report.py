@@ -12,13 +12,18 @@ from PyQt5.QtPrintSupport import QPrinter
 from PyQt5.QtCore import Qt, QStringListModel, QDate, QEvent
 from PyQt5.QtWidgets import QCompleter
 import sys
-import json
 import os
+import copy
 from functools import partial
 from datetime import datetime
-from github_sync import github_sync
+from replica import replica
+from case_locks import case_locks
+import snapshot_cache
 from pathlib import Path
 from activity_tracker import ActivityTracker
+from case_store import case_store
+from case_conflict import commit_case
+from case_record import format_party_address
 
 # ======================== Custom ComboBox Classes ========================
 class NoScrollComboBox(QComboBox):
@@ -192,11 +197,9 @@ class ViewDialog(QDialog):
             label = QLabel(f"{label_text}:")
             label.setStyleSheet(label_style)
             
-            # Special handling for Party Address to remove {} and format empty values
+            # Party Address is stored structured; show it as "State: ..." lines
             if key == "Party Address":
-                value_text = str(self.entry.get(key, "")).strip("{} ")
-                if not value_text:
-                    value_text = ""
+                value_text = format_party_address(self.entry.get(key))
             else:
                 value_text = str(self.entry.get(key, ""))
             
@@ -1121,16 +1124,11 @@ class EditDialog(QDialog):
             self.old_no.setText(old_no_value)
 
     def set_party_address_fields(self):
-        """Parse the existing Party Address and set the dropdowns"""
-        full_address = self.entry.get("Party Address", "")
-        
-        # Ensure full_address is a string before trying to split it
-        if not isinstance(full_address, str):
-            # If it's not a string (e.g., an old dict format), treat as empty
-            print(f"Warning: Party Address for entry {self.entry.get('File No.', '')} is not a string: {full_address}. Treating as empty.")
-            full_address = ""
-            
-        if not full_address:
+        """Set the dropdowns from the existing Party Address"""
+        # Structured since the case store upgrades old records on load
+        parsed_locations = self.entry.get("Party Address") or {}
+
+        if not any(parsed_locations.get(key) for key in ("State", "District", "Taluka", "Village")):
             # Clear fields if address is empty
             self.party_state.setCurrentIndex(0)
             self.party_district.clear()
@@ -1141,19 +1139,6 @@ class EditDialog(QDialog):
             self.party_village.addItem("Select Village")
             return
 
-        lines = full_address.split('\n')
-        parsed_locations = {}
-
-        for line in lines:
-            if line.startswith("State:"):
-                parsed_locations["State"] = line.split(":", 1)[1].strip()
-            elif line.startswith("District:"):
-                parsed_locations["District"] = line.split(":", 1)[1].strip()
-            elif line.startswith("Taluka:"):
-                parsed_locations["Taluka"] = line.split(":", 1)[1].strip()
-            elif line.startswith("Village:"):
-                parsed_locations["Village"] = line.split(":", 1)[1].strip()
-
         # Set State
         state_value = parsed_locations.get("State", "")
         if state_value:
@@ -1207,8 +1192,7 @@ class EditDialog(QDialog):
         """Load work types from JSON file"""
         try:
             if os.path.exists(self.work_types_file):
-                with open(self.work_types_file, 'r', encoding='utf-8') as f:
-                    self.work_types_list = json.load(f)
+                self.work_types_list = snapshot_cache.load_json(self.work_types_file)
             else:
                 self.work_types_list = []
         except Exception as e:
@@ -1219,8 +1203,7 @@ class EditDialog(QDialog):
         """Load work done from JSON file"""
         try:
             if os.path.exists(self.work_done_file):
-                with open(self.work_done_file, 'r', encoding='utf-8') as f:
-                    self.work_done_list = json.load(f)
+                self.work_done_list = snapshot_cache.load_json(self.work_done_file)
             else:
                 self.work_done_list = []
         except Exception as e:
@@ -1231,8 +1214,7 @@ class EditDialog(QDialog):
         """Load locations from JSON file"""
         try:
             if os.path.exists(self.locations_file):
-                with open(self.locations_file, 'r', encoding='utf-8') as f:
-                    self.locations = json.load(f)
+                self.locations = snapshot_cache.load_json(self.locations_file)
             else:
                 self.locations = {}
         except Exception as e:
@@ -1552,18 +1534,14 @@ class EditDialog(QDialog):
         self.entry["Work Types"] = [wt for wt, cb in self.work_types_checkboxes.items() if cb.isChecked()]
         self.entry["Work Done"] = [wd for wd, cb in self.work_done_checkboxes.items() if cb.isChecked()]
         
-        # Format Party Address in the same way as add_entry.py
-        party_address_lines = []
-        if self.party_state.currentText() != "Select State":
-            party_address_lines.append(f"State: {self.party_state.currentText()}")
-        if self.party_district.currentText() != "Select District":
-            party_address_lines.append(f"District: {self.party_district.currentText()}")
-        if self.party_taluka.currentText() != "Select Taluka":
-            party_address_lines.append(f"Taluka: {self.party_taluka.currentText()}")
-        if self.party_village.currentText() != "Select Village":
-            party_address_lines.append(f"Village: {self.party_village.currentText()}")
-        
-        self.entry["Party Address"] = "\n".join(party_address_lines)
+        # Structured Party Address, in the same way as add_entry.py; extra
+        # keys (e.g. "Vas Name") are kept
+        party_address = dict(self.entry.get("Party Address") or {})
+        for key, combo in (("State", self.party_state), ("District", self.party_district),
+                           ("Taluka", self.party_taluka), ("Village", self.party_village)):
+            text = combo.currentText()
+            party_address[key] = "" if text == f"Select {key}" else text
+        self.entry["Party Address"] = party_address
 
         # Log activity from parent ReportModule
         parent = self.parent()
@@ -1605,7 +1583,7 @@ class ReportModule(QWidget):
         self.activity_tracker = ActivityTracker()
         
         # Add user_id attribute
-        self.user_id = os.getlogin()  # Get current Windows username as user_id
+        self.user_id = case_locks.owner  # Current Windows username
         
         # Window settings
         self.setWindowTitle("Case Reports")
@@ -1741,7 +1719,7 @@ class ReportModule(QWidget):
 
         # Date Filters: Day, Month, Year
         self.date_filters = {}
-        # For user-friendliness, set them by default to "All Day", "All Month", "All Years"
+        # For user-friendliness, set them by default to "All Day", "All Month" and the current year
         day_combo = QComboBox()
         day_combo.addItem("All Day")
         day_combo.addItems([str(day).zfill(2) for day in range(1, 32)])
@@ -1799,6 +1777,8 @@ class ReportModule(QWidget):
         current_year = datetime.now().year
         years = [str(year) for year in range(2000, current_year + 6)]
         year_combo.addItems(years)
+        # Past years load on demand, so the current year is shown at first
+        year_combo.setCurrentText(str(current_year))
         year_combo.setToolTip("Filter by Year")
         year_combo.setStyleSheet("""
             QComboBox {
@@ -1950,29 +1930,47 @@ class ReportModule(QWidget):
         main_layout.addWidget(self.table)
         self.setLayout(main_layout)
 
-        # Load data and populate filters
-        self.load_data()
+        # Hidden until picked in the sidebar: load on first show so startup
+        # does not wait for data.json (the dashboard streams it meanwhile)
+        self.data = []
+        self._stale = True
+        self._loading_years = False
+        case_store.cases_changed.connect(self.on_cases_changed)
 
 
     def load_data(self):
-        """Load data from data.json and populate the table."""
+        """Load data from the shared case store and populate the table."""
         try:
-            # Agar file nahi hai to empty file create karo
-            if not os.path.exists(self.data_file):
-                # Create empty data structure
-                empty_data = []
-                with open(self.data_file, 'w', encoding='utf-8') as f:
-                    json.dump(empty_data, f, indent=4)
-                self.data = empty_data
-            else:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
+            # Only the current year is loaded up front; "All Years" lists every year
+            selected_year = self.date_filters["Year"].currentText()
+            self._loading_years = True
+            try:
+                case_store.ensure_year(None if selected_year == "All Years" else int(selected_year))
+            finally:
+                self._loading_years = False
+            self.data = case_store.ensure_loaded()
         except Exception as e:
             QMessageBox.warning(self, "Warning", f"Creating new data file as no existing data found.")
             self.data = []
         
+        self._stale = False
         self.display_data(self.data)
 
+    def on_cases_changed(self, file_nos):
+        """Reload when a save happens; defer while this page is hidden."""
+        if self._loading_years:
+            # load_data is loading past years and shows them itself
+            return
+        if self.isVisible():
+            self.load_data()
+        else:
+            self._stale = True
+
+    def showEvent(self, event):
+        if self._stale:
+            self.load_data()
+        super().showEvent(event)
+
     def apply_filters(self):
         """Filter data based on search box and selected date filters."""
         if not hasattr(self, 'data'):
@@ -1984,58 +1982,41 @@ class ReportModule(QWidget):
         selected_month = self.date_filters["Month"].currentText()
         selected_year = self.date_filters["Year"].currentText()
 
+        # Past years load on demand; a year filter only needs its own shard
+        case_store.ensure_year(None if selected_year == "All Years" else int(selected_year))
+
+        # Date filters come from the case store (indexed when the SQLite
+        # engine is enabled); entries without a valid date never match them
+        date_filtered = selected_day != "All Day" or selected_month != "All Month" or selected_year != "All Years"
+        if date_filtered:
+            matched = case_store.query(
+                year=None if selected_year == "All Years" else int(selected_year),
+                month=None if selected_month == "All Month" else datetime.strptime(selected_month, "%B").month,
+                day=None if selected_day == "All Day" else int(selected_day)
+            )
+
         filtered_data = []
         for entry in self.data:
+            if date_filtered and entry.get("File No.", "") not in matched:
+                continue
+
             # Keyword search filter (checks all values in the entry)
             if keyword:
                 all_values_str = " ".join(str(v).lower() for v in entry.values())
                 if keyword not in all_values_str:
                     continue
 
-            # Date-related filters
-            date_str = entry.get("Date", "")
-            try:
-                entry_date = datetime.strptime(date_str, "%d/%m/%Y")
-            except ValueError:
-                entry_date = None
-
-            # Day filter
-            if entry_date and selected_day != "All Day":
-                if entry_date.strftime("%d") != selected_day:
-                    continue
-            # If entry has no valid date but the user wants a specific day, skip it
-            elif not entry_date and selected_day != "All Day":
-                continue
-
-            # Month filter
-            if entry_date and selected_month != "All Month":
-                if entry_date.strftime("%B") != selected_month:
-                    continue
-            elif not entry_date and selected_month != "All Month":
-                continue
-
-            # Year filter
-            if entry_date and selected_year != "All Years":
-                if entry_date.strftime("%Y") != selected_year:
-                    continue
-            elif not entry_date and selected_year != "All Years":
-                continue
-
             filtered_data.append(entry)
 
         self.display_data(filtered_data)
 
     def refresh_data(self):
-        """Refresh data from GitHub"""
+        """Re-read local data and reconcile with GitHub in the background"""
         try:
-            # Try to download latest data from GitHub
-            if github_sync.download_file('data.json', self.data_file):
-                QMessageBox.information(self, "Success", "Data successfully synced")
-            else:
-                QMessageBox.warning(self, "Warning", "Could not sync from GitHub. Using local data.")
-            
-            # Reload data from file
-            self.load_data()
+            # Changes pulled from GitHub arrive through case_store.cases_changed
+            replica.reconcile()
+            # Re-parse the file once for every module
+            case_store.reload()
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Error refreshing data: {str(e)}")
 
@@ -2051,28 +2032,23 @@ class ReportModule(QWidget):
 
     def edit_entry(self, file_no):
         """Edit an existing entry"""
+        # A case being edited elsewhere cannot be opened
+        holder = case_locks.holder(file_no)
+        if holder is not None:
+            QMessageBox.warning(self, "Warning", f"Case {file_no} is currently being edited by {holder['owner']}. Please try again later.")
+            return False
         try:
-            # Try to acquire case-specific lock
-            if not github_sync.acquire_case_lock(file_no, self.user_id):
-                QMessageBox.warning(self, "Warning", f"Case {file_no} is currently being edited by another user. Please try again later.")
-                return False
-
             entry = next((e for e in self.data if e["File No."] == file_no), None)
             if entry:
-                dialog = EditDialog(entry, self.icons_folder, self)
+                # The dialog edits a copy; it is saved only if nobody else
+                # saved the case meanwhile, or their changes merge with it
+                base = copy.deepcopy(dict(entry))
+                dialog = EditDialog(copy.deepcopy(base), self.icons_folder, self)
                 if dialog.exec_() == QDialog.Accepted:
-                    # Update the entry
-                    for i, e in enumerate(self.data):
-                        if e["File No."] == file_no:
-                            self.data[i] = dialog.entry
-                            break
-                    
-                    # Save changes
-                    self.save_data()
-                    
-                    # Refresh display
-                    self.display_data(self.data)
-                    
+                    entry = commit_case(self, base, dialog.entry)
+                    if entry is None:
+                        return False
+
                     # Log activity
                     activity_details = f"Modified report entry for File No. {file_no} - {entry.get('Customer Name', 'Unknown')}"
                     self.activity_tracker.log_activity("Report", "Modified", activity_details)
@@ -2081,25 +2057,20 @@ class ReportModule(QWidget):
                     main_window = self.window()
                     if hasattr(main_window, 'dashboard'):
                         main_window.dashboard.load_activities()
-                    
-                    # Release case-specific lock
-                    github_sync.release_case_lock(file_no)
                     return True
             return False
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to edit entry: {str(e)}")
-            # Release lock in case of error
-            github_sync.release_case_lock(file_no)
             return False
 
     def delete_entry(self, file_no):
         """Delete an existing entry"""
+        # Try to acquire case-specific lock
+        granted, holder = case_locks.acquire([file_no])
+        if not granted:
+            QMessageBox.warning(self, "Warning", f"Case {file_no} is currently being edited by {holder['owner']}. Please try again later.")
+            return False
         try:
-            # Try to acquire case-specific lock
-            if not github_sync.acquire_case_lock(file_no, self.user_id):
-                QMessageBox.warning(self, "Warning", f"Case {file_no} is currently being edited by another user. Please try again later.")
-                return False
-
             entry = next((e for e in self.data if e["File No."] == file_no), None)
             if entry:
                 reply = QMessageBox.question(
@@ -2109,14 +2080,8 @@ class ReportModule(QWidget):
                 )
                 
                 if reply == QMessageBox.Yes:
-                    # Remove the entry
-                    self.data = [e for e in self.data if e["File No."] != file_no]
-                    
-                    # Save changes
-                    self.save_data()
-                    
-                    # Refresh display
-                    self.display_data(self.data)
+                    # Remove the entry and save (the store refreshes the table)
+                    case_store.remove(file_no)
                     
                     # Log activity
                     activity_details = f"Deleted report entry for File No. {file_no} - {entry.get('Customer Name', 'Unknown')}"
@@ -2126,16 +2091,14 @@ class ReportModule(QWidget):
                     main_window = self.window()
                     if hasattr(main_window, 'dashboard'):
                         main_window.dashboard.load_activities()
-                    
-                    # Release case-specific lock
-                    github_sync.release_case_lock(file_no)
                     return True
             return False
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to delete entry: {str(e)}")
-            # Release lock in case of error
-            github_sync.release_case_lock(file_no)
             return False
+        finally:
+            # Release case-specific lock however the deletion ended
+            case_locks.release([file_no])
 
     def update_completer(self, text):
         """Update completer suggestions based on current text"""
@@ -2167,15 +2130,10 @@ class ReportModule(QWidget):
         model = QStringListModel(unique_suggestions)
         self.completer.setModel(model)
 
-    def save_data(self):
-        """Save data to file and sync with Google Drive"""
+    def save_data(self, file_nos=None):
+        """Save data through the shared case store (which syncs with GitHub)"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=4, ensure_ascii=False)
-            
-            # Sync with GitHub
-            github_sync.sync_file(self.data_file)
-            return True
+            return case_store.save(file_nos)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save data: {str(e)}")
             return False
@@ -0,0 +1,164 @@
+# snapshot_cache.py
+
+import gc
+import os
+import sys
+import json
+import marshal
+import hashlib
+import threading
+from pathlib import Path
+
+# Bump whenever the cached shape changes. marshal's format is tied to the
+# Python version, so that is part of the key too.
+CACHE_FORMAT_VERSION = 1
+CACHE_KEY = (CACHE_FORMAT_VERSION, sys.version_info[:2])
+
+cache_folder = os.path.join(str(Path.home()), '.my_app_data', 'cache')
+
+_rebuilding = set()
+_rebuilding_lock = threading.Lock()
+
+
+def _cache_file(source_file):
+    # Different folders may hold files with the same name (e.g. work_types.json)
+    path_key = hashlib.blake2b(os.path.abspath(source_file).encode('utf-8'), digest_size=4).hexdigest()
+    return os.path.join(cache_folder, f"{os.path.basename(source_file)}.{path_key}.marshal")
+
+
+def _read_header(f):
+    # Length-prefixed so the payload need not be read for a mismatch
+    size = int.from_bytes(f.read(4), 'little')
+    return marshal.loads(f.read(size))
+
+
+def _digest(raw):
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _read(source_file):
+    # stat before reading: if the file changes meanwhile the cache is just stale
+    st = os.stat(source_file)
+    with open(source_file, 'rb') as f:
+        return st, f.read()
+
+
+def _parse(raw, prepare):
+    data = json.loads(raw.decode('utf-8'))
+    return prepare(data) if prepare else data
+
+
+class paused_gc:
+    """Context manager that keeps the cyclic GC off while a large load runs.
+
+    Loading builds a big tree of new containers; the GC would otherwise
+    rescan it many times over while it grows.
+    """
+
+    def __enter__(self):
+        self.was_enabled = gc.isenabled()
+        gc.disable()
+
+    def __exit__(self, *exc):
+        if self.was_enabled:
+            gc.enable()
+
+
+def is_current(source_file):
+    """True when the cache matches source_file's mtime and size."""
+    try:
+        st = os.stat(source_file)
+        with open(_cache_file(source_file), 'rb') as f:
+            header = _read_header(f)
+        return header[0] == CACHE_KEY and header[1:3] == (st.st_mtime_ns, st.st_size)
+    except (OSError, EOFError, ValueError, TypeError, IndexError):
+        return False
+
+
+def load_json(source_file, prepare=None):
+    """Return the parsed contents of a JSON file, from the snapshot cache if possible.
+
+    The cache is used when the file's mtime and size match, or when only the
+    mtime changed but the content hash is the same. Otherwise the file is
+    parsed as usual and the cache is rebuilt in the background. ``prepare``
+    is applied to freshly parsed data (e.g. interning strings) before it is
+    returned or cached, so cached data never needs it again.
+    """
+    with paused_gc():
+        return _load_json(source_file, prepare)
+
+
+def _load_json(source_file, prepare):
+    st = os.stat(source_file)
+    cache_file = _cache_file(source_file)
+    header = None
+    try:
+        with open(cache_file, 'rb') as f:
+            header = _read_header(f)
+            if header[0] == CACHE_KEY and header[1:3] == (st.st_mtime_ns, st.st_size):
+                # One bulk read: marshal.load() on a file object reads in tiny pieces
+                return marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError, IndexError):
+        header = None
+
+    st, raw = _read(source_file)
+    if header and header[0] == CACHE_KEY and header[2] == st.st_size and header[3] == _digest(raw):
+        # Rewritten with the same content (e.g. re-downloaded): reuse the
+        # payload and just record the new mtime.
+        try:
+            with open(cache_file, 'rb') as f:
+                _read_header(f)
+                payload = f.read()
+            data = marshal.loads(payload)
+            _write(cache_file, (CACHE_KEY, st.st_mtime_ns, st.st_size, header[3]), payload)
+            return data
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+    data = _parse(raw, prepare)
+    rebuild_in_background(source_file, prepare)
+    return data
+
+
+def store(source_file, data, st=None, raw=None):
+    """Write the cache for source_file.
+
+    ``data`` must be the (prepared) parsed form of ``raw``, the file's bytes
+    as of ``st``; both are read from disk when not given.
+    """
+    if st is None or raw is None:
+        st, raw = _read(source_file)
+    header = (CACHE_KEY, st.st_mtime_ns, st.st_size, _digest(raw))
+    _write(_cache_file(source_file), header, marshal.dumps(data))
+
+
+def _write(cache_file, header, payload):
+    os.makedirs(cache_folder, exist_ok=True)
+    tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    header_bytes = marshal.dumps(header)
+    with open(tmp_file, 'wb') as f:
+        f.write(len(header_bytes).to_bytes(4, 'little'))
+        f.write(header_bytes)
+        f.write(payload)
+    # Readers only ever see a complete cache file
+    os.replace(tmp_file, cache_file)
+
+
+def rebuild_in_background(source_file, prepare):
+    with _rebuilding_lock:
+        if source_file in _rebuilding:
+            return
+        _rebuilding.add(source_file)
+
+    def worker():
+        try:
+            # A separate parse, so the caller is free to modify its copy meanwhile
+            st, raw = _read(source_file)
+            store(source_file, _parse(raw, prepare), st, raw)
+        except Exception as e:
+            print(f"Error rebuilding snapshot cache for {source_file}: {str(e)}")
+        finally:
+            with _rebuilding_lock:
+                _rebuilding.discard(source_file)
+
+    threading.Thread(target=worker, daemon=True).start()
@@ -0,0 +1,115 @@
+# startup_sync.py
+
+import os
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+from github_sync import github_sync
+from sync_metrics import sync_metrics
+from case_store import case_store, CASE_SERVER
+
+DATA_FILES = [
+    'data.json',
+    'work_types.json',
+    'work_done.json',
+    'locations.json'
+]
+if CASE_SERVER:
+    # The case server keeps the cases and syncs them for the whole office
+    DATA_FILES.remove('data.json')
+
+
+class StartupSync(QObject):
+    """Downloads the data files on a worker pool at launch.
+
+    The GUI only has to wait for files that have no local copy yet (i.e.
+    the first run); otherwise the app starts on the local copies straight
+    away and a file that turns out to have changed on GitHub is announced
+    with ``file_updated`` so whoever uses it can reload.
+    """
+
+    # (file name, succeeded, files done, total)
+    file_synced = pyqtSignal(str, bool, int, int)
+    # A file's local copy was replaced by a newer download
+    file_updated = pyqtSignal(str)
+    # All downloads ended; carries the names of the files that failed
+    finished = pyqtSignal(list)
+
+    # Emitted from the worker threads, delivered on the GUI thread
+    _downloaded = pyqtSignal(str, bool)
+
+    def __init__(self, files=DATA_FILES):
+        super().__init__()
+        self.user_data_folder = os.path.join(str(Path.home()), '.my_app_data')
+        self.files = list(files)
+        self.pending = set()
+        self.failed = []
+        self._stamps = {}
+        self._downloaded.connect(self._on_downloaded)
+        # data.json is shared through the case store, which refreshes in place
+        self.file_updated.connect(self._refresh_case_store)
+
+    def local_path(self, file_name):
+        return os.path.join(self.user_data_folder, file_name)
+
+    def _stamp(self, file_name):
+        try:
+            st = os.stat(self.local_path(file_name))
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def is_running(self):
+        return bool(self.pending)
+
+    def local_copies_ready(self):
+        """True once every file has a local copy or has given up downloading."""
+        return all(name not in self.pending or self._stamps[name] is not None for name in self.files)
+
+    def start(self):
+        if self.pending:
+            return
+        os.makedirs(self.user_data_folder, exist_ok=True)
+        self.failed = []
+        self._stamps = {name: self._stamp(name) for name in self.files}
+        self.pending = set(self.files)
+        self._started = time.perf_counter()
+        # One thread per file: the work is waiting on the network
+        executor = ThreadPoolExecutor(max_workers=len(self.files), thread_name_prefix='startup-sync')
+        for name in self.files:
+            executor.submit(self._download, name)
+        executor.shutdown(wait=False)
+
+    def _download(self, file_name):
+        try:
+            ok = github_sync.download_file(file_name, self.local_path(file_name))
+        except Exception as e:
+            print(f"Error syncing {file_name}: {str(e)}")
+            ok = False
+        self._downloaded.emit(file_name, ok)
+
+    def _on_downloaded(self, file_name, ok):
+        self.pending.discard(file_name)
+        if not ok:
+            self.failed.append(file_name)
+        elif self._stamps[file_name] is not None and self._stamp(file_name) != self._stamps[file_name]:
+            self.file_updated.emit(file_name)
+        self._stamps[file_name] = self._stamp(file_name)
+
+        self.file_synced.emit(file_name, ok, len(self.files) - len(self.pending), len(self.files))
+        if not self.pending:
+            sync_metrics.record('startup_sync', '', (time.perf_counter() - self._started) * 1000,
+                                not self.failed, ', '.join(self.failed) or None)
+            self.finished.emit(list(self.failed))
+
+    def _refresh_case_store(self, file_name):
+        if file_name != 'data.json':
+            return
+        try:
+            case_store.refresh()
+        except Exception as e:
+            print(f"Error reloading downloaded data.json: {str(e)}")
+
+
+startup_sync = StartupSync()
@@ -0,0 +1,170 @@
+# sync_diagnostics.py
+
+from datetime import datetime, timedelta
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+)
+from PyQt5.QtCore import Qt
+from sync_metrics import sync_metrics, summarize, format_size
+from sync_queue import sync_queue
+
+PERIODS = [("Last hour", 1), ("Last 24 hours", 24), ("Last 7 days", 24 * 7)]
+SUMMARY_COLUMNS = [
+    ("Operation", 'op'), ("File", 'file'), ("Count", 'count'), ("Failed", 'failed'),
+    ("p50 ms", 'p50_ms'), ("p95 ms", 'p95_ms'), ("Total s", 'total_s'), ("Requests", 'requests'),
+    ("Sent", 'bytes_up'), ("Received", 'bytes_down'), ("Cache hits", 'cache_hits'),
+    ("Retries", 'retries'), ("Conflicts", 'conflicts'),
+]
+
+
+class SyncDiagnosticsDialog(QDialog):
+    """Where sync time goes: the upload queue, per-file metrics and recent failures."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Sync Diagnostics")
+        self.setGeometry(250, 200, 1100, 600)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #fff6ee;
+            }
+            QLabel {
+                font-size: 14px;
+                color: #564234;
+            }
+            QPushButton {
+                font-size: 14px;
+                padding: 6px 14px;
+                border: none;
+                border-radius: 8px;
+                color: white;
+                background-color: #ffa33e;
+            }
+            QPushButton:hover {
+                background-color: #ff8c00;
+            }
+            QComboBox {
+                font-size: 14px;
+                padding: 4px;
+                border: 1px solid #ffcea1;
+                border-radius: 8px;
+                background-color: #fffcfa;
+            }
+            QHeaderView::section {
+                background-color: #ffa33e;
+                color: white;
+                font-size: 13px;
+                padding: 4px;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+
+        top = QHBoxLayout()
+        self.queue_label = QLabel()
+        top.addWidget(self.queue_label, 1)
+        self.period_combo = QComboBox()
+        for label, hours in PERIODS:
+            self.period_combo.addItem(label, hours)
+        self.period_combo.setCurrentIndex(1)
+        self.period_combo.currentIndexChanged.connect(self.refresh)
+        top.addWidget(self.period_combo)
+        layout.addLayout(top)
+
+        self.summary_table = self.make_table([title for title, key in SUMMARY_COLUMNS])
+        layout.addWidget(self.summary_table, 3)
+
+        layout.addWidget(QLabel("Waiting uploads"))
+        self.queue_table = self.make_table(["File", "Attempts", "Next try", "Last error"])
+        layout.addWidget(self.queue_table, 1)
+
+        layout.addWidget(QLabel("Recent failures"))
+        self.failure_table = self.make_table(["Time", "Operation", "File", "Error"])
+        layout.addWidget(self.failure_table, 1)
+
+        buttons = QHBoxLayout()
+        self.path_label = QLabel(f"Metrics file: {sync_metrics.metrics_file}")
+        self.path_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        buttons.addWidget(self.path_label, 1)
+        retry_button = QPushButton("Retry Now")
+        retry_button.clicked.connect(self.retry_now)
+        buttons.addWidget(retry_button)
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        buttons.addWidget(refresh_button)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        sync_queue.status_changed.connect(self.update_queue)
+        self.refresh()
+
+    def make_table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.horizontalHeader().setStretchLastSection(True)
+        return table
+
+    def fill(self, table, rows, numbers_from=None):
+        """Put rows in table; columns from numbers_from on are right-aligned."""
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if numbers_from is not None and column >= numbers_from:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+
+    def refresh(self):
+        hours = self.period_combo.currentData()
+        events = sync_metrics.read_events(datetime.now() - timedelta(hours=hours))
+
+        rows = []
+        for summary in summarize(events):
+            values = []
+            for title, key in SUMMARY_COLUMNS:
+                value = summary[key]
+                if key in ('bytes_up', 'bytes_down'):
+                    value = format_size(value)
+                elif key in ('p50_ms', 'p95_ms'):
+                    value = f"{value:.0f}"
+                elif key == 'total_s':
+                    value = f"{value:.1f}"
+                values.append(value)
+            rows.append(values)
+        self.fill(self.summary_table, rows, numbers_from=2)
+
+        failures = [event for event in events if not event.get("ok", True)][-50:]
+        self.fill(self.failure_table, [
+            (event["time"].replace('T', ' ')[:19], event["op"], event.get("file", ""), event.get("error", ""))
+            for event in reversed(failures)
+        ])
+        self.update_queue(sync_queue.depth(), sync_queue.offline)
+
+    def update_queue(self, depth, offline):
+        if offline:
+            self.queue_label.setText(f"\u26A0 Offline \u00B7 {depth} upload(s) waiting for a retry")
+        elif depth:
+            self.queue_label.setText(f"\u21E7 Uploading {depth} file(s)")
+        else:
+            self.queue_label.setText("\u2601 All changes synced")
+
+        rows = []
+        for entry in sync_queue.waiting():
+            next_try = entry.get('next_try') or 0
+            when = datetime.fromtimestamp(next_try).strftime('%H:%M:%S') if next_try else "now"
+            rows.append((entry['file'], entry.get('attempts', 0), when, entry.get('error') or ""))
+        self.fill(self.queue_table, rows)
+
+    def retry_now(self):
+        sync_queue.retry_now()
+        self.refresh()
+
+    def done(self, result):
+        sync_queue.status_changed.disconnect(self.update_queue)
+        super().done(result)
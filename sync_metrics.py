@@ -0,0 +1,231 @@
+# sync_metrics.py
+#
+# Structured metrics of syncing with GitHub: one JSON line per download,
+# upload or case lock call, with its duration, requests, bytes sent and
+# received, cache hits, retries and conflicts. Kept in a rotating file,
+# ~/.my_app_data/sync_metrics.jsonl, and summarised with:
+#
+#     python sync_metrics.py [hours] [--events]
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+# The metrics file is rotated at MAX_BYTES, keeping BACKUP_COUNT old files
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+COUNTERS = ('requests', 'bytes_up', 'bytes_down', 'cache_hits', 'retries', 'conflicts')
+
+
+class Operation:
+    """The counters of one sync operation; add() may be called from any thread."""
+
+    def __init__(self, op, file_name):
+        self.op = op
+        self.file_name = file_name
+        self.ok = True
+        self.error = None
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self.counts[name] = self.counts.get(name, 0) + value
+
+    def fail(self, error):
+        self.ok = False
+        self.error = str(error)
+
+
+class SyncMetrics:
+    """Records sync operations to the metrics file.
+
+    Code that talks to GitHub calls count() as it goes; the counts go to
+    the operation that the calling thread is running (see operation()).
+    """
+
+    def __init__(self):
+        self.metrics_file = os.path.join(str(Path.home()), '.my_app_data', 'sync_metrics.jsonl')
+        self._local = threading.local()
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def _log(self):
+        with self._lock:
+            if self._logger is None:
+                os.makedirs(os.path.dirname(self.metrics_file), exist_ok=True)
+                handler = RotatingFileHandler(self.metrics_file, maxBytes=MAX_BYTES,
+                                              backupCount=BACKUP_COUNT, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger = logging.getLogger('SyncMetrics')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                self._logger = logger
+            return self._logger
+
+    # --------------------------------------------------
+    #   RECORDING
+    # --------------------------------------------------
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self):
+        """The operation this thread is running, or None."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def operation(self, op, file_name=''):
+        """Time the block as one operation and record it when the block ends."""
+        operation = Operation(op, file_name)
+        self._stack().append(operation)
+        try:
+            yield operation
+        except Exception as e:
+            operation.fail(e)
+            raise
+        finally:
+            self._stack().pop()
+            self.record(op, file_name, (time.perf_counter() - operation.started) * 1000,
+                        operation.ok, operation.error, **operation.counts)
+
+    def count(self, **counts):
+        """Add to the counters of this thread's current operation, if any."""
+        operation = self.current()
+        if operation is not None:
+            operation.add(**counts)
+
+    def bind(self, function):
+        """function, counting into this thread's current operation from whatever thread runs it."""
+        operation = self.current()
+
+        def run(*args, **kwargs):
+            stack = self._stack()
+            stack.append(operation)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stack.pop()
+
+        return run if operation is not None else function
+
+    def record(self, op, file_name='', ms=0.0, ok=True, error=None, **counts):
+        event = {
+            "time": datetime.now().isoformat(timespec='milliseconds'),
+            "op": op,
+            "file": file_name,
+            "ok": ok,
+            "ms": round(ms, 1),
+        }
+        event.update((name, value) for name, value in counts.items() if value)
+        if error:
+            event["error"] = error
+        try:
+            self._log().info(json.dumps(event, ensure_ascii=False))
+        except Exception as e:
+            print(f"Error recording sync metrics: {str(e)}")
+
+    # --------------------------------------------------
+    #   READING
+    # --------------------------------------------------
+    def read_events(self, since=None):
+        """Recorded events, oldest first, optionally only those after datetime ``since``."""
+        paths = [f"{self.metrics_file}.{n}" for n in range(BACKUP_COUNT, 0, -1)] + [self.metrics_file]
+        events = []
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or datetime.fromisoformat(event["time"]) >= since:
+                    events.append(event)
+        return events
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def summarize(events):
+    """One row per (operation, file): counts, failures, latency and counter totals."""
+    groups = {}
+    for event in events:
+        groups.setdefault((event["op"], event.get("file", "")), []).append(event)
+    rows = []
+    for (op, file_name), group in sorted(groups.items()):
+        times = [event.get("ms", 0) for event in group]
+        row = {
+            "op": op,
+            "file": file_name,
+            "count": len(group),
+            "failed": sum(1 for event in group if not event.get("ok", True)),
+            "p50_ms": percentile(times, 0.5),
+            "p95_ms": percentile(times, 0.95),
+            "max_ms": max(times),
+            "total_s": sum(times) / 1000,
+        }
+        for name in COUNTERS:
+            row[name] = sum(event.get(name, 0) for event in group)
+        rows.append(row)
+    return rows
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_summary(rows):
+    header = f"{'operation':<16}{'file':<20}{'count':>6}{'failed':>7}{'p50 ms':>9}{'p95 ms':>9}" \
+             f"{'total s':>9}{'reqs':>6}{'up':>10}{'down':>10}{'cache':>6}{'retry':>6}{'confl':>6}"
+    lines = [header, '-' * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['op']:<16}{row['file'][:19]:<20}{row['count']:>6}{row['failed']:>7}"
+            f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['total_s']:>9.1f}{row['requests']:>6}"
+            f"{format_size(row['bytes_up']):>10}{format_size(row['bytes_down']):>10}"
+            f"{row['cache_hits']:>6}{row['retries']:>6}{row['conflicts']:>6}")
+    return "\n".join(lines)
+
+
+sync_metrics = SyncMetrics()
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    hours = float(args[0]) if args else 24
+    events = sync_metrics.read_events(datetime.now() - timedelta(hours=hours))
+    if '--events' in sys.argv:
+        for event in events:
+            print(json.dumps(event, ensure_ascii=False))
+    else:
+        print(f"Sync metrics of the last {hours:g} hour(s) from {sync_metrics.metrics_file}\n")
+        print(format_summary(summarize(events)))
+        failures = [event for event in events if not event.get("ok", True)]
+        if failures:
+            print("\nLast failures:")
+            for event in failures[-10:]:
+                print(f"  {event['time']}  {event['op']} {event.get('file', '')}: {event.get('error')}")
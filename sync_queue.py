@@ -0,0 +1,163 @@
+# sync_queue.py
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from pathlib import Path
+from PyQt5.QtCore import QObject, pyqtSignal
+from github_sync import github_sync
+from sync_metrics import sync_metrics
+
+
+class SyncQueue(QObject):
+    """Uploads saved files to GitHub on a background thread.
+
+    Saving only puts the file on the queue, so it returns at once however
+    slow or absent the network is. The queue is kept in
+    ~/.my_app_data/sync_queue.json and survives restarts. Each file is
+    queued once; whatever is on disk when its turn comes is uploaded. A
+    failed upload is retried with exponential backoff, and the queue
+    counts as offline until an upload succeeds again.
+    """
+
+    # Seconds before the first retry; doubled per failure up to RETRY_MAX
+    RETRY_BASE = 5
+    RETRY_MAX = 300
+
+    # (files waiting, offline); emitted from the worker thread
+    status_changed = pyqtSignal(int, bool)
+
+    def __init__(self):
+        super().__init__()
+        self.queue_file = os.path.join(str(Path.home()), '.my_app_data', 'sync_queue.json')
+        self.entries = self.load()
+        self.offline = False
+        self._cond = threading.Condition()
+        self._worker = None
+
+    # --------------------------------------------------
+    #   PERSISTENCE
+    # --------------------------------------------------
+    def load(self):
+        try:
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(entries, list):
+            return {}
+        return {entry['file']: entry for entry in entries if isinstance(entry, dict) and entry.get('file')}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.queue_file), exist_ok=True)
+            tmp_file = f"{self.queue_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(list(self.entries.values()), f, indent=4)
+            os.replace(tmp_file, self.queue_file)
+        except Exception as e:
+            print(f"Error saving sync queue: {str(e)}")
+
+    # --------------------------------------------------
+    #   QUEUE
+    # --------------------------------------------------
+    def depth(self):
+        with self._cond:
+            return len(self.entries)
+
+    def waiting(self):
+        """Copies of the queued entries (file, attempts, next_try, error)."""
+        with self._cond:
+            return [dict(entry) for entry in self.entries.values()]
+
+    def enqueue(self, local_file):
+        """Queue local_file for upload; returns immediately."""
+        local_file = os.path.abspath(local_file)
+        with self._cond:
+            entry = self.entries.get(local_file)
+            if entry is None:
+                entry = self.entries[local_file] = {'file': local_file, 'attempts': 0, 'error': None}
+            # Saved again: upload the newest contents as soon as possible
+            entry['queued'] = datetime.now().isoformat(timespec='seconds')
+            entry.setdefault('waiting_since', time.time())
+            entry['next_try'] = 0
+            entry['version'] = entry.get('version', 0) + 1
+            self._save()
+            self._cond.notify_all()
+        self.start()
+        self._emit_status()
+
+    def retry_now(self):
+        """Retry every waiting upload without waiting out its backoff."""
+        with self._cond:
+            for entry in self.entries.values():
+                entry['next_try'] = 0
+            self._cond.notify_all()
+        self.start()
+
+    def start(self):
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='sync-queue', daemon=True)
+                self._worker.start()
+        self._emit_status()
+
+    def _emit_status(self):
+        self.status_changed.emit(self.depth(), self.offline)
+
+    def _retry_delay(self, attempts):
+        return min(self.RETRY_BASE * 2 ** (attempts - 1), self.RETRY_MAX)
+
+    # --------------------------------------------------
+    #   WORKER
+    # --------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    due = [e for e in self.entries.values() if e['next_try'] <= now]
+                    if due:
+                        entry = min(due, key=lambda e: e['next_try'])
+                        break
+                    if not self.entries:
+                        self._cond.wait()
+                    else:
+                        self._cond.wait(min(e['next_try'] for e in self.entries.values()) - now)
+                local_file = entry['file']
+                version = entry['version']
+
+            if not os.path.exists(local_file):
+                ok, error = True, None  # Nothing left to upload
+            else:
+                try:
+                    ok = github_sync.sync_file(local_file)
+                    error = None if ok else github_sync.get_sync_status(Path(local_file).name).get('error')
+                except Exception as e:
+                    ok, error = False, str(e)
+
+            with self._cond:
+                entry = self.entries.get(local_file)
+                if ok:
+                    self.offline = False
+                    # Saved again while uploading: keep it for another round
+                    if entry is not None and entry['version'] == version:
+                        del self.entries[local_file]
+                        # From the first save to the upload that carried it to GitHub
+                        waited = time.time() - entry.get('waiting_since', time.time())
+                        sync_metrics.record('queued_upload', os.path.basename(local_file), waited * 1000,
+                                            retries=entry['attempts'])
+                elif entry is not None:
+                    self.offline = True
+                    entry['attempts'] += 1
+                    entry['error'] = error
+                    if entry['version'] == version:
+                        entry['next_try'] = time.time() + self._retry_delay(entry['attempts'])
+                    print(f"Upload of {os.path.basename(local_file)} failed (attempt {entry['attempts']}): {error}")
+                self._save()
+            self._emit_status()
+
+
+sync_queue = SyncQueue()
@@ -0,0 +1,343 @@
+# sync_stub_server.py
+#
+# A local stand-in for the parts of the GitHub API that github_sync uses,
+# so syncing can be tried without network access or a token:
+#
+#     python sync_stub_server.py [folder] [port]
+#     GITHUB_API_URL=http://127.0.0.1:8765 python main.py
+#
+# Files live as plain files in ``folder``; every request and the bytes of
+# file content it carried are printed.
+
+import os
+import sys
+import json
+import base64
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, unquote
+
+DEFAULT_PORT = 8765
+
+
+def blob_sha(content):
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class StubRepository:
+    """One repository's files in a folder, at most one subfolder deep."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.commits = 0
+        # Earlier versions stay readable by sha, as in git
+        self.history = {}
+        # Trees and commits made through the git data API, by sha
+        self.trees = {}
+        self.new_commits = {}
+        # Commit shas the branch was moved to, by commit count
+        self.heads = {}
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, name):
+        parts = [p for p in name.split('/') if p]
+        if not parts or len(parts) > 2 or any(p in ('.', '..') for p in parts):
+            raise KeyError(name)
+        return os.path.join(self.folder, *parts)
+
+    def read(self, name):
+        try:
+            with open(self.path(name), 'rb') as f:
+                return f.read()
+        except OSError:
+            raise KeyError(name)
+
+    def names(self, folder=''):
+        path = self.path(folder) if folder else self.folder
+        if not os.path.isdir(path):
+            raise KeyError(folder)
+        return sorted(os.listdir(path))
+
+    def is_folder(self, name):
+        try:
+            return os.path.isdir(self.path(name))
+        except KeyError:
+            return False
+
+    def tree_sha(self, folder):
+        entries = "".join(f"{n}:{blob_sha(self.read(f'{folder}/{n}'))}\n" for n in self.names(folder))
+        return hashlib.sha1(entries.encode('utf-8')).hexdigest()
+
+    def head(self):
+        return self.heads.get(self.commits) or hashlib.sha1(str(self.commits).encode()).hexdigest()
+
+    def root_entries(self):
+        """(name, type, sha) of the files and folders at the root."""
+        return [(n, 'tree', self.tree_sha(n)) if self.is_folder(n) else (n, 'blob', blob_sha(self.read(n)))
+                for n in self.names()]
+
+    def root_tree_sha(self):
+        return hashlib.sha1(repr(self.root_entries()).encode('utf-8')).hexdigest()
+
+    def find_blob(self, sha):
+        if sha in self.history:
+            return self.history[sha]
+        for name in self.names():
+            names = [f"{name}/{n}" for n in self.names(name)] if self.is_folder(name) else [name]
+            for path in names:
+                content = self.read(path)
+                if blob_sha(content) == sha:
+                    return content
+        raise KeyError(sha)
+
+    def write(self, name, content):
+        self.history[blob_sha(content)] = content
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        self.commits += 1
+
+    def delete(self, name):
+        path = self.path(name)
+        self.history[blob_sha(self.read(name))] = self.read(name)
+        os.remove(path)
+        # Git has no empty folders
+        folder = os.path.dirname(path)
+        if folder != self.folder and not os.listdir(folder):
+            os.rmdir(folder)
+        self.commits += 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    repo = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data, content_bytes=0):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        print(f"{self.command} {self.path} -> {status} ({content_bytes} content bytes)")
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def base_url(self):
+        return f"http://{self.headers.get('Host')}"
+
+    def route(self):
+        """(owner/repo, kind, rest) of the request path."""
+        parts = unquote(urlparse(self.path).path).strip('/').split('/')
+        if len(parts) < 3 or parts[0] != 'repos':
+            return None, None, None
+        full_name = f"{parts[1]}/{parts[2]}"
+        kind = parts[3] if len(parts) > 3 else ''
+        rest = '/'.join(parts[4:])
+        return full_name, kind, rest
+
+    def file_json(self, full_name, name, content, with_content=False):
+        url = f"{self.base_url()}/repos/{full_name}/contents/{name}"
+        data = {
+            "type": "file",
+            "name": name.rsplit('/', 1)[-1],
+            "path": name,
+            "sha": blob_sha(content),
+            "size": len(content),
+            "url": url,
+            "git_url": f"{self.base_url()}/repos/{full_name}/git/blobs/{blob_sha(content)}",
+            "html_url": url,
+            "download_url": None,
+        }
+        if with_content:
+            data["content"] = base64.b64encode(content).decode('ascii')
+            data["encoding"] = "base64"
+        return data
+
+    def listing_json(self, full_name, folder):
+        listing = []
+        for n in self.repo.names(folder):
+            path = f"{folder}/{n}" if folder else n
+            if self.repo.is_folder(path):
+                listing.append({
+                    "type": "dir", "name": n, "path": path, "sha": self.repo.tree_sha(path),
+                    "url": f"{self.base_url()}/repos/{full_name}/contents/{path}",
+                })
+            else:
+                listing.append(self.file_json(full_name, path, self.repo.read(path)))
+        return listing
+
+    def commit_json(self, full_name, sha=None, tree=None, parents=()):
+        sha = sha or self.repo.head()
+        data = {"sha": sha, "url": f"{self.base_url()}/repos/{full_name}/git/commits/{sha}"}
+        if tree is not None:
+            data["tree"] = {"sha": tree, "url": f"{self.base_url()}/repos/{full_name}/git/trees/{tree}"}
+            data["parents"] = [{"sha": p, "url": f"{self.base_url()}/repos/{full_name}/git/commits/{p}"} for p in parents]
+        return data
+
+    def ref_json(self, full_name, ref):
+        return {
+            "ref": f"refs/{ref}",
+            "url": f"{self.base_url()}/repos/{full_name}/git/refs/{ref}",
+            "object": {"type": "commit", **self.commit_json(full_name)},
+        }
+
+    def not_found(self):
+        self.send_json(404, {"message": "Not Found"})
+
+    def do_GET(self):
+        full_name, kind, rest = self.route()
+        if full_name is None:
+            return self.not_found()
+        with self.repo.lock:
+            if kind == '':
+                return self.send_json(200, {
+                    "full_name": full_name, "name": full_name.split('/')[1],
+                    "url": f"{self.base_url()}/repos/{full_name}", "default_branch": "main",
+                })
+            if kind == 'contents' and (not rest or self.repo.is_folder(rest)):
+                return self.send_json(200, self.listing_json(full_name, rest))
+            if kind == 'contents':
+                try:
+                    content = self.repo.read(rest)
+                except KeyError:
+                    return self.not_found()
+                return self.send_json(200, self.file_json(full_name, rest, content, True), len(content))
+            if kind == 'git' and rest in ('ref/heads/main', 'refs/heads/main'):
+                return self.send_json(200, self.ref_json(full_name, 'heads/main'))
+            if kind == 'git' and rest.startswith('commits/'):
+                sha = rest.split('/', 1)[1]
+                if sha == self.repo.head():
+                    return self.send_json(200, self.commit_json(full_name, sha, self.repo.root_tree_sha()))
+                if sha in self.repo.new_commits:
+                    tree, parent = self.repo.new_commits[sha]
+                    return self.send_json(200, self.commit_json(full_name, sha, tree, [parent]))
+                return self.not_found()
+            if kind == 'git' and rest.startswith('trees/'):
+                # Only the current root tree can be listed
+                if rest.split('/', 1)[1] != self.repo.root_tree_sha():
+                    return self.not_found()
+                return self.send_json(200, {
+                    "sha": self.repo.root_tree_sha(), "truncated": False,
+                    "url": f"{self.base_url()}/repos/{full_name}/git/{rest}",
+                    "tree": [{"path": n, "mode": "040000" if t == 'tree' else "100644", "type": t, "sha": sha}
+                             for n, t, sha in self.repo.root_entries()],
+                })
+            if kind == 'git' and rest.startswith('blobs/'):
+                sha = rest.split('/', 1)[1]
+                try:
+                    content = self.repo.find_blob(sha)
+                except KeyError:
+                    return self.not_found()
+                return self.send_json(200, {
+                    "sha": sha, "size": len(content), "encoding": "base64",
+                    "content": base64.b64encode(content).decode('ascii'),
+                    "url": f"{self.base_url()}/repos/{full_name}/git/blobs/{sha}",
+                }, len(content))
+        self.not_found()
+
+    def do_PUT(self):
+        full_name, kind, rest = self.route()
+        if kind != 'contents' or not rest:
+            return self.not_found()
+        data = self.read_body()
+        content = base64.b64decode(data.get("content", ""))
+        with self.repo.lock:
+            try:
+                current = blob_sha(self.repo.read(rest))
+            except KeyError:
+                current = None
+            if current is not None and data.get("sha") != current:
+                return self.send_json(409, {"message": f"{rest} does not match {data.get('sha')}"})
+            if current is None and data.get("sha"):
+                return self.send_json(422, {"message": f"{rest} does not exist"})
+            self.repo.write(rest, content)
+            self.send_json(201 if current is None else 200, {
+                "content": self.file_json(full_name, rest, content),
+                "commit": self.commit_json(full_name),
+            }, len(content))
+
+    def do_POST(self):
+        full_name, kind, rest = self.route()
+        if kind != 'git' or rest not in ('blobs', 'trees', 'commits'):
+            return self.not_found()
+        data = self.read_body()
+        with self.repo.lock:
+            if rest == 'blobs':
+                content = base64.b64decode(data.get("content", ""))
+                sha = blob_sha(content)
+                self.repo.history[sha] = content
+                return self.send_json(201, {"sha": sha, "url": f"{self.base_url()}/repos/{full_name}/git/blobs/{sha}"},
+                                      len(content))
+            if rest == 'trees':
+                entries = [(e["path"], e.get("sha")) for e in data.get("tree", [])]
+                sha = hashlib.sha1(json.dumps([data.get("base_tree"), entries]).encode('utf-8')).hexdigest()
+                self.repo.trees[sha] = (data.get("base_tree"), entries)
+                return self.send_json(201, {"sha": sha, "tree": [],
+                                            "url": f"{self.base_url()}/repos/{full_name}/git/trees/{sha}"})
+            parents = data.get("parents") or []
+            if data.get("tree") not in self.repo.trees or len(parents) != 1:
+                return self.send_json(422, {"message": "Tree or parents not supported by the stub"})
+            sha = hashlib.sha1(json.dumps([data.get("tree"), parents, data.get("message")]).encode('utf-8')).hexdigest()
+            self.repo.new_commits[sha] = (data["tree"], parents[0])
+            self.send_json(201, self.commit_json(full_name, sha, data["tree"], parents))
+
+    def do_PATCH(self):
+        full_name, kind, rest = self.route()
+        if kind != 'git' or rest != 'refs/heads/main':
+            return self.not_found()
+        data = self.read_body()
+        with self.repo.lock:
+            if data.get("sha") not in self.repo.new_commits:
+                return self.send_json(422, {"message": "Object does not exist"})
+            tree, parent = self.repo.new_commits[data["sha"]]
+            base_tree, entries = self.repo.trees[tree]
+            if not data.get("force") and (parent != self.repo.head() or base_tree != self.repo.root_tree_sha()):
+                return self.send_json(422, {"message": "Update is not a fast forward"})
+            commits = self.repo.commits
+            for path, sha in entries:
+                if sha is None:
+                    self.repo.delete(path)
+                else:
+                    self.repo.write(path, self.repo.find_blob(sha))
+            self.repo.commits = commits + 1
+            self.repo.heads[self.repo.commits] = data["sha"]
+            self.send_json(200, self.ref_json(full_name, 'heads/main'))
+
+    def do_DELETE(self):
+        full_name, kind, rest = self.route()
+        if kind != 'contents' or not rest:
+            return self.not_found()
+        data = self.read_body()
+        with self.repo.lock:
+            try:
+                current = blob_sha(self.repo.read(rest))
+            except KeyError:
+                return self.not_found()
+            if data.get("sha") != current:
+                return self.send_json(409, {"message": f"{rest} does not match {data.get('sha')}"})
+            self.repo.delete(rest)
+            self.send_json(200, {"content": None, "commit": self.commit_json(full_name)})
+
+
+def serve(folder, port=DEFAULT_PORT):
+    """Start a stub server in a background thread and return it."""
+    handler = type('Handler', (StubHandler,), {'repo': StubRepository(folder)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    folder = sys.argv[1] if len(sys.argv) > 1 else 'sync_stub_data'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT
+    handler = type('Handler', (StubHandler,), {'repo': StubRepository(folder)})
+    print(f"Serving {os.path.abspath(folder)} on http://127.0.0.1:{port}")
+    ThreadingHTTPServer(('127.0.0.1', port), handler).serve_forever()